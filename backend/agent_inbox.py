@@ -0,0 +1,181 @@
+"""
+agent_inbox.py - Per-agent notification inbox materialized at write time
+
+Agent notification queries used to load every DetectionLog row and compare
+details['assigned_agent'] in Python, or match on the JSON column, so they
+slowed down as history grew. Each detection now gets one AgentInbox row per
+agent who should see it: the agents assigned to its stream, plus anyone it
+was assigned or forwarded to. The rows are written right after the detection
+is committed. Agent lists, unread lookups and read flags are then index range
+scans on (agent_id, timestamp). When a stream's assignments change,
+sync_stream_inbox() rewrites that stream's membership with one DELETE and
+one INSERT ... SELECT per agent.
+"""
+import logging
+from sqlalchemy import and_, exists, false, func, insert, literal, null, select, true, update
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import AgentInbox, Assignment, DetectionLog, Stream
+from notification_feed import summary_query
+from stream_context import StreamContext, get_stream_context
+from unread_counters import adjust_alert_counts, invalidate_alert_counts
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+def _stream_id_for(url):
+    context = get_stream_context(url) if url else None
+    return context.stream_id if context else None
+
+def add_to_inbox(entries, forwarded_to=None):
+    """Create inbox rows for committed DetectionLogs; rows that already exist are left alone"""
+    entries = [entry for entry in entries if entry is not None and entry.id is not None]
+    if not entries:
+        return 0
+    stream_ids = {entry.id: _stream_id_for(entry.room_url) for entry in entries}
+    agents_by_stream = {}
+    known_streams = {sid for sid in stream_ids.values() if sid is not None}
+    if known_streams:
+        for stream_id, agent_id in db.session.query(Assignment.stream_id, Assignment.agent_id).filter(
+                Assignment.stream_id.in_(known_streams)):
+            agents_by_stream.setdefault(stream_id, set()).add(agent_id)
+
+    existing = set(db.session.query(AgentInbox.agent_id, AgentInbox.detection_id).filter(
+        AgentInbox.detection_id.in_([entry.id for entry in entries])))
+    rows = []
+    for entry in entries:
+        stream_id = stream_ids[entry.id]
+        agents = set(agents_by_stream.get(stream_id, ()))
+        if entry.assigned_agent:
+            agents.add(entry.assigned_agent)
+        if forwarded_to:
+            agents.add(forwarded_to)
+        for agent_id in agents:
+            if (agent_id, entry.id) in existing:
+                continue
+            rows.append({
+                "agent_id": agent_id,
+                "detection_id": entry.id,
+                "stream_id": stream_id,
+                "timestamp": entry.timestamp,
+                "read": bool(entry.read),
+                "forwarded": agent_id == forwarded_to
+            })
+    if forwarded_to:
+        # An agent who already had the alert keeps it through reassignment once it is forwarded
+        AgentInbox.query.filter(
+            AgentInbox.agent_id == forwarded_to,
+            AgentInbox.detection_id.in_([entry.id for entry in entries])
+        ).update({"forwarded": True}, synchronize_session=False)
+    try:
+        if rows:
+            db.session.execute(insert(AgentInbox.__table__), rows)
+        db.session.commit()
+    except IntegrityError:
+        # Another process filed the same alert first; its rows are just as good
+        db.session.rollback()
+        logger.warning(f"Inbox rows for detections {[entry.id for entry in entries]} already existed")
+        return 0
+    unread = {}
+    for row in rows:
+        if not row["read"]:
+            unread[row["agent_id"]] = unread.get(row["agent_id"], 0) + 1
+    adjust_alert_counts(unread)
+    return len(rows)
+
+def sync_stream_inbox(stream_id):
+    """Make inbox membership for a stream's detections match its current assignments"""
+    stream = Stream.query.get(stream_id)
+    if stream is None:
+        return
+    agent_ids = [agent_id for (agent_id,) in db.session.query(Assignment.agent_id).filter_by(stream_id=stream_id)]
+    urls = StreamContext.from_stream(stream).urls()
+
+    # Agents who lost the stream drop its alerts, except ones forwarded to them
+    removed = AgentInbox.query.filter(
+        AgentInbox.stream_id == stream_id,
+        AgentInbox.forwarded == false(),
+        ~AgentInbox.agent_id.in_(agent_ids) if agent_ids else true()
+    ).delete(synchronize_session=False)
+
+    added = 0
+    for agent_id in agent_ids:
+        history = select(
+            literal(agent_id),
+            DetectionLog.id,
+            literal(stream_id),
+            func.coalesce(DetectionLog.timestamp, func.now()),
+            func.coalesce(DetectionLog.read, false()),
+            false()
+        ).where(
+            DetectionLog.room_url.in_(urls),
+            ~exists().where(and_(AgentInbox.agent_id == agent_id, AgentInbox.detection_id == DetectionLog.id))
+        )
+        result = db.session.execute(
+            insert(AgentInbox.__table__).from_select(
+                ['agent_id', 'detection_id', 'stream_id', 'timestamp', 'read', 'forwarded'], history
+            )
+        )
+        added += result.rowcount or 0
+    db.session.commit()
+    if added or removed:
+        invalidate_alert_counts()
+    logger.info(f"Synced inbox for stream {stream_id}: {added} added, {removed} removed")
+
+def backfill_inbox():
+    """Build the inbox from existing history; run once when the table is first created"""
+    if db.session.query(AgentInbox.id).first() is not None:
+        return
+    if db.session.query(DetectionLog.id).first() is None:
+        return
+    # Detections that were assigned to an agent when they were written
+    db.session.execute(
+        insert(AgentInbox.__table__).from_select(
+            ['agent_id', 'detection_id', 'stream_id', 'timestamp', 'read', 'forwarded'],
+            select(
+                DetectionLog.assigned_agent,
+                DetectionLog.id,
+                null(),
+                func.coalesce(DetectionLog.timestamp, func.now()),
+                func.coalesce(DetectionLog.read, false()),
+                false()
+            ).where(DetectionLog.assigned_agent.isnot(None))
+        )
+    )
+    db.session.commit()
+    for (stream_id,) in db.session.query(Assignment.stream_id).distinct():
+        sync_stream_inbox(stream_id)
+    invalidate_alert_counts()
+    logger.info("Agent inbox backfilled from detection history")
+
+def mark_inbox_read(detection_ids=None, agent_id=None, read=True):
+    """Set read on inbox rows by detection, by agent, or both; the caller commits.
+
+    Returns the agent id of every row that changed, for adjusting unread counts.
+    """
+    statement = update(AgentInbox.__table__).where(AgentInbox.read != read)
+    if detection_ids is not None:
+        statement = statement.where(AgentInbox.detection_id.in_(detection_ids))
+    if agent_id is not None:
+        statement = statement.where(AgentInbox.agent_id == agent_id)
+    return [row.agent_id for row in db.session.execute(
+        statement.values(read=read).returning(AgentInbox.agent_id)
+    )]
+
+def in_inbox(agent_id, detection_id):
+    return db.session.query(exists().where(and_(
+        AgentInbox.agent_id == agent_id, AgentInbox.detection_id == detection_id
+    ))).scalar()
+
+def inbox_summary_query(agent_id):
+    """Compact summaries of an agent's inbox; read is the agent's own flag"""
+    return summary_query(
+        read_column=AgentInbox.read, keyset=(AgentInbox.timestamp, AgentInbox.detection_id)
+    ).select_from(AgentInbox).join(
+        DetectionLog, DetectionLog.id == AgentInbox.detection_id
+    ).filter(AgentInbox.agent_id == agent_id)
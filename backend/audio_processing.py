@@ -1,13 +1,15 @@
 import logging
+import re
 import numpy as np
 from datetime import datetime
 import os
-import librosa
 from flask import current_app
 from gevent.lock import Semaphore
-from models import DetectionLog, Stream, ChaturbateStream, StripchatStream, ChatKeyword
-from extensions import db
-from utils.notifications import emit_notification
+from keyword_matcher import get_keyword_matcher
+from flagged_terms import get_flagged_keywords
+from stream_context import get_stream_context
+from detection_writer import queue_detection_log
+from inference_workers import get_inference_pool, whisper_transcribe
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -21,6 +23,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Whisper's native input format; monitor audio is resampled to it at decode time
+TARGET_SAMPLE_RATE = 16000
+
 # External dependencies
 _whisper_model = None
 _whisper_lock = Semaphore()
@@ -68,59 +73,22 @@ def load_whisper_model():
     return _whisper_model
 
 def refresh_flagged_keywords():
-    """Retrieve current flagged keywords from database"""
-    with current_app.app_context():
-        keywords = [kw.keyword.lower() for kw in ChatKeyword.query.all()]
-    logger.debug(f"Retrieved {len(keywords)} flagged keywords")
-    return keywords
+    """Retrieve current flagged keywords from the versioned cache"""
+    return get_flagged_keywords()
 
 def get_stream_info(stream_url):
     """Identify platform and streamer from URL"""
-    with current_app.app_context():
-        cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=stream_url).first()
-        if cb_stream:
-            return 'chaturbate', cb_stream.streamer_username
-        sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=stream_url).first()
-        if sc_stream:
-            return 'stripchat', sc_stream.streamer_username
-        stream = Stream.query.filter_by(room_url=stream_url).first()
-        if stream:
-            return stream.type.lower(), stream.streamer_username
-    return 'unknown', 'unknown'
+    context = get_stream_context(stream_url)
+    if context is None:
+        return 'unknown', 'unknown'
+    return context.platform, context.streamer
 
 def get_stream_assignment(stream_url):
     """Get assignment info for a stream"""
-    from sqlalchemy.orm import joinedload
-    with current_app.app_context():
-        stream = Stream.query.filter_by(room_url=stream_url).first()
-        if not stream:
-            cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=stream_url).first()
-            if cb_stream:
-                stream = Stream.query.get(cb_stream.id)
-            else:
-                sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=stream_url).first()
-                if sc_stream:
-                    stream = Stream.query.get(sc_stream.id)
-        
-        if not stream:
-            logger.warning(f"No stream found for URL: {stream_url}")
-            return None, None
-        
-        from models import Assignment
-        query = Assignment.query.options(
-            joinedload(Assignment.agent),
-            joinedload(Assignment.stream)
-        ).filter_by(stream_id=stream.id)
-        
-        assignments = query.all()
-        
-        if not assignments:
-            logger.info(f"No assignments found for stream: {stream_url}")
-            return None, None
-        
-        assignment = assignments[0]
-        agent_id = assignment.agent_id
-        return assignment.id, agent_id
+    context = get_stream_context(stream_url)
+    if context is None or context.assignment_id is None:
+        return None, None
+    return context.assignment_id, context.agent_id
 
 def normalize_audio(audio_data):
     """Normalize audio volume to improve transcription reliability"""
@@ -133,16 +101,178 @@ def normalize_audio(audio_data):
         logger.error(f"Error normalizing audio: {e}")
         return audio_data
 
-def process_audio_segment(audio_data, original_sample_rate, stream_url):
-    """Process an audio segment for transcription and analysis with diagnostics"""
+def detect_speech_regions(audio_data, sample_rate, energy_ratio=3.0, min_speech=0.25, padding=0.3, frame_ms=30):
+    """Find speech-like regions in a mono float signal; returns a list of (start, end) sample indices.
+
+    Lightweight numpy VAD: a frame is voiced when its energy clears an adaptive
+    noise floor and its zero-crossing rate is in the speech range. Sustained
+    loud audio with little syllabic energy modulation (typically music) is
+    rejected. Regions are padded and short blips dropped.
+    """
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(audio_data) // frame_len
+    if n_frames == 0:
+        return []
+    frames = audio_data[:n_frames * frame_len].reshape(n_frames, frame_len)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10
+    noise_floor = np.percentile(energy, 10)
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+    voiced = (energy > max(noise_floor * energy_ratio, 1e-4)) & (zcr > 0.01) & (zcr < 0.35)
+
+    # Speech energy fluctuates at the syllable rate; music tends to stay flat
+    span = max(1, int(1000 / frame_ms))
+    log_energy = np.log(energy)
+    for start in range(0, n_frames, span):
+        block = slice(start, start + span)
+        if voiced[block].all() and np.std(log_energy[block]) < 0.25:
+            voiced[block] = False
+
+    pad_frames = int(padding * 1000 / frame_ms)
+    min_frames = max(1, int(min_speech * 1000 / frame_ms))
+    regions = []
+    index = 0
+    while index < n_frames:
+        if not voiced[index]:
+            index += 1
+            continue
+        end = index
+        while end < n_frames and voiced[end]:
+            end += 1
+        if end - index >= min_frames:
+            start_frame = max(0, index - pad_frames)
+            end_frame = min(n_frames, end + pad_frames)
+            if regions and start_frame <= regions[-1][1]:
+                regions[-1] = (regions[-1][0], end_frame)
+            else:
+                regions.append((start_frame, end_frame))
+        index = end
+    return [(start * frame_len, end * frame_len) for start, end in regions]
+
+def _normalize_word(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+def merge_overlapping_transcript(previous, current, max_overlap_words=30):
+    """Drop the words at the start of `current` that repeat the end of `previous`.
+
+    Consecutive windows overlap in time, so Whisper usually transcribes the
+    shared audio twice; only the new text is returned.
+    """
+    if not previous or not current:
+        return current
+    previous_words = [_normalize_word(w) for w in previous.split()]
+    current_raw = current.split()
+    current_words = [_normalize_word(w) for w in current_raw]
+    for size in range(min(len(previous_words), len(current_words), max_overlap_words), 0, -1):
+        if previous_words[-size:] == current_words[:size]:
+            return ' '.join(current_raw[size:])
+    return current
+
+class AudioRingBuffer:
+    """
+    Fixed-size float32 ring buffer for one stream's 16 kHz mono audio.
+    Every sample is written twice, `capacity` apart, so any span of up to
+    `capacity` recent samples can be read as one contiguous view with no copy.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=np.float32)
+        self.written = 0  # Total samples ever written
+
+    def write(self, samples):
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+        position = self.written % self.capacity
+        first = min(len(samples), self.capacity - position)
+        for offset in (0, self.capacity):
+            self._data[offset + position:offset + position + first] = samples[:first]
+            self._data[offset:offset + len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def view(self, start, length):
+        """Contiguous read-only view of samples [start, start + length) by absolute index"""
+        if start < self.written - self.capacity or start + length > self.written or length > self.capacity:
+            raise IndexError("Requested audio is no longer (or not yet) in the ring buffer")
+        position = start % self.capacity
+        window = self._data[position:position + length]
+        window.flags.writeable = False
+        return window
+
+class StreamingTranscriber:
+    """
+    Windowed, VAD-gated transcription for one stream. Audio arrives already
+    resampled to 16 kHz mono float32 and is stored in a fixed AudioRingBuffer,
+    so memory stays flat per stream. It is cut into windows of `window`
+    seconds that overlap by `overlap` seconds so a keyword spoken across a
+    boundary is heard whole at least once. Only the speech regions of a
+    window are sent to Whisper, and windows without enough speech are skipped
+    entirely. Text repeated from the previous window is removed before
+    keyword matching.
+    """
+
+    def __init__(self, stream_url, window=30.0, overlap=2.0, vad_enabled=True,
+                 vad_energy_ratio=3.0, min_speech=1.0, context_words=30):
+        self.stream_url = stream_url
+        self.window = window
+        self.overlap = min(overlap, window / 2)
+        self.vad_enabled = vad_enabled
+        self.vad_energy_ratio = vad_energy_ratio
+        self.min_speech = min_speech
+        self.context_words = context_words
+        self._window_len = int(window * TARGET_SAMPLE_RATE)
+        self._step = self._window_len - int(self.overlap * TARGET_SAMPLE_RATE)
+        # One second of headroom beyond a window keeps the pending window intact while new audio arrives
+        self._headroom = TARGET_SAMPLE_RATE
+        self._ring = AudioRingBuffer(self._window_len + self._headroom)
+        self._window_start = 0
+        self._context = ""
+
+    def feed(self, samples):
+        """Add 16 kHz mono float32 samples; returns (detections, transcript) for each window completed"""
+        results = []
+        for offset in range(0, len(samples), self._headroom):
+            self._ring.write(samples[offset:offset + self._headroom])
+            while self._ring.written - self._window_start >= self._window_len:
+                window = self._ring.view(self._window_start, self._window_len)
+                results.append(self._transcribe_window(window))
+                self._window_start += self._step
+        return results
+
+    def _transcribe_window(self, window):
+        audio = window
+        if self.vad_enabled:
+            regions = detect_speech_regions(window, TARGET_SAMPLE_RATE, energy_ratio=self.vad_energy_ratio)
+            speech_samples = sum(end - start for start, end in regions)
+            if speech_samples < self.min_speech * TARGET_SAMPLE_RATE:
+                logger.debug(f"No speech in {self.window:.0f}s window for {self.stream_url}; skipping Whisper")
+                self._context = ""
+                return [], ""
+            if len(regions) > 1 or regions[0] != (0, len(window)):
+                audio = np.concatenate([window[start:end] for start, end in regions])
+            logger.debug(f"VAD kept {speech_samples / TARGET_SAMPLE_RATE:.1f}s of speech for {self.stream_url}")
+        detections, transcript = process_audio_segment(audio, TARGET_SAMPLE_RATE, self.stream_url, previous_transcript=self._context)
+        if transcript:
+            self._context = ' '.join(f"{self._context} {transcript}".split()[-self.context_words:])
+        return detections, transcript
+
+def process_audio_segment(audio_data, original_sample_rate, stream_url, previous_transcript=""):
+    """Process an audio segment for transcription and analysis with diagnostics.
+
+    previous_transcript is the tail of the preceding overlapping window; text
+    repeated from it is removed before keywords are matched.
+    """
     enable_audio_monitoring = os.getenv('ENABLE_AUDIO_MONITORING', 'true').lower() == 'true'
     if not enable_audio_monitoring:
         logger.info(f"Audio monitoring disabled for {stream_url}")
         return [], ""
-    model = load_whisper_model()
-    if model is None:
-        logger.warning(f"Skipping audio processing for {stream_url} due to unavailable Whisper model")
-        return [], ""
+    # Prefer the Whisper worker processes so transcription never blocks the gevent hub
+    pool = get_inference_pool('whisper', current_app.config)
+    model = None
+    if pool is None:
+        model = load_whisper_model()
+        if model is None:
+            logger.warning(f"Skipping audio processing for {stream_url} due to unavailable Whisper model")
+            return [], ""
     
     # Log audio diagnostics
     audio_duration = len(audio_data) / original_sample_rate
@@ -154,21 +284,23 @@ def process_audio_segment(audio_data, original_sample_rate, stream_url):
         return [], ""
     
     try:
-        target_sr = 16000
-        # Normalize audio
-        audio_data = normalize_audio(audio_data)
-        # Resample if necessary
-        if original_sample_rate != target_sr:
-            audio_data = librosa.resample(audio_data, orig_sr=original_sample_rate, target_sr=target_sr)
+        # Monitor audio is already 16 kHz from the decoder; other callers still get resampled here
+        if original_sample_rate != TARGET_SAMPLE_RATE:
+            import librosa
+            audio_data = librosa.resample(np.asarray(audio_data, dtype=np.float32), orig_sr=original_sample_rate, target_sr=TARGET_SAMPLE_RATE)
+        # Normalize as part of the single copy into the model's input buffer
+        scale = 1.0 / audio_amplitude
         logger.info(f"Transcribing audio for {stream_url}")
-        result = model.transcribe(audio_data, fp16=False, verbose=False)
-        transcript = result.get("text", "").strip()
+        if pool is not None:
+            transcript = pool.transcribe(audio_data, scale)
+        else:
+            transcript = whisper_transcribe(model, np.multiply(audio_data, scale, dtype=np.float32))
+        transcript = merge_overlapping_transcript(previous_transcript, transcript)
         if not transcript:
             logger.warning(f"Empty transcription for {stream_url}; audio may be silent or unintelligible")
         else:
             logger.info(f"Transcription for {stream_url}: {transcript[:100]}...")
-        keywords = refresh_flagged_keywords()
-        detected_keywords = [kw for kw in keywords if kw in transcript.lower()]
+        detected_keywords = get_keyword_matcher(refresh_flagged_keywords()).findall(transcript)
         detections = []
         if detected_keywords:
             detection = {
@@ -197,31 +329,18 @@ def log_audio_detection(detection, stream_url):
         "platform": platform,
         "assigned_agent": agent_id
     }
-    with current_app.app_context():
-        log_entry = DetectionLog(
-            room_url=stream_url,
-            event_type="audio_detection",
-            details=details,
-            timestamp=datetime.now(),
-            assigned_agent=agent_id,
-            assignment_id=assignment_id,
-            read=False
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-        notification_data = {
-            "id": log_entry.id,
-            "event_type": log_entry.event_type,
-            "timestamp": log_entry.timestamp.isoformat(),
-            "details": log_entry.details,
-            "read": log_entry.read,
-            "room_url": log_entry.room_url,
+    queue_detection_log(
+        {
+            "room_url": stream_url,
+            "event_type": "audio_detection",
+            "details": details,
+            "timestamp": datetime.now(),
+            "assigned_agent": agent_id,
+            "assignment_id": assignment_id
+        },
+        {
             "streamer": streamer,
             "platform": platform,
             "assigned_agent": "Unassigned" if not agent_id else "Agent"
         }
-        
-        # Use environment variables for alert cooldown
-        audio_alert_cooldown = int(os.getenv('AUDIO_ALERT_COOLDOWN', 1800))  # Default to 1800 seconds (30 minutes)
-        # Use the configured cooldown when emitting the notification
-        emit_notification(notification_data, cooldown=audio_alert_cooldown)
\ No newline at end of file
+    )
\ No newline at end of file
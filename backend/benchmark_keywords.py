@@ -0,0 +1,74 @@
+# benchmark_keywords.py
+"""
+Compare the compiled keyword matcher with the old per-keyword substring loop
+on synthetic chat traffic.
+
+Usage: python benchmark_keywords.py [messages] [keywords]
+"""
+import random
+import string
+import sys
+import time
+from keyword_matcher import KeywordMatcher
+
+def random_word(rng, min_len=2, max_len=9):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+def build_corpus(message_count, keyword_count, seed=42):
+    """Chat-like messages of 1-25 words, a few percent of which contain a flagged keyword"""
+    rng = random.Random(seed)
+    vocabulary = [random_word(rng) for _ in range(5000)]
+    keywords = set()
+    while len(keywords) < keyword_count:
+        # Mix of single words and short phrases, like real flagged terms
+        keywords.add(' '.join(random_word(rng, 3, 8) for _ in range(rng.choice((1, 1, 1, 2)))))
+    keywords = sorted(keywords)
+    messages = []
+    for _ in range(message_count):
+        words = rng.choices(vocabulary, k=rng.randint(1, 25))
+        if rng.random() < 0.03:
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        messages.append(' '.join(words))
+    return keywords, messages
+
+def naive_scan(keywords, messages):
+    hits = 0
+    for message in messages:
+        text = message.lower()
+        for keyword in keywords:
+            if keyword in text:
+                hits += 1
+    return hits
+
+def matcher_scan(matcher, messages):
+    hits = 0
+    for message in messages:
+        hits += len(matcher.findall(message))
+    return hits
+
+def main():
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    keyword_count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    keywords, messages = build_corpus(message_count, keyword_count)
+    print(f"Benchmark: {message_count} messages, {keyword_count} keywords")
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build_time = time.perf_counter() - started
+    print(f"- Compile matcher: {build_time * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    naive_hits = naive_scan(keywords, messages)
+    naive_time = time.perf_counter() - started
+    print(f"- Substring loop:  {naive_time:.3f} s ({message_count / naive_time:,.0f} msg/s, {naive_hits} hits)")
+
+    started = time.perf_counter()
+    matcher_hits = matcher_scan(matcher, messages)
+    matcher_time = time.perf_counter() - started
+    print(f"- Compiled matcher: {matcher_time:.3f} s ({message_count / matcher_time:,.0f} msg/s, {matcher_hits} hits)")
+    print(f"- Speedup: {naive_time / matcher_time:.1f}x")
+    # The substring loop also counts keywords found inside longer words, so it reports more hits
+    print(f"- Substring-only hits rejected by word boundaries: {naive_hits - matcher_hits}")
+
+if __name__ == "__main__":
+    main()
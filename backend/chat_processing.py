@@ -2,10 +2,10 @@ import logging
 import re
 import requests
 from datetime import datetime, timedelta
-from flask import current_app
-from models import DetectionLog, Stream, ChaturbateStream, StripchatStream
-from extensions import db
-from utils.notifications import emit_notification
+from keyword_matcher import get_keyword_matcher
+from flagged_terms import get_flagged_keywords
+from stream_context import get_stream_context
+from detection_writer import queue_detection_log
 import random
 import time
 from gevent.lock import Semaphore
@@ -110,76 +110,22 @@ def get_random_proxy():
     return None
 
 def refresh_flagged_keywords():
-    """Retrieve current flagged keywords from database"""
-    with current_app.app_context():
-        from models import ChatKeyword
-        keywords = [kw.keyword.lower() for kw in ChatKeyword.query.all()]
-    logger.debug(f"Retrieved {len(keywords)} flagged keywords")
-    return keywords
+    """Retrieve current flagged keywords from the versioned cache"""
+    return get_flagged_keywords()
 
 def get_stream_info(room_url):
-    """Identify platform, streamer, and broadcaster UID from URL, prioritizing room_url"""
-    with current_app.app_context():
-        # First, try matching the room_url directly in the streams table
-        stream = Stream.query.filter_by(room_url=room_url).first()
-        if stream:
-            logger.debug(f"Found stream by room_url: {room_url}, type: {stream.type}, username: {stream.streamer_username}")
-            # For Chaturbate, fetch broadcaster_uid from ChaturbateStream
-            if stream.type.lower() == 'chaturbate':
-                cb_stream = ChaturbateStream.query.filter_by(id=stream.id).first()
-                broadcaster_uid = cb_stream.broadcaster_uid if cb_stream else None
-                return stream.type.lower(), stream.streamer_username, broadcaster_uid
-            return stream.type.lower(), stream.streamer_username, None
-        
-        # Fallback to checking m3u8 URLs (for video/audio monitoring scenarios)
-        cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=room_url).first()
-        if cb_stream:
-            stream = Stream.query.get(cb_stream.id)
-            logger.debug(f"Found stream by chaturbate_m3u8_url: {room_url}, type: chaturbate, username: {stream.streamer_username}")
-            return 'chaturbate', stream.streamer_username, cb_stream.broadcaster_uid
-        
-        sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=room_url).first()
-        if sc_stream:
-            stream = Stream.query.get(sc_stream.id)
-            logger.debug(f"Found stream by stripchat_m3u8_url: {room_url}, type: stripchat, username: {stream.streamer_username}")
-            return 'stripchat', stream.streamer_username, None
-        
-        logger.warning(f"No stream found for URL: {room_url}")
+    """Identify platform, streamer, and broadcaster UID from a room or m3u8 URL"""
+    context = get_stream_context(room_url)
+    if context is None:
         return 'unknown', 'unknown', None
+    return context.platform, context.streamer, context.broadcaster_uid
 
 def get_stream_assignment(room_url):
     """Get assignment info for a stream"""
-    from sqlalchemy.orm import joinedload
-    with current_app.app_context():
-        stream = Stream.query.filter_by(room_url=room_url).first()
-        if not stream:
-            cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=room_url).first()
-            if cb_stream:
-                stream = Stream.query.get(cb_stream.id)
-            else:
-                sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=room_url).first()
-                if sc_stream:
-                    stream = Stream.query.get(sc_stream.id)
-        
-        if not stream:
-            logger.warning(f"No stream found for URL: {room_url}")
-            return None, None
-        
-        from models import Assignment
-        query = Assignment.query.options(
-            joinedload(Assignment.agent),
-            joinedload(Assignment.stream)
-        ).filter_by(stream_id=stream.id)
-        
-        assignments = query.all()
-        
-        if not assignments:
-            logger.info(f"No assignments found for stream: {room_url}")
-            return None, None
-        
-        assignment = assignments[0]
-        agent_id = assignment.agent_id
-        return assignment.id, agent_id
+    context = get_stream_context(room_url)
+    if context is None or context.assignment_id is None:
+        return None, None
+    return context.assignment_id, context.agent_id
 
 def fetch_chaturbate_room_uid(streamer_username):
     """Fetch Chaturbate room UID and broadcaster UID"""
@@ -355,8 +301,8 @@ def process_chat_messages(messages, room_url):
     if not ENABLE_CHAT_MONITORING:
         logger.info(f"Chat monitoring disabled for {room_url}")
         return []
-    keywords = refresh_flagged_keywords()
-    if not keywords:
+    matcher = get_keyword_matcher(refresh_flagged_keywords())
+    if not matcher:
         logger.debug(f"No flagged keywords found for {room_url}")
         return []
     detected = []
@@ -366,20 +312,19 @@ def process_chat_messages(messages, room_url):
         text = msg.get("message", "").lower()
         user = msg.get("username", "unknown")
         timestamp = msg.get("timestamp", now.isoformat())
-        for keyword in keywords:
-            if keyword in text:
-                if keyword in last_chat_alerts.get(room_url, {}):
-                    last_alert = last_chat_alerts[room_url][keyword]
-                    if (now - last_alert).total_seconds() < CHAT_ALERT_COOLDOWN:
-                        continue
-                last_chat_alerts.setdefault(room_url, {})[keyword] = now
-                detected.append({
-                    "type": "keyword",
-                    "keyword": keyword,
-                    "message": text,
-                    "username": user,
-                    "timestamp": timestamp
-                })
+        for keyword in matcher.findall(text):
+            if keyword in last_chat_alerts.get(room_url, {}):
+                last_alert = last_chat_alerts[room_url][keyword]
+                if (now - last_alert).total_seconds() < CHAT_ALERT_COOLDOWN:
+                    continue
+            last_chat_alerts.setdefault(room_url, {})[keyword] = now
+            detected.append({
+                "type": "keyword",
+                "keyword": keyword,
+                "message": text,
+                "username": user,
+                "timestamp": timestamp
+            })
         sentiment = analyzer.polarity_scores(text)
         if sentiment['compound'] <= NEGATIVE_SENTIMENT_THRESHOLD:
             sentiment_key = f"_negative_sentiment_{user}"
@@ -405,37 +350,29 @@ def log_chat_detection(detections, room_url):
         return
     platform, streamer, _ = get_stream_info(room_url)
     assignment_id, agent_id = get_stream_assignment(room_url)
-    with current_app.app_context():
-        for det in detections:
-            event_type = "chat_sentiment_detection" if det.get("type") == "sentiment" else "chat_detection"
-            details = {
-                "detection": det,
-                "timestamp": datetime.now().isoformat(),
-                "streamer_name": streamer,
-                "platform": platform,
-                "assigned_agent": agent_id
-            }
-            log_entry = DetectionLog(
-                room_url=room_url,
-                event_type=event_type,
-                details=details,
-                timestamp=datetime.now(),
-                assigned_agent=agent_id,
-                assignment_id=assignment_id,
-                read=False
-            )
-            db.session.add(log_entry)
-            db.session.commit()
-            notification_data = {
-                "id": log_entry.id,
-                "event_type": log_entry.event_type,
-                "timestamp": log_entry.timestamp.isoformat(),
-                "details": log_entry.details,
-                "read": log_entry.read,
-                "room_url": log_entry.room_url,
-                "streamer": streamer,
-                "platform": platform,
-                "assigned_agent": "Unassigned" if not agent_id else "Agent"
-            }
-            emit_notification(notification_data)
-            logger.info(f"Logged and notified individual {event_type} for {room_url}: {det.get('keyword', det.get('sentiment_score'))}")
\ No newline at end of file
+    notification_extra = {
+        "streamer": streamer,
+        "platform": platform,
+        "assigned_agent": "Unassigned" if not agent_id else "Agent"
+    }
+    for det in detections:
+        event_type = "chat_sentiment_detection" if det.get("type") == "sentiment" else "chat_detection"
+        details = {
+            "detection": det,
+            "timestamp": datetime.now().isoformat(),
+            "streamer_name": streamer,
+            "platform": platform,
+            "assigned_agent": agent_id
+        }
+        queue_detection_log(
+            {
+                "room_url": room_url,
+                "event_type": event_type,
+                "details": details,
+                "timestamp": datetime.now(),
+                "assigned_agent": agent_id,
+                "assignment_id": assignment_id
+            },
+            notification_extra
+        )
+        logger.info(f"Queued {event_type} for {room_url}: {det.get('keyword', det.get('sentiment_score'))}")
\ No newline at end of file
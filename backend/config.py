@@ -78,8 +78,10 @@ class Config:
     # Redis Cache Settings
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 1800))  # 30 minutes
     STREAM_STATUS_CACHE_TIMEOUT = int(os.getenv('STREAM_STATUS_CACHE_TIMEOUT', 300))
-    DASHBOARD_STATS_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_STATS_CACHE_TIMEOUT', 300))
+    DASHBOARD_SNAPSHOT_MAX_AGE = int(os.getenv('DASHBOARD_SNAPSHOT_MAX_AGE', 300))
     SESSION_CACHE_TIMEOUT = int(os.getenv('SESSION_CACHE_TIMEOUT', 86400))
+    FLAGGED_TERMS_MAX_AGE = int(os.getenv('FLAGGED_TERMS_MAX_AGE', 300))  # Reload fallback when Redis pub/sub is down
+    NOTIFICATION_LIST_CACHE_TIMEOUT = int(os.getenv('NOTIFICATION_LIST_CACHE_TIMEOUT', 1800))  # Writes bump the list version, so this only bounds memory
 
     # ─── CORS ────────────────────────────────────────────────────────────
     CORS_SUPPORTS_CREDENTIALS = True
@@ -90,10 +92,42 @@ class Config:
     VIEWER_COUNT_INTERVAL = int(os.getenv('VIEWER_COUNT_INTERVAL', '30'))
     NOTIFICATION_DEBOUNCE = int(os.getenv('NOTIFICATION_DEBOUNCE', '300'))
     AUDIO_SAMPLE_DURATION = float(os.getenv('AUDIO_SAMPLE_DURATION', '30'))
+    AUDIO_WINDOW_OVERLAP = float(os.getenv('AUDIO_WINDOW_OVERLAP', '2'))
+    AUDIO_VAD_ENABLED = os.getenv('AUDIO_VAD_ENABLED', 'true').lower() == 'true'
+    AUDIO_VAD_ENERGY_RATIO = float(os.getenv('AUDIO_VAD_ENERGY_RATIO', '3.0'))
+    AUDIO_VAD_MIN_SPEECH = float(os.getenv('AUDIO_VAD_MIN_SPEECH', '1.0'))
     AUDIO_BUFFER_SIZE = int(os.getenv('AUDIO_BUFFER_SIZE', '3'))
     AUDIO_SEGMENT_LENGTH = int(os.getenv('AUDIO_SEGMENT_LENGTH', '15'))
+    INGEST_PACKET_QUEUE_SIZE = int(os.getenv('INGEST_PACKET_QUEUE_SIZE', '256'))
+    INGEST_HEARTBEAT_INTERVAL = float(os.getenv('INGEST_HEARTBEAT_INTERVAL', '5'))  # Seconds between heartbeat writes
+    INGEST_HEARTBEAT_TTL = int(os.getenv('INGEST_HEARTBEAT_TTL', '30'))
+    DETECTION_WRITE_BATCH_SIZE = int(os.getenv('DETECTION_WRITE_BATCH_SIZE', '200'))
+    DETECTION_WRITE_FLUSH_INTERVAL = float(os.getenv('DETECTION_WRITE_FLUSH_INTERVAL', '1.0'))
+    EVIDENCE_STORE_BACKEND = os.getenv('EVIDENCE_STORE_BACKEND', 'local')
+    EVIDENCE_STORE_PATH = os.getenv('EVIDENCE_STORE_PATH', 'detections/evidence')
+    EVIDENCE_PUBLIC_URL = os.getenv('EVIDENCE_PUBLIC_URL', os.getenv('MAIN_APP_URL', ''))  # Host serving /evidence/<key>
+    EVIDENCE_THUMBNAIL_WIDTH = int(os.getenv('EVIDENCE_THUMBNAIL_WIDTH', '320'))
+    EVIDENCE_THUMBNAIL_QUALITY = int(os.getenv('EVIDENCE_THUMBNAIL_QUALITY', '70'))
+    EVIDENCE_JPEG_QUALITY = int(os.getenv('EVIDENCE_JPEG_QUALITY', '85'))
+    EVIDENCE_WORKERS = int(os.getenv('EVIDENCE_WORKERS', '2'))
+    EVIDENCE_QUEUE_SIZE = int(os.getenv('EVIDENCE_QUEUE_SIZE', '64'))
+    MONITOR_MAX_SESSIONS = int(os.getenv('MONITOR_MAX_SESSIONS', '20'))
+    MONITOR_COST_BUDGET = float(os.getenv('MONITOR_COST_BUDGET', '4.0'))
+    MONITOR_MAX_PENDING = int(os.getenv('MONITOR_MAX_PENDING', '100'))
+    MONITOR_DEFAULT_STREAM_COST = float(os.getenv('MONITOR_DEFAULT_STREAM_COST', '0.2'))
+    MONITOR_STATE_INTERVAL = float(os.getenv('MONITOR_STATE_INTERVAL', '5'))  # Seconds between session state writes to Redis
+    MONITOR_STATE_TTL = int(os.getenv('MONITOR_STATE_TTL', '20'))
     AUDIO_ALERT_COOLDOWN = int(os.getenv('AUDIO_ALERT_COOLDOWN', '60'))
     VISUAL_ALERT_COOLDOWN = int(os.getenv('VISUAL_ALERT_COOLDOWN', '30'))
+    VIDEO_SAMPLE_INTERVAL = float(os.getenv('VIDEO_SAMPLE_INTERVAL', '5'))
+    VIDEO_SAMPLING_POLICY = os.getenv('VIDEO_SAMPLING_POLICY', 'keyframe').lower()
+    DETECTOR_INPUT_SIZE = int(os.getenv('DETECTOR_INPUT_SIZE', '640'))
+    YOLO_BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', '8'))
+    YOLO_BATCH_MAX_WAIT = float(os.getenv('YOLO_BATCH_MAX_WAIT', '0.05'))
+    # Model worker processes; 0 runs the model inside the serving process
+    YOLO_WORKERS = int(os.getenv('YOLO_WORKERS', '1'))
+    WHISPER_WORKERS = int(os.getenv('WHISPER_WORKERS', '1'))
+    INFERENCE_WORKER_TIMEOUT = int(os.getenv('INFERENCE_WORKER_TIMEOUT', '120'))
     CHAT_ALERT_COOLDOWN = int(os.getenv('CHAT_ALERT_COOLDOWN', '45'))
     NEGATIVE_SENTIMENT_THRESHOLD = float(os.getenv('NEGATIVE_SENTIMENT_THRESHOLD', '-0.5'))
     WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'base')
@@ -170,7 +204,8 @@ def create_app(config_class=Config, blueprint=None):
         app,
         supports_credentials=config_class.CORS_SUPPORTS_CREDENTIALS,
         origins=[u.strip() for u in config_class.CORS_ORIGINS],
-        resources={r"/api/*": {}, r"/socket.io/*": {}}
+        resources={r"/api/*": {}, r"/socket.io/*": {}},
+        expose_headers=['X-Next-Cursor', 'ETag']
     )
 
     @event.listens_for(Engine, "connect")
@@ -0,0 +1,167 @@
+"""
+dashboard_snapshot.py - Admin dashboard kept as a prebuilt snapshot
+
+/api/dashboard used to load every stream and then query User once per stream
+for its agent. The result was cached for minutes, and nothing refreshed it
+when a stream went offline or an agent logged in. The dashboard is now a
+snapshot in Redis:
+
+- dashboard:streams holds one serialized entry per stream.
+- dashboard:snapshot holds the assembled response body and its version.
+
+Writes that change a stream, its assignments, its status or the presence of
+its agent call refresh_dashboard() after they commit. Only the affected
+entries are rebuilt, then the body is reassembled under a new version. A
+request reads only the version, and serves the body from this process's copy
+unless the version moved, so its cost does not depend on the number of
+streams. The version doubles as an ETag for conditional GETs. A snapshot
+older than DASHBOARD_SNAPSHOT_MAX_AGE is rebuilt from scratch, in case an
+event was missed. Without Redis each request builds the dashboard directly.
+"""
+import hashlib
+import logging
+import time
+import orjson
+from flask import current_app
+from sqlalchemy.orm import selectin_polymorphic
+from extensions import redis_service
+from models import Assignment, ChaturbateStream, Stream, StripchatStream
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+STREAMS_KEY = "dashboard:streams"
+SNAPSHOT_KEY = "dashboard:snapshot"
+REBUILD_LOCK_KEY = "dashboard:rebuild"
+
+# (version, body) last served by this process
+_local = (None, None)
+
+def _redis_client():
+    if redis_service is None or not redis_service.is_available():
+        return None
+    return redis_service.redis_client
+
+def _load_streams(stream_ids=None):
+    # Subclass columns and assignments with their agents come in a fixed number of queries
+    query = Stream.query.options(selectin_polymorphic(Stream, [ChaturbateStream, StripchatStream]))
+    if stream_ids is not None:
+        query = query.filter(Stream.id.in_(stream_ids))
+    return query.all()
+
+def _entry(stream):
+    assignment = stream.assignments[0] if stream.assignments else None
+    agent = assignment.agent if assignment else None
+    agent_data = None
+    if agent and agent.role == "agent":
+        agent_data = {
+            "id": agent.id,
+            "username": agent.username,
+            "role": agent.role,
+            "online": agent.online
+        }
+    return {
+        **stream.serialize(),
+        "agent": agent_data,
+        "confidence": 0.8
+    }
+
+def _assemble(entries):
+    """Response body from serialized entries, without decoding them again"""
+    ordered = [entries[key] for key in sorted(entries, key=int)]
+    return '{"ongoing_streams":%d,"streams":[%s]}' % (len(ordered), ",".join(ordered))
+
+def _serialize(stream):
+    return orjson.dumps(_entry(stream)).decode()
+
+def _publish(client):
+    """Reassemble the body from the entries and store it under a new version"""
+    def build(pipe):
+        entries = pipe.hgetall(STREAMS_KEY)
+        version = int(pipe.hget(SNAPSHOT_KEY, "version") or 0) + 1
+        pipe.multi()
+        pipe.hset(SNAPSHOT_KEY, mapping={
+            "version": version,
+            "body": _assemble(entries),
+            "built_at": int(time.time())
+        })
+    # Retried if another process changed an entry while this one was assembling
+    client.transaction(build, STREAMS_KEY, SNAPSHOT_KEY)
+
+def rebuild_dashboard():
+    """Rebuild every entry and the snapshot from the database"""
+    client = _redis_client()
+    if client is None:
+        return
+    entries = {str(stream.id): _serialize(stream) for stream in _load_streams()}
+    try:
+        pipe = client.pipeline()
+        pipe.delete(STREAMS_KEY)
+        if entries:
+            pipe.hset(STREAMS_KEY, mapping=entries)
+        pipe.execute()
+        _publish(client)
+    except Exception as e:
+        logger.error(f"Error rebuilding dashboard snapshot: {e}")
+
+def refresh_dashboard(stream_ids=None, agent_id=None):
+    """Rebuild the entries for these streams, or for an agent's streams; call after commit"""
+    client = _redis_client()
+    if client is None:
+        return
+    ids = set(stream_ids or ())
+    if agent_id is not None:
+        ids.update(stream_id for (stream_id,) in Assignment.query.with_entities(
+            Assignment.stream_id).filter_by(agent_id=agent_id))
+    if not ids:
+        return
+    streams = {str(stream.id): stream for stream in _load_streams(ids)}
+    removed = [str(stream_id) for stream_id in ids if str(stream_id) not in streams]
+    try:
+        pipe = client.pipeline()
+        if streams:
+            pipe.hset(STREAMS_KEY, mapping={key: _serialize(stream) for key, stream in streams.items()})
+        if removed:
+            pipe.hdel(STREAMS_KEY, *removed)
+        pipe.execute()
+        _publish(client)
+    except Exception as e:
+        logger.error(f"Error refreshing dashboard streams {sorted(ids)}: {e}")
+
+def _build_direct():
+    body = _assemble({str(stream.id): _serialize(stream) for stream in _load_streams()})
+    return hashlib.sha1(body.encode()).hexdigest(), body
+
+def dashboard_snapshot():
+    """(etag, JSON body) of the current dashboard; etag is None when no snapshot version exists"""
+    global _local
+    client = _redis_client()
+    if client is None:
+        return _build_direct()
+    try:
+        version, built_at = client.hmget(SNAPSHOT_KEY, "version", "built_at")
+        max_age = current_app.config.get('DASHBOARD_SNAPSHOT_MAX_AGE', 300)
+        if version is None or built_at is None:
+            rebuild_dashboard()
+            version = client.hget(SNAPSHOT_KEY, "version")
+        elif time.time() - int(built_at) > max_age and client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=60):
+            # One request rebuilds an old snapshot; the rest keep serving it meanwhile
+            rebuild_dashboard()
+            version = client.hget(SNAPSHOT_KEY, "version")
+        if version is None:
+            # The rebuild failed; serve a fresh build without an ETag rather than one naming no version
+            return None, _build_direct()[1]
+        if version != _local[0]:
+            version, body = client.hmget(SNAPSHOT_KEY, "version", "body")
+            if body is None:
+                return _build_direct()
+            _local = (version, body)
+        return f"dashboard-{_local[0]}", _local[1]
+    except Exception as e:
+        logger.error(f"Error reading dashboard snapshot: {e}")
+        return _build_direct()
@@ -4,7 +4,7 @@
 from extensions import db
 from models import (User, Stream, ChaturbateStream, StripchatStream, 
                     Assignment, Log, ChatKeyword, FlaggedObject, 
-                    TelegramRecipient, DetectionLog, ChatMessage, 
+                    TelegramRecipient, DetectionLog, AgentInbox, ChatMessage, 
                     PasswordReset, PasswordResetToken)
 from flask import Flask
 from config import create_app
@@ -49,6 +49,10 @@ def init_db():
         db.create_all(tables=[DetectionLog.__table__, ChatMessage.__table__, Log.__table__])
         logging.info("Created log tables")
         
+        # 5. Create tables that reference the log tables
+        db.create_all(tables=[AgentInbox.__table__])
+        logging.info("Created agent inbox table")
+        
         # Create default admin user
         admin_exists = User.query.filter_by(role='admin').first()
         if not admin_exists:
@@ -0,0 +1,213 @@
+"""
+detection_writer.py - Write-behind, batched persistence of DetectionLog rows
+
+Video, audio and chat detections used to commit one transaction per row, so a
+burst of chat hits became one commit per message. Detections are now queued
+here from every monitor session and written by one background greenlet. It
+flushes when a batch is full or a short interval has passed, using a single
+bulk insert per batch. Socket notifications are emitted after the flush,
+once the rows have ids. close() drains the queue and is called at exit.
+"""
+import atexit
+import logging
+from datetime import datetime
+from time import monotonic
+import gevent
+from gevent.queue import Queue, Empty
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import DetectionLog
+from utils.notifications import emit_notification
+from notification_feed import summarize_entry, bump_notifications_version
+from agent_inbox import add_to_inbox
+from unread_counters import alerts_created
+from stream_context import stream_contexts
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+_writer = None
+
+# Queued by close() so the writer flushes everything ahead of it and exits
+_STOP = object()
+
+class DetectionLogWriter:
+    """Queue of pending DetectionLog rows flushed in batches by a background greenlet"""
+
+    def __init__(self, app, batch_size=200, flush_interval=1.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = Queue()
+        self._closed = False
+        self._greenlet = gevent.spawn(self._run)
+
+    def submit(self, row, notification_extra=None):
+        """Queue DetectionLog column values; notification_extra is merged into the emitted notification"""
+        row.setdefault('timestamp', datetime.now())
+        row.setdefault('read', False)
+        if self._closed:
+            # Late detections during shutdown are written directly rather than dropped
+            self._flush([(row, notification_extra)])
+            return
+        self._queue.put((row, notification_extra))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _collect(self):
+        """Next batch, plus whether close() has asked the writer to stop"""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if not batch:
+                continue
+            try:
+                self._flush(batch)
+            except Exception as e:
+                logger.error(f"Detection log flush failed; {len(batch)} rows lost: {e}")
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            entries = [DetectionLog(**row) for row, _ in batch]
+            try:
+                db.session.add_all(entries)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Bulk insert of {len(entries)} detection logs failed, retrying row by row: {e}")
+                entries = self._insert_individually(batch)
+            logger.debug(f"Flushed {len(entries)} detection logs")
+            # File each alert in the inboxes of the agents who should see it
+            try:
+                add_to_inbox(entries)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error filing {len(entries)} detection logs in agent inboxes: {e}")
+            alerts_created(entries)
+            # Cached notification lists are stale once the batch is visible
+            bump_notifications_version()
+            for entry, (_, extra) in zip(entries, batch):
+                if entry is None:
+                    continue
+                # Same compact fields as the inbox lists, plus the full details for live pushes
+                notification_data = summarize_entry(entry)
+                notification_data["details"] = entry.details
+                notification_data.update(extra or {})
+                try:
+                    emit_notification(notification_data)
+                except Exception as e:
+                    logger.error(f"Error emitting notification for detection log {entry.id}: {e}")
+
+    @staticmethod
+    def _insert_row(row):
+        entry = DetectionLog(**row)
+        try:
+            db.session.add(entry)
+            db.session.commit()
+            return entry
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _reassign(row):
+        """Row values with the stream's current assignment, after its cached one was deleted"""
+        context = stream_contexts.lookup(row.get('room_url'))
+        if context is not None:
+            stream_contexts.invalidate(context.stream_id)
+            context = stream_contexts.lookup(row.get('room_url'))
+        return {
+            **row,
+            'assignment_id': context.assignment_id if context else None,
+            'assigned_agent': context.agent_id if context else None
+        }
+
+    def _insert_individually(self, batch):
+        """Fallback so one bad row cannot take the rest of its batch down with it"""
+        entries = []
+        for row, _ in batch:
+            try:
+                entries.append(self._insert_row(row))
+                continue
+            except IntegrityError as e:
+                error = e
+                stale = row.get('assignment_id') is not None or row.get('assigned_agent') is not None
+            except Exception as e:
+                error, stale = e, False
+            if stale:
+                # The assignment or agent was deleted while the monitor still held it
+                logger.error(f"Detection log for {row.get('room_url')} referenced removed assignment "
+                             f"{row.get('assignment_id')} / agent {row.get('assigned_agent')}; retrying with the current one")
+                try:
+                    entries.append(self._insert_row(self._reassign(row)))
+                    continue
+                except Exception as e:
+                    error = e
+            logger.critical(f"DROPPED detection log for {row.get('room_url')} ({row.get('event_type')}): {error}")
+            entries.append(None)
+        return entries
+
+    def close(self, timeout=30):
+        """Write everything still queued, then stop the background greenlet"""
+        if self._closed:
+            return
+        self._closed = True
+        remaining = self._queue.qsize()
+        self._queue.put(_STOP)
+        self._greenlet.join(timeout=timeout)
+        if not self._greenlet.dead:
+            logger.error(f"Detection log writer did not drain within {timeout}s")
+            self._greenlet.kill()
+        elif remaining:
+            logger.info(f"Drained {remaining} queued detection logs on shutdown")
+
+def get_detection_writer():
+    """Return the process-wide writer, starting it on first use"""
+    global _writer
+    if _writer is None:
+        config = current_app.config
+        _writer = DetectionLogWriter(
+            current_app._get_current_object(),
+            batch_size=config.get('DETECTION_WRITE_BATCH_SIZE', 200),
+            flush_interval=config.get('DETECTION_WRITE_FLUSH_INTERVAL', 1.0)
+        )
+    return _writer
+
+def queue_detection_log(row, notification_extra=None):
+    """Queue a DetectionLog row for the next batched write"""
+    get_detection_writer().submit(row, notification_extra)
+
+@atexit.register
+def shutdown_detection_writer():
+    """Flush queued detection logs before the process exits"""
+    if _writer is not None:
+        try:
+            _writer.close()
+        except Exception as e:
+            logger.error(f"Error draining detection log writer: {e}")
@@ -0,0 +1,135 @@
+"""
+evidence_pipeline.py - Asynchronous rendering of detection evidence images
+
+Annotating a full-resolution frame and JPEG-encoding it used to run inline
+in the monitor greenlet, stalling frame sampling for every alert. Detections
+are now handed to an EvidencePipeline and the consumer moves on at once.
+Worker greenlets run the drawing, resizing, encoding and blob writes on
+gevent's native threadpool, where OpenCV releases the GIL. They then queue
+the DetectionLog row.
+
+Each alert gets two tiers: a small thumbnail, encoded first, that
+notifications display straight away, and the full-size annotated image,
+fetched on demand from its URL. If the pipeline is saturated, or rendering
+fails, the alert is still logged, just without evidence, so the stream is
+never blocked and no alert is lost.
+"""
+import logging
+from datetime import datetime
+import cv2
+import gevent
+from gevent.queue import Queue, Full
+from flask import current_app
+from evidence_store import get_evidence_store, evidence_refs
+from detection_writer import queue_detection_log
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+_pipeline = None
+
+def annotate_frame(frame, detections):
+    """Draw detection boxes on frame"""
+    try:
+        annotated = frame.copy()
+        for det in detections:
+            x1, y1, x2, y2 = map(int, det["bbox"])
+            label = f'{det["class"]} {det["confidence"]*100:.1f}%'
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(annotated, label, (x1, y1-10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        return annotated
+    except Exception as e:
+        logger.error(f"Error annotating frame: {e}")
+        return frame  # Return original frame if annotation fails
+
+def render_evidence(frame, detections, store, jpeg_quality=85, thumbnail_quality=70, thumbnail_width=320):
+    """Annotate, encode and store both tiers; returns (image_key, thumbnail_key). Runs off the hub."""
+    if hasattr(frame, 'to_ndarray'):
+        # Decoded PyAV frames are converted here so the colour conversion is off the hub too
+        frame = frame.to_ndarray(format='bgr24')
+    annotated = annotate_frame(frame, detections)
+    height, width = annotated.shape[:2]
+    if width > thumbnail_width:
+        thumbnail = cv2.resize(annotated, (thumbnail_width, max(1, height * thumbnail_width // width)), interpolation=cv2.INTER_AREA)
+    else:
+        thumbnail = annotated
+    success, thumbnail_buffer = cv2.imencode('.jpg', thumbnail, [cv2.IMWRITE_JPEG_QUALITY, thumbnail_quality])
+    if not success:
+        raise RuntimeError("Thumbnail encoding failed")
+    thumbnail_key = store.put(thumbnail_buffer.tobytes(), 'jpg')
+    success, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    if not success:
+        raise RuntimeError("Frame encoding failed")
+    image_key = store.put(buffer.tobytes(), 'jpg')
+    return image_key, thumbnail_key
+
+class EvidencePipeline:
+    """Bounded queue of detections whose evidence is rendered by background workers"""
+
+    def __init__(self, app, workers=2, queue_size=64, jpeg_quality=85, thumbnail_quality=70, thumbnail_width=320):
+        self.app = app
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_quality = thumbnail_quality
+        self.thumbnail_width = thumbnail_width
+        self.dropped = 0
+        self._queue = Queue(maxsize=queue_size)
+        self._workers = [gevent.spawn(self._work) for _ in range(max(1, workers))]
+
+    def submit(self, frame, detections, row, notification_extra):
+        """Queue evidence for a detection without blocking; returns False if it was skipped"""
+        try:
+            self._queue.put_nowait((frame, detections, row, notification_extra))
+            return True
+        except Full:
+            self.dropped += 1
+            logger.warning(f"Evidence queue full; logging {row.get('room_url')} alert without evidence ({self.dropped} skipped so far)")
+            queue_detection_log(row, notification_extra)
+            return False
+
+    def _work(self):
+        with self.app.app_context():
+            while True:
+                job = self._queue.get()
+                try:
+                    self._render(*job)
+                except Exception as e:
+                    logger.error(f"Error logging video detection: {e}")
+
+    def _render(self, frame, detections, row, notification_extra):
+        try:
+            store = get_evidence_store()
+            image_key, thumbnail_key = gevent.get_hub().threadpool.apply(
+                render_evidence,
+                (frame, detections, store, self.jpeg_quality, self.thumbnail_quality, self.thumbnail_width)
+            )
+            # The row and every notification carry references only; the images live in the blob store
+            row["details"].update(evidence_refs(image_key, thumbnail_key))
+        except Exception as e:
+            logger.error(f"Error rendering evidence for {row.get('room_url')}; logging alert without it: {e}")
+        queue_detection_log(row, notification_extra)
+
+def get_evidence_pipeline():
+    """Return the process-wide pipeline, starting its workers on first use"""
+    global _pipeline
+    if _pipeline is None:
+        config = current_app.config
+        _pipeline = EvidencePipeline(
+            current_app._get_current_object(),
+            workers=config.get('EVIDENCE_WORKERS', 2),
+            queue_size=config.get('EVIDENCE_QUEUE_SIZE', 64),
+            jpeg_quality=config.get('EVIDENCE_JPEG_QUALITY', 85),
+            thumbnail_quality=config.get('EVIDENCE_THUMBNAIL_QUALITY', 70),
+            thumbnail_width=config.get('EVIDENCE_THUMBNAIL_WIDTH', 320)
+        )
+    return _pipeline
+
+def submit_video_evidence(frame, detections, row, notification_extra=None):
+    """Render evidence for an object detection and then queue its DetectionLog row"""
+    row.setdefault("timestamp", datetime.now())
+    return get_evidence_pipeline().submit(frame, detections, row, notification_extra)
@@ -0,0 +1,144 @@
+"""
+evidence_store.py - Content-addressed storage for detection evidence images
+
+Annotated frames used to be stored in the DetectionLog row twice: as raw
+bytes in detection_image and base64-encoded in details. Both copies were then
+sent with every notification list and socket push. Images are now written to
+a blob store keyed by their SHA-256. The row keeps only the keys and the URLs
+of the full image and its thumbnail, which are served by the cacheable
+/evidence/<key> endpoint. Identical images are stored once.
+
+The local filesystem backend is the default. Other backends can be added by
+subclassing BlobStore and calling register_blob_backend().
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from flask import current_app
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# A key is the hex SHA-256 of the content plus its file extension
+BLOB_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}\.(jpg|png|webp)$')
+
+CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp'
+}
+
+class BlobStore:
+    """Interface for evidence blob backends"""
+
+    def put(self, data, extension='jpg'):
+        """Store bytes and return their content-addressed key"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """Return the bytes stored under key, or None"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path for key if the backend has one, so it can be streamed directly"""
+        return None
+
+    @staticmethod
+    def make_key(data, extension):
+        return f"{hashlib.sha256(data).hexdigest()}.{extension}"
+
+class LocalBlobStore(BlobStore):
+    """Blobs under root/<aa>/<bb>/<key>, written atomically and never rewritten"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data, extension='jpg'):
+        key = self.make_key(data, extension)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return key
+
+    def get(self, key):
+        path = self.local_path(key)
+        if path is None:
+            return None
+        with open(path, 'rb') as blob:
+            return blob.read()
+
+    def local_path(self, key):
+        if not BLOB_KEY_PATTERN.match(key):
+            return None
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+BLOB_BACKENDS = {
+    'local': lambda config: LocalBlobStore(config.get('EVIDENCE_STORE_PATH', 'detections/evidence'))
+}
+
+_stores = {}
+
+def register_blob_backend(name, factory):
+    """Make a backend selectable with EVIDENCE_STORE_BACKEND; factory receives the Flask config"""
+    BLOB_BACKENDS[name] = factory
+
+def get_evidence_store():
+    """Return the configured blob store for this process"""
+    config = current_app.config
+    name = config.get('EVIDENCE_STORE_BACKEND', 'local')
+    store = _stores.get(name)
+    if store is None:
+        if name not in BLOB_BACKENDS:
+            raise ValueError(f"Unknown evidence store backend: {name}")
+        store = _stores[name] = BLOB_BACKENDS[name](config)
+    return store
+
+def evidence_url(key):
+    """Public URL for a stored blob"""
+    base = current_app.config.get('EVIDENCE_PUBLIC_URL', '').rstrip('/')
+    return f"{base}/evidence/{key}"
+
+def evidence_refs(image_key, thumbnail_key):
+    """References kept on the row for a stored evidence image and its thumbnail"""
+    return {
+        "image_ref": image_key,
+        "image_url": evidence_url(image_key),
+        "thumbnail_ref": thumbnail_key,
+        "thumbnail_url": evidence_url(thumbnail_key)
+    }
+
+def load_evidence_image(log_entry):
+    """Full-size evidence bytes for a DetectionLog, from the blob store or the legacy column"""
+    details = log_entry.details or {}
+    key = details.get('image_ref')
+    if key:
+        try:
+            data = get_evidence_store().get(key)
+            if data is not None:
+                return data
+            logger.warning(f"Evidence blob {key} missing for detection log {log_entry.id}")
+        except Exception as e:
+            logger.error(f"Error reading evidence blob {key}: {e}")
+    return log_entry.detection_image
@@ -0,0 +1,144 @@
+"""
+flagged_terms.py - Versioned process-local cache of flagged keywords and objects
+
+Detection code reads the flagged keyword and object sets on every chat batch,
+transcript and sampled frame. Reading them from the database each time adds a
+round trip to every inference step, so each process keeps a copy here.
+Whenever the keyword/object routes change the data, they bump a version
+counter in Redis and publish it. Every process listens on that channel and
+reloads only when it sees a newer version. If Redis is unavailable, the cache
+falls back to reloading after FLAGGED_TERMS_MAX_AGE seconds.
+"""
+import logging
+from time import monotonic
+import gevent
+from flask import current_app
+from gevent.lock import Semaphore
+from extensions import redis_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "flagged_terms:version"
+CHANNEL = "flagged_terms"
+
+def _redis_client():
+    if redis_service is None or not redis_service.is_available():
+        return None
+    return redis_service.redis_client
+
+class FlaggedTermsCache:
+    """Flagged keywords and {object_name: confidence_threshold}, reloaded when the version moves"""
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self.version = None
+        self._keywords = None
+        self._objects = None
+        self._loaded_at = None
+        self._stale = True
+        self._lock = Semaphore()
+        self._listener = None
+
+    def keywords(self):
+        self._ensure_fresh()
+        return self._keywords
+
+    def objects(self):
+        self._ensure_fresh()
+        return self._objects
+
+    def invalidate(self, version=None):
+        """Mark the cache stale, unless version shows it is already current"""
+        if version is not None and self.version is not None and version <= self.version:
+            return
+        self._stale = True
+
+    def _ensure_fresh(self):
+        self._ensure_listener()
+        expired = self._loaded_at is None or monotonic() - self._loaded_at > self.max_age
+        if not (self._stale or expired):
+            return
+        with self._lock:
+            expired = self._loaded_at is None or monotonic() - self._loaded_at > self.max_age
+            if self._stale or expired:
+                self._load()
+
+    def _load(self):
+        from models import ChatKeyword, FlaggedObject
+        # Read the version first so a bump racing with the load triggers another reload
+        self._stale = False
+        version = self._read_version()
+        try:
+            with current_app.app_context():
+                keywords = [kw.keyword.lower() for kw in ChatKeyword.query.all()]
+                objects = {obj.object_name.lower(): float(obj.confidence_threshold) for obj in FlaggedObject.query.all()}
+        except Exception as e:
+            self._stale = True
+            logger.error(f"Error loading flagged terms: {e}")
+            if self._keywords is None:
+                return
+            # Keep serving the last good copy until the database answers again
+            self._loaded_at = monotonic()
+            return
+        self._keywords = keywords
+        self._objects = objects
+        self.version = version
+        self._loaded_at = monotonic()
+        logger.info(f"Loaded flagged terms version {version}: {len(keywords)} keywords, {len(objects)} objects")
+
+    def _read_version(self):
+        client = _redis_client()
+        if client is None:
+            return None
+        try:
+            value = client.get(VERSION_KEY)
+            return int(value) if value else 0
+        except Exception as e:
+            logger.error(f"Error reading flagged terms version: {e}")
+            return None
+
+    def _ensure_listener(self):
+        if self._listener is None and _redis_client() is not None:
+            self._listener = gevent.spawn(self._listen)
+
+    def _listen(self):
+        """Invalidate the cache whenever another process publishes a new version"""
+        redis_service.listen(
+            [CHANNEL],
+            lambda channel, data: self.invalidate((data or {}).get('version')),
+            on_subscribe=self.invalidate
+        )
+
+flagged_terms_cache = FlaggedTermsCache()
+
+def get_flagged_keywords():
+    """Current flagged keywords, lowercased"""
+    flagged_terms_cache.max_age = current_app.config.get('FLAGGED_TERMS_MAX_AGE', flagged_terms_cache.max_age)
+    return flagged_terms_cache.keywords() or []
+
+def get_flagged_objects():
+    """Current flagged objects as {object_name: confidence_threshold}"""
+    flagged_terms_cache.max_age = current_app.config.get('FLAGGED_TERMS_MAX_AGE', flagged_terms_cache.max_age)
+    return flagged_terms_cache.objects() or {}
+
+def bump_flagged_terms_version(kind):
+    """Record a keyword/object change and tell every process to reload; call after commit"""
+    flagged_terms_cache.invalidate()
+    client = _redis_client()
+    if client is None:
+        logger.warning(f"Redis unavailable; other processes pick up the {kind} change within {flagged_terms_cache.max_age}s")
+        return None
+    try:
+        version = client.incr(VERSION_KEY)
+        redis_service.publish_notification(CHANNEL, {"version": version, "kind": kind})
+        logger.info(f"Flagged terms version bumped to {version} ({kind} changed)")
+        return version
+    except Exception as e:
+        logger.error(f"Error bumping flagged terms version: {e}")
+        return None
@@ -61,4 +61,10 @@ def post_worker_init(worker):
     worker.log.info("Worker initialized (pid: %s)", worker.pid)
 
 def worker_abort(worker):
-    worker.log.info("Worker aborted (pid: %s)", worker.pid)
\ No newline at end of file
+    worker.log.info("Worker aborted (pid: %s)", worker.pid)
+
+def worker_exit(server, worker):
+    # Write any detection logs still queued by the write-behind writer
+    from detection_writer import shutdown_detection_writer
+    shutdown_detection_writer()
+    server.log.info("Worker exited (pid: %s)", worker.pid)
@@ -0,0 +1,230 @@
+"""
+inference_workers.py - Out-of-process model workers for YOLO and Whisper
+
+The monitor runs under gevent, so a long model call in the serving process
+freezes every greenlet. Each pool here owns its models in separate worker
+processes. Frames and audio are copied into a per-worker shared-memory buffer
+and only a small descriptor and the results cross the pipe. The calling
+greenlet waits on the pipe cooperatively, so HTTP handlers, heartbeats and
+chat polling keep running while inference is in progress.
+"""
+import atexit
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from gevent.lock import Semaphore
+from gevent.queue import Queue
+from gevent.socket import wait_read
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = Semaphore()
+
+def yolo_predict(model, frames, imgsz):
+    """Run YOLO on a list of frames; returns per-frame lists of (class_name, confidence, xyxy)"""
+    results = model(frames, imgsz=imgsz, verbose=False)
+    output = []
+    for result in results:
+        detections = []
+        for box in result.boxes:
+            cls_id = int(box.cls[0].cpu().numpy())
+            detections.append((
+                model.names.get(cls_id, str(cls_id)).lower(),
+                float(box.conf[0].cpu().numpy()),
+                box.xyxy[0].cpu().numpy().tolist()
+            ))
+        output.append(detections)
+    return output
+
+def whisper_transcribe(model, audio):
+    """Transcribe 16 kHz mono float32 audio and return the stripped text"""
+    result = model.transcribe(audio, fp16=False, verbose=False)
+    return result.get("text", "").strip()
+
+def _load_model(kind, options):
+    if kind == 'yolo':
+        from ultralytics import YOLO
+        import torch
+        torch.backends.nnpack.enabled = False  # Disable NNPACK to avoid warnings
+        model = YOLO(options.get('weights', 'yolov8s.pt'), verbose=False)
+        model.verbose = False
+        return model
+    import whisper
+    return whisper.load_model(options.get('model_size', 'base'))
+
+def _worker_main(kind, options, conn):
+    """Worker process loop: load the model once, then serve requests until the pipe closes"""
+    model = None
+    shm = None
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        shm_name, shape, dtype, params = message
+        try:
+            if model is None:
+                model = _load_model(kind, options)
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            if kind == 'yolo':
+                payload = yolo_predict(model, [array[i] for i in range(shape[0])], params.get('imgsz', 640))
+            else:
+                payload = whisper_transcribe(model, array)
+            del array
+            conn.send((True, payload))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    if shm is not None:
+        shm.close()
+
+class _Worker:
+    """One model process plus the shared-memory buffer used to hand it input"""
+
+    def __init__(self, context, kind, options, index):
+        self.context = context
+        self.kind = kind
+        self.options = options
+        self.index = index
+        self.shm = None
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_worker_main,
+            args=(self.kind, self.options, child_conn),
+            name=f"{self.kind}-inference-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        logger.info(f"Started {self.process.name} (pid {self.process.pid})")
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+    def restart(self):
+        logger.warning(f"Restarting {self.process.name}")
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        self.start()
+
+    def release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def call(self, shape, dtype, fill, params, timeout):
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if self.shm is None or self.shm.size < nbytes:
+            self.release()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        fill(view)
+        del view
+        self.conn.send((self.shm.name, shape, np.dtype(dtype).str, params))
+        wait_read(self.conn.fileno(), timeout=timeout)
+        ok, payload = self.conn.recv()
+        if not ok:
+            raise RuntimeError(f"{self.kind} worker error: {payload}")
+        return payload
+
+class InferenceWorkerPool:
+    """A fixed set of model processes for one model kind ('yolo' or 'whisper')"""
+
+    def __init__(self, kind, size, options=None, timeout=120):
+        self.kind = kind
+        self.timeout = timeout
+        # Pools start lazily inside a monkey-patched gevent process with open DB/Redis
+        # sockets and threadpool threads; spawn gives workers a fresh interpreter
+        # instead of a fork that copies held locks and shared connections
+        context = multiprocessing.get_context('spawn')
+        self._workers = [_Worker(context, kind, options or {}, i) for i in range(max(1, size))]
+        self._idle = Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @property
+    def size(self):
+        return len(self._workers)
+
+    def _call(self, shape, dtype, fill, params):
+        worker = self._idle.get()
+        try:
+            return worker.call(shape, dtype, fill, params, self.timeout)
+        except Exception:
+            # A timed-out or crashed worker may still answer later; never reuse its pipe
+            worker.restart()
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def detect(self, frames, imgsz):
+        """Run YOLO on equally-shaped frames; returns per-frame detection tuples"""
+        def fill(view):
+            for i, frame in enumerate(frames):
+                view[i] = frame
+        return self._call((len(frames),) + frames[0].shape, frames[0].dtype, fill, {'imgsz': imgsz})
+
+    def transcribe(self, audio, scale=1.0):
+        """Transcribe 16 kHz mono float32 audio, multiplied by scale on the way into shared memory"""
+        audio = np.asarray(audio, dtype=np.float32)
+        def fill(view):
+            np.multiply(audio, scale, out=view)
+        return self._call(audio.shape, np.float32, fill, {})
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.stop()
+            worker.release()
+
+def get_inference_pool(kind, config):
+    """Return the pool for a model kind, starting it on first use; None when workers are disabled"""
+    size = config.get('YOLO_WORKERS' if kind == 'yolo' else 'WHISPER_WORKERS', 0)
+    if size <= 0:
+        return None
+    pool = _pools.get(kind)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        if kind not in _pools:
+            options = {'model_size': config.get('WHISPER_MODEL_SIZE', 'base')} if kind == 'whisper' else {}
+            _pools[kind] = InferenceWorkerPool(
+                kind, size, options, timeout=config.get('INFERENCE_WORKER_TIMEOUT', 120)
+            )
+    return _pools[kind]
+
+@atexit.register
+def shutdown_inference_workers():
+    """Stop all worker processes and free their shared memory"""
+    for kind in list(_pools):
+        try:
+            _pools.pop(kind).shutdown()
+        except Exception as e:
+            logger.error(f"Error shutting down {kind} inference workers: {e}")
@@ -0,0 +1,114 @@
+"""
+ingest_heartbeat.py - Per-stream liveness published by the monitor's ingest
+
+The monitor already pulls every monitored stream, yet the status checker
+probed the same playlists again every minute. While a StreamIngest is
+running it now publishes a heartbeat to Redis every few seconds: last packet
+time, bitrate over the last interval, packet count and decode errors. The
+key expires soon after the ingest stops. The status checker reads the
+heartbeats of all streams in one round trip and probes only the streams
+that have none.
+"""
+import logging
+import time
+from extensions import redis_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_KEY = "ingest:heartbeat:{}"
+
+def _redis_client():
+    if redis_service is None or not redis_service.is_available():
+        return None
+    return redis_service.redis_client
+
+class IngestHeartbeat:
+    """Packet statistics for one ingest, written to Redis at most once per interval"""
+
+    def __init__(self, stream_id, interval=5, ttl=30):
+        self.key = HEARTBEAT_KEY.format(stream_id)
+        self.interval = interval
+        self.ttl = ttl
+        self.packets = 0
+        self.last_packet = None
+        self._window_bytes = 0
+        self._window_started = time.monotonic()
+
+    def packet(self, size, decode_errors=0):
+        """Record one demuxed packet and publish if the interval has passed"""
+        self.packets += 1
+        self.last_packet = time.time()
+        self._window_bytes += size or 0
+        elapsed = time.monotonic() - self._window_started
+        if elapsed >= self.interval:
+            self._publish(self._window_bytes * 8 / elapsed, decode_errors)
+            self._window_bytes = 0
+            self._window_started = time.monotonic()
+
+    def _publish(self, bitrate, decode_errors):
+        client = _redis_client()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline()
+            pipe.hset(self.key, mapping={
+                "last_packet": self.last_packet,
+                "bitrate": int(bitrate),
+                "packets": self.packets,
+                "decode_errors": decode_errors,
+                "updated_at": time.time()
+            })
+            pipe.expire(self.key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error publishing ingest heartbeat {self.key}: {e}")
+
+    def close(self):
+        """Drop the heartbeat so the status checker probes the stream again"""
+        client = _redis_client()
+        if client is None:
+            return
+        try:
+            client.delete(self.key)
+        except Exception as e:
+            logger.error(f"Error clearing ingest heartbeat {self.key}: {e}")
+
+def read_heartbeats(stream_ids):
+    """{stream_id: heartbeat dict} for the streams that have a live ingest"""
+    client = _redis_client()
+    if client is None or not stream_ids:
+        return {}
+    try:
+        pipe = client.pipeline()
+        for stream_id in stream_ids:
+            pipe.hgetall(HEARTBEAT_KEY.format(stream_id))
+        results = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading ingest heartbeats: {e}")
+        return {}
+    heartbeats = {}
+    for stream_id, data in zip(stream_ids, results):
+        if data:
+            heartbeats[stream_id] = {
+                "last_packet": float(data.get("last_packet") or 0),
+                "bitrate": int(data.get("bitrate") or 0),
+                "packets": int(data.get("packets") or 0),
+                "decode_errors": int(data.get("decode_errors") or 0),
+                "updated_at": float(data.get("updated_at") or 0)
+            }
+    return heartbeats
+
+def heartbeat_status(heartbeat, stall_after=30):
+    """'online' while packets keep arriving, 'offline' once the ingest has gone quiet
+
+    Same vocabulary as the playlist probes, so a stream moving between a heartbeat
+    and a probe does not register as a status change. Whether it is monitored is
+    tracked separately on Stream.is_monitored.
+    """
+    return 'online' if time.time() - heartbeat["last_packet"] <= stall_after else 'offline'
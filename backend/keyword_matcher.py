@@ -0,0 +1,117 @@
+"""
+keyword_matcher.py - Compiled multi-keyword matching for chat and transcripts
+
+Flagged keywords are compiled once into an Aho-Corasick automaton, so a text
+is scanned in a single pass no matter how many keywords are flagged. A hit
+only counts when it starts and ends on a word boundary, so "ass" no longer
+matches inside "class". The compiled matcher is cached and rebuilt only when
+the keyword set changes.
+"""
+import logging
+from collections import OrderedDict, deque
+from gevent.lock import Semaphore
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# Compiled matchers keyed by keyword set; a few are kept because running
+# sessions may still hold an older set than the one in the database
+MATCHER_CACHE_SIZE = 4
+_matchers = OrderedDict()
+_matchers_lock = Semaphore()
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a set of lowercase keywords"""
+
+    def __init__(self, keywords):
+        self.keywords = frozenset(kw.strip().lower() for kw in keywords if kw and kw.strip())
+        # State 0 is the root; each state has a transition dict, a failure link and its outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for keyword in sorted(self.keywords):
+            self._add(keyword)
+        self._link()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] = (keyword,)
+
+    def _link(self):
+        """Breadth-first pass computing failure links and merged outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def iter_matches(self, text):
+        """Yield (keyword, start, end) for every whole-word hit in text"""
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        length = len(text)
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            end = index + 1
+            if end < length and _is_word_char(text[end]):
+                continue
+            for keyword in output[state]:
+                start = end - len(keyword)
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                yield keyword, start, end
+
+    def findall(self, text):
+        """Distinct keywords found in text, in order of first occurrence"""
+        if not self.keywords or not text:
+            return []
+        found = {}
+        for keyword, _, _ in self.iter_matches(text):
+            found.setdefault(keyword, None)
+        return list(found)
+
+def get_keyword_matcher(keywords):
+    """Return the shared matcher for a keyword list, recompiling only when the set changes"""
+    keyword_set = frozenset(kw.strip().lower() for kw in keywords if kw and kw.strip())
+    with _matchers_lock:
+        matcher = _matchers.get(keyword_set)
+        if matcher is None:
+            matcher = KeywordMatcher(keyword_set)
+            logger.info(f"Compiled keyword matcher for {len(keyword_set)} keywords")
+            _matchers[keyword_set] = matcher
+            while len(_matchers) > MATCHER_CACHE_SIZE:
+                _matchers.popitem(last=False)
+        else:
+            _matchers.move_to_end(keyword_set)
+        return matcher
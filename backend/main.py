@@ -14,7 +14,8 @@ import secrets
 import string
 from config import create_app, configure_ssl_context
 from extensions import db, socketio
-from models import User
+from models import User, DetectionLog
+from agent_inbox import backfill_inbox
 
 # Configure logging
 logging.basicConfig(
@@ -35,6 +36,10 @@ def initialize_database():
     with app.app_context():
         try:
             db.create_all()
+            # create_all skips tables that already exist, so add indexes introduced since
+            for index in DetectionLog.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+            backfill_inbox()
             logger.info("Database tables initialized")
             admin_exists = User.query.filter_by(role='admin').first()
             if not admin_exists:
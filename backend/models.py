@@ -328,6 +328,8 @@ class DetectionLog(db.Model):
     __table_args__ = (
         db.Index('idx_detection_logs_event_timestamp', 'event_type', 'timestamp'),
         db.Index('idx_detection_logs_assigned_agent', 'assigned_agent'),
+        # Keyset pagination of notification lists on (timestamp, id)
+        db.Index('idx_detection_logs_timestamp_id', 'timestamp', 'id'),
     )
 
     def serialize(self, minimal=False):
@@ -351,6 +353,34 @@ class DetectionLog(db.Model):
             "sender_username": self.sender_username,
         }
 
+class AgentInbox(db.Model):
+    """
+    AgentInbox holds one row per detection an agent should see, written with the detection.
+    Agent notification queries read this table with an index range scan instead of filtering
+    DetectionLog rows on their JSON details.
+    """
+    __tablename__ = "agent_inbox"
+    id = db.Column(db.Integer, primary_key=True)
+    agent_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection_logs.id', ondelete='CASCADE'), nullable=False, index=True)
+    stream_id = db.Column(db.Integer, db.ForeignKey('streams.id', ondelete='CASCADE'), nullable=True, index=True)
+    # Copied from the detection so the agent's inbox pages without touching detection_logs
+    timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
+    read = db.Column(db.Boolean, default=False, nullable=False)
+    # Forwarded entries stay when the stream is reassigned
+    forwarded = db.Column(db.Boolean, default=False, nullable=False)
+
+    detection = db.relationship("DetectionLog", backref=db.backref("inbox_entries", passive_deletes=True))
+
+    __table_args__ = (
+        db.UniqueConstraint('agent_id', 'detection_id', name='uq_agent_inbox_agent_detection'),
+        db.Index('idx_agent_inbox_agent_timestamp', 'agent_id', 'timestamp', 'detection_id'),
+        db.Index('idx_agent_inbox_agent_unread', 'agent_id', 'read'),
+    )
+
+    def __repr__(self):
+        return f"<AgentInbox Agent:{self.agent_id} Detection:{self.detection_id}>"
+
 class MessageAttachment(db.Model):
     """
     MessageAttachment model stores files attached to chat messages.
@@ -0,0 +1,247 @@
+"""
+monitor_scheduler.py - Capacity-aware scheduler for stream monitor sessions
+
+Each monitored stream runs as one session greenlet. The scheduler admits a
+session when there is a free slot and enough cost budget left, using the
+per-stream cost measured from running sessions. Otherwise the stream waits
+in a bounded queue, or is rejected once that queue is full. It also ensures
+only one session exists per stream, and publishes the state of every session
+to Redis for the main app (see monitor_state.py).
+"""
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from time import monotonic, time
+import gevent
+from gevent.event import Event
+from gevent.lock import Semaphore
+from monitor_state import clear_state, publish_states
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# Sessions younger than this report no measured cost yet
+COST_WARMUP_SECONDS = 30
+
+class MonitorSession:
+    """A running or pending monitor session for one stream"""
+
+    def __init__(self, stream_id, stream_url, runner):
+        self.stream_id = stream_id
+        self.stream_url = stream_url
+        self.runner = runner
+        self.cancel_event = Event()
+        self.greenlet = None
+        self.queued_at = datetime.now()
+        self.started_at = None
+        self._started_monotonic = None
+        self._busy_seconds = 0.0
+        self.last_frame_at = None
+        self.last_error = None
+        self.last_error_at = None
+        self.lag = None
+        self._media_origin = None
+
+    def record_busy(self, seconds):
+        """Add time this session spent processing media"""
+        self._busy_seconds += seconds
+
+    def record_frame(self, media_time):
+        """Note a processed frame; lag is how far media time has fallen behind wall time since the first one"""
+        now = monotonic()
+        if self._media_origin is None:
+            self._media_origin = (now, media_time)
+        wall_origin, media_origin = self._media_origin
+        self.lag = max(0.0, (now - wall_origin) - (media_time - media_origin))
+        self.last_frame_at = time()
+
+    def record_error(self, message):
+        self.last_error = message
+        self.last_error_at = time()
+
+    @property
+    def cost(self):
+        """Measured share of one CPU used by this session, or None while warming up"""
+        if self._started_monotonic is None:
+            return None
+        elapsed = monotonic() - self._started_monotonic
+        if elapsed < COST_WARMUP_SECONDS:
+            return None
+        return self._busy_seconds / elapsed
+
+    def serialize(self):
+        cost = self.cost
+        return {
+            "stream_id": self.stream_id,
+            "stream_url": self.stream_url,
+            "queued_at": self.queued_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "cost": round(cost, 4) if cost is not None else None
+        }
+
+    def state(self):
+        """Fields published to monitor:state:<stream_id>"""
+        return {
+            "stream_id": self.stream_id,
+            "state": "running" if self.started_at else "queued",
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "last_frame_at": self.last_frame_at,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "lag": round(self.lag, 2) if self.lag is not None else None
+        }
+
+class MonitorScheduler:
+    """Admission control, pending queue and de-duplication for monitor sessions"""
+
+    def __init__(self, max_sessions=20, cost_budget=4.0, max_pending=100, default_cost=0.2, rejected_history=50,
+                 state_interval=5, state_ttl=20):
+        self.max_sessions = max_sessions
+        self.cost_budget = cost_budget
+        self.max_pending = max_pending
+        self.default_cost = default_cost
+        self.state_interval = state_interval
+        self.state_ttl = state_ttl
+        self._publisher = None
+        self.running = OrderedDict()
+        self.pending = OrderedDict()
+        self.rejected = deque(maxlen=rejected_history)
+        self._lock = Semaphore()
+
+    def configure(self, config):
+        """Apply limits from the Flask config"""
+        self.max_sessions = config.get('MONITOR_MAX_SESSIONS', self.max_sessions)
+        self.cost_budget = config.get('MONITOR_COST_BUDGET', self.cost_budget)
+        self.max_pending = config.get('MONITOR_MAX_PENDING', self.max_pending)
+        self.default_cost = config.get('MONITOR_DEFAULT_STREAM_COST', self.default_cost)
+        self.state_interval = config.get('MONITOR_STATE_INTERVAL', self.state_interval)
+        self.state_ttl = config.get('MONITOR_STATE_TTL', self.state_ttl)
+
+    def estimated_stream_cost(self):
+        """Average measured cost of running sessions, or the configured default"""
+        costs = [session.cost for session in self.running.values() if session.cost is not None]
+        return sum(costs) / len(costs) if costs else self.default_cost
+
+    def committed_cost(self):
+        """Measured cost of running sessions, with unmeasured ones at the estimate"""
+        estimate = self.estimated_stream_cost()
+        return sum(
+            session.cost if session.cost is not None else estimate
+            for session in self.running.values()
+        )
+
+    def _has_capacity(self):
+        if len(self.running) >= self.max_sessions:
+            return False
+        return self.committed_cost() + self.estimated_stream_cost() <= self.cost_budget
+
+    def submit(self, stream_id, stream_url, runner):
+        """Schedule a session; returns 'running', 'queued', 'duplicate' or 'rejected'.
+
+        runner is called with the MonitorSession once the session is admitted.
+        """
+        self._ensure_publisher()
+        with self._lock:
+            if stream_id in self.running or stream_id in self.pending:
+                return 'duplicate'
+            self._admit_pending()
+            session = MonitorSession(stream_id, stream_url, runner)
+            if not self.pending and self._has_capacity():
+                self._start(session)
+                return 'running'
+            if len(self.pending) < self.max_pending:
+                self.pending[stream_id] = session
+                logger.info(f"Queued monitor session for stream {stream_id} ({len(self.pending)} pending)")
+                publish_states([session.state()], self.state_ttl)
+                return 'queued'
+            self.rejected.append({
+                "stream_id": stream_id,
+                "stream_url": stream_url,
+                "rejected_at": datetime.now().isoformat(),
+                "reason": "pending queue full"
+            })
+            logger.warning(f"Rejected monitor session for stream {stream_id}: pending queue full")
+            return 'rejected'
+
+    def cancel(self, stream_id, timeout=2.0):
+        """Stop a running session or drop a pending one; returns True if anything was found"""
+        with self._lock:
+            session = self.pending.pop(stream_id, None)
+            if session is not None:
+                clear_state(stream_id)
+                return True
+            # Forget the session now so a restart is not mistaken for a duplicate while it winds down
+            session = self.running.pop(stream_id, None)
+            if session is not None:
+                clear_state(stream_id)
+        if session is None:
+            return False
+        session.cancel_event.set()
+        # Sessions stop themselves from inside their own greenlet when a stream goes offline
+        if session.greenlet is not None and session.greenlet is not gevent.getcurrent():
+            session.greenlet.join(timeout=timeout)
+        return True
+
+    def is_active(self, stream_id):
+        return stream_id in self.running or stream_id in self.pending
+
+    def get(self, stream_id):
+        return self.running.get(stream_id) or self.pending.get(stream_id)
+
+    def _start(self, session):
+        session.started_at = datetime.now()
+        session._started_monotonic = monotonic()
+        session.greenlet = gevent.spawn(session.runner, session)
+        session.greenlet.link(lambda _: self._finished(session))
+        self.running[session.stream_id] = session
+        publish_states([session.state()], self.state_ttl)
+        logger.info(f"Started monitor session for stream {session.stream_id} ({len(self.running)} running)")
+
+    def _finished(self, session):
+        with self._lock:
+            if self.running.get(session.stream_id) is session:
+                del self.running[session.stream_id]
+                clear_state(session.stream_id)
+            logger.info(f"Monitor session for stream {session.stream_id} ended ({len(self.running)} running)")
+            self._admit_pending()
+
+    def _admit_pending(self):
+        while self.pending and self._has_capacity():
+            _, session = self.pending.popitem(last=False)
+            self._start(session)
+
+    def _ensure_publisher(self):
+        if self._publisher is None or self._publisher.dead:
+            self._publisher = gevent.spawn(self._publish_loop)
+
+    def _publish_loop(self):
+        """Refresh every session's state before its TTL runs out"""
+        while True:
+            gevent.sleep(self.state_interval)
+            # Held across the write: a session cancelled meanwhile would otherwise have its
+            # state written back after clear_state() and reported as detecting until the TTL
+            with self._lock:
+                sessions = list(self.running.values()) + list(self.pending.values())
+                publish_states([session.state() for session in sessions], self.state_ttl)
+
+    def snapshot(self):
+        """Introspection view of running, pending and recently rejected sessions"""
+        return {
+            "limits": {
+                "max_sessions": self.max_sessions,
+                "cost_budget": self.cost_budget,
+                "max_pending": self.max_pending
+            },
+            "committed_cost": round(self.committed_cost(), 4),
+            "estimated_stream_cost": round(self.estimated_stream_cost(), 4),
+            "running": [session.serialize() for session in self.running.values()],
+            "pending": [session.serialize() for session in self.pending.values()],
+            "rejected": list(self.rejected)
+        }
+
+monitor_scheduler = MonitorScheduler()
@@ -0,0 +1,133 @@
+"""
+monitor_state.py - Monitor session state shared with the main app through Redis
+
+The main app used to answer every /api/detection-status request by calling
+the monitor over HTTP with a 60 s timeout, so a busy monitor could hold a
+main-app worker for a full minute. The monitor now writes the state of each
+session to monitor:state:<stream_id>: queued or running, start time, last
+frame time, last error and lag behind the live edge. It rewrites every key
+every MONITOR_STATE_INTERVAL seconds with a TTL of MONITOR_STATE_TTL, and
+deletes the key when the session ends. A missing key therefore means no
+session, including when the monitor itself has died. The main app reads the
+keys directly and never calls the monitor for status.
+
+Per-stream video sampling overrides live next to the state under
+monitor:sampling:<stream_id>, without a TTL, so a stream restarted by a
+refresh, the startup monitor or a new monitor process keeps its override
+until detection is explicitly stopped. Without Redis they last only for the
+session they were given to.
+"""
+import logging
+import time
+from extensions import redis_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "monitor:state:{}"
+SAMPLING_KEY = "monitor:sampling:{}"
+
+def _redis_client():
+    if redis_service is None or not redis_service.is_available():
+        return None
+    return redis_service.redis_client
+
+def publish_states(sessions, ttl=20):
+    """Write the state of these sessions, each as {'stream_id': ..., ...}, in one round trip"""
+    client = _redis_client()
+    if client is None or not sessions:
+        return
+    now = time.time()
+    try:
+        pipe = client.pipeline()
+        for state in sessions:
+            key = STATE_KEY.format(state["stream_id"])
+            # Empty fields are dropped so a cleared error does not linger as ''
+            pipe.delete(key)
+            pipe.hset(key, mapping={
+                **{field: value for field, value in state.items() if value is not None},
+                "updated_at": now
+            })
+            pipe.expire(key, ttl)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error publishing monitor state: {e}")
+
+def clear_state(stream_id):
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        client.delete(STATE_KEY.format(stream_id))
+    except Exception as e:
+        logger.error(f"Error clearing monitor state for stream {stream_id}: {e}")
+
+def read_states(stream_ids):
+    """{stream_id: state} for the streams that have a monitor session, or None without Redis"""
+    client = _redis_client()
+    if client is None:
+        return None
+    if not stream_ids:
+        return {}
+    try:
+        pipe = client.pipeline()
+        for stream_id in stream_ids:
+            pipe.hgetall(STATE_KEY.format(stream_id))
+        results = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading monitor state: {e}")
+        return None
+    states = {}
+    for stream_id, data in zip(stream_ids, results):
+        if data:
+            states[stream_id] = {
+                "state": data.get("state"),
+                "started_at": data.get("started_at"),
+                "last_frame_at": float(data["last_frame_at"]) if data.get("last_frame_at") else None,
+                "last_error": data.get("last_error"),
+                "last_error_at": float(data["last_error_at"]) if data.get("last_error_at") else None,
+                "lag": float(data["lag"]) if data.get("lag") else None,
+                "updated_at": float(data.get("updated_at") or 0)
+            }
+    return states
+
+def save_video_sampling(stream_id, overrides):
+    """Keep the fields a caller overrode, e.g. {'interval': 2}; the rest follow the config"""
+    client = _redis_client()
+    if client is None:
+        return
+    key = SAMPLING_KEY.format(stream_id)
+    mapping = {field: value for field, value in overrides.items() if value is not None}
+    try:
+        pipe = client.pipeline()
+        pipe.delete(key)
+        if mapping:
+            pipe.hset(key, mapping=mapping)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error saving video sampling for stream {stream_id}: {e}")
+
+def read_video_sampling(stream_id):
+    """The stored override for this stream, or None if there is none or Redis is unavailable"""
+    client = _redis_client()
+    if client is None:
+        return None
+    try:
+        return client.hgetall(SAMPLING_KEY.format(stream_id)) or None
+    except Exception as e:
+        logger.error(f"Error reading video sampling for stream {stream_id}: {e}")
+        return None
+
+def clear_video_sampling(stream_id):
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        client.delete(SAMPLING_KEY.format(stream_id))
+    except Exception as e:
+        logger.error(f"Error clearing video sampling for stream {stream_id}: {e}")
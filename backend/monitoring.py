@@ -1,26 +1,29 @@
 import os
 import time
 import logging
-import numpy as np
 from datetime import datetime, timedelta
 import av
 import json
 import hashlib
 import requests
 from flask import current_app
-from models import (
-    ChatKeyword, FlaggedObject, DetectionLog, Stream, User, Assignment,
-    ChaturbateStream, StripchatStream
-)
+from models import Stream, User, ChaturbateStream, StripchatStream
 from extensions import db
 from utils.notifications import emit_notification, emit_stream_update
-from sqlalchemy.orm import joinedload
 import gevent
-from gevent.pool import Pool
 from gevent.lock import Semaphore
-from audio_processing import process_audio_segment, log_audio_detection
-from video_processing import process_video_frame, log_video_detection
-from chat_processing import fetch_chat_messages, process_chat_messages, log_chat_detection, initialize_chat_globals, load_sentiment_analyzer, fetch_chaturbate_room_uid
+from audio_processing import process_audio_segment, log_audio_detection, StreamingTranscriber, TARGET_SAMPLE_RATE
+from video_processing import process_video_frame, log_video_detection, FrameLetterboxer
+from chat_processing import fetch_chat_messages, process_chat_messages, log_chat_detection, initialize_chat_globals, fetch_chaturbate_room_uid
+from stream_ingest import StreamIngest
+from ingest_heartbeat import IngestHeartbeat
+from monitor_scheduler import monitor_scheduler
+from monitor_state import read_video_sampling, save_video_sampling
+from keyword_matcher import get_keyword_matcher
+from flagged_terms import get_flagged_keywords, get_flagged_objects
+from stream_context import get_stream_context, stream_contexts
+from dashboard_snapshot import refresh_dashboard
+from stream_liveness import ENDED, LIVE, forget_playlist, probe_liveness
 from dotenv import load_dotenv
 from time import time
 
@@ -43,10 +46,8 @@ _yolo_lock = Semaphore()
 _sentiment_analyzer = None
 last_visual_alerts = {}
 last_chat_alerts = {}
-stream_processors = {}
 agent_cache = {}
 all_agents_fetched = False
-gevent_pool = Pool(1)  # Limit to one worker to prevent duplicates
 
 # Directory for transcriptions
 TRANSCRIPTION_DIR = os.getenv('TRANSCRIPTION_DIR', '/home/ec2-user/LiveStream_Monitoring_Vue3_Flask/backend/transcriptions/')
@@ -121,43 +122,21 @@ def load_yolo_model():
                 _yolo_model = None
     return _yolo_model
 
-def load_sentiment_analyzer():
-    """Load the VADER sentiment analyzer"""
-    global _sentiment_analyzer
-    if _sentiment_analyzer is None:
-        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-        _sentiment_analyzer = SentimentIntensityAnalyzer()
-    return _sentiment_analyzer
-
 # Data retrieval functions
 def refresh_flagged_keywords():
-    """Retrieve current flagged keywords from database"""
-    with current_app.app_context():
-        keywords = [kw.keyword.lower() for kw in ChatKeyword.query.all()]
-    logger.debug(f"Retrieved {len(keywords)} flagged keywords")
-    return keywords
+    """Retrieve current flagged keywords from the versioned cache"""
+    return get_flagged_keywords()
 
 def refresh_flagged_objects():
-    """Retrieve flagged objects and confidence thresholds"""
-    with current_app.app_context():
-        objects = FlaggedObject.query.all()
-        flagged = {obj.object_name.lower(): float(obj.confidence_threshold) for obj in objects}
-    logger.debug(f"Retrieved {len(flagged)} flagged objects")
-    return flagged
+    """Retrieve flagged objects and confidence thresholds from the versioned cache"""
+    return get_flagged_objects()
 
 def get_stream_info(stream_url):
     """Identify platform and streamer from URL"""
-    with current_app.app_context():
-        cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=stream_url).first()
-        if cb_stream:
-            return 'chaturbate', cb_stream.streamer_username
-        sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=stream_url).first()
-        if sc_stream:
-            return 'stripchat', sc_stream.streamer_username
-        stream = Stream.query.filter_by(room_url=stream_url).first()
-        if stream:
-            return stream.type.lower(), stream.streamer_username
-    return 'unknown', 'unknown'
+    context = get_stream_context(stream_url)
+    if context is None:
+        return 'unknown', 'unknown'
+    return context.platform, context.streamer
 
 def get_m3u8_url(stream):
     """Get the m3u8 URL for a stream"""
@@ -206,31 +185,11 @@ def fetch_agent_username(agent_id):
 
 def get_stream_assignment(stream_url):
     """Get assignment info for a stream"""
-    with current_app.app_context():
-        stream = Stream.query.filter_by(room_url=stream_url).first()
-        if not stream:
-            cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=stream_url).first()
-            if cb_stream:
-                stream = Stream.query.get(cb_stream.id)
-            else:
-                sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=stream_url).first()
-                if sc_stream:
-                    stream = Stream.query.get(sc_stream.id)
-        if not stream:
-            logger.warning(f"No stream found for URL: {stream_url}")
-            return None, None
-        query = Assignment.query.options(
-            joinedload(Assignment.agent),
-            joinedload(Assignment.stream)
-        ).filter_by(stream_id=stream.id)
-        assignments = query.all()
-        if not assignments:
-            logger.info(f"No assignments found for stream: {stream_url}")
-            return None, None
-        assignment = assignments[0]
-        agent_id = assignment.agent_id
-        fetch_agent_username(agent_id)
-        return assignment.id, agent_id
+    context = get_stream_context(stream_url)
+    if context is None or context.assignment_id is None:
+        return None, None
+    fetch_agent_username(context.agent_id)
+    return context.assignment_id, context.agent_id
 
 def save_transcription_to_json(stream_url, transcript, detected_keywords):
     """Save transcription to a JSON file with metadata"""
@@ -253,21 +212,217 @@ def save_transcription_to_json(stream_url, transcript, detected_keywords):
         logger.error(f"Error saving transcription to JSON for {stream_url}: {e}")
 
 def check_stream_availability(stream_url, timeout=10):
-    """Check if the stream URL is accessible"""
+    """Classify the stream's playlist as live, stalled, ended or offline"""
+    liveness = probe_liveness(stream_url, timeout=timeout, stall_after=int(os.getenv('STREAM_STALL_SECONDS', 30)))
+    if liveness == LIVE:
+        logger.debug(f"Stream URL {stream_url} is live")
+    else:
+        logger.warning(f"Stream URL {stream_url} is {liveness}")
+    return liveness
+
+# Video sampling policies:
+#   all      - decode every packet and keep one frame per interval (legacy behaviour)
+#   keyframe - decode only the first keyframe at or after each sampling deadline
+#   deadline - hold the current GOP and decode it only up to the packet that crosses the deadline
+VIDEO_SAMPLING_POLICIES = ('all', 'keyframe', 'deadline')
+
+def resolve_video_sampling(overrides=None):
+    """Merge per-stream video sampling overrides with the configured defaults.
+
+    Only fields that are missing or None fall back to the config; anything given,
+    including 0 or '', is validated as is.
+    """
+    if overrides is None:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        raise ValueError("Video sampling must be an object")
+    policy = overrides.get('policy')
+    if policy is None:
+        policy = current_app.config['VIDEO_SAMPLING_POLICY']
+    policy = str(policy).lower()
+    if policy not in VIDEO_SAMPLING_POLICIES:
+        raise ValueError(f"Invalid video sampling policy: {policy}")
+    interval = overrides.get('interval')
+    if interval is None:
+        interval = current_app.config['VIDEO_SAMPLE_INTERVAL']
+    if isinstance(interval, bool):
+        raise ValueError("Video sample interval must be a number")
     try:
-        response = requests.head(stream_url, timeout=timeout)
-        if response.status_code == 200:
-            logger.debug(f"Stream URL {stream_url} is accessible")
-            return True
-        else:
-            logger.warning(f"Stream URL {stream_url} returned status code {response.status_code}")
-            return False
-    except requests.RequestException as e:
-        logger.error(f"Error checking stream availability for {stream_url}: {e}")
-        return False
+        interval = float(interval)
+    except (TypeError, ValueError):
+        raise ValueError("Video sample interval must be a number")
+    if not interval > 0:
+        raise ValueError("Video sample interval must be positive")
+    return {'policy': policy, 'interval': interval}
+
+class VideoConsumer:
+    """Decode video packets from the ingest and run object detection on sampled frames"""
+
+    def __init__(self, stream_url, sample_interval=5, policy='keyframe', input_size=640, on_frame=None):
+        self.stream_url = stream_url
+        self.on_frame = on_frame
+        self.sample_interval = sample_interval
+        self.policy = policy
+        self.last_process_time = None
+        self.decode_errors = 0
+        self._gop = []
+        self._letterboxer = FrameLetterboxer(input_size)
+
+    def handle_packet(self, packet):
+        try:
+            if self.policy == 'all':
+                for frame in packet.decode():
+                    frame_time = frame.pts * float(packet.stream.time_base)
+                    if self._is_due(frame_time):
+                        self._process_frame(frame, frame_time)
+            else:
+                for frame in self._decode_sampled(packet):
+                    self._process_frame(frame, frame.pts * float(packet.stream.time_base))
+        except av.error.InvalidDataError as e:
+            self.decode_errors += 1
+            logger.warning(f"Invalid data error while decoding video packet for {self.stream_url}: {e}")
+        except Exception as e:
+            self.decode_errors += 1
+            logger.error(f"Unexpected error decoding video packet for {self.stream_url}: {e}")
+
+    def _is_due(self, media_time):
+        return self.last_process_time is None or media_time - self.last_process_time >= self.sample_interval
+
+    def _decode_sampled(self, packet):
+        """Decode only what the sampling policy needs; everything else is never sent to the codec"""
+        timestamp = packet.pts if packet.pts is not None else packet.dts
+        if timestamp is None:
+            # Flush packet at end of stream
+            self._gop = []
+            return []
+        packet_time = timestamp * float(packet.stream.time_base)
+
+        if self.policy == 'keyframe':
+            if packet.is_keyframe and self._is_due(packet_time):
+                return packet.decode()
+            return []
+
+        if packet.is_keyframe:
+            self._gop = [packet]
+        elif self._gop:
+            self._gop.append(packet)
+        if not self._gop or not self._is_due(packet_time):
+            return []
+        frames = []
+        for held in self._gop:
+            frames = held.decode() or frames
+        self._gop = []
+        return frames[-1:]
+
+    def _process_frame(self, frame, frame_time):
+        img, geometry, source_size = self._letterboxer.convert(frame)
+        detections = process_video_frame(img, self.stream_url, geometry=geometry, source_size=source_size)
+        if detections:
+            # Only alerts need a full-resolution evidence image; it is rendered off the hub
+            log_video_detection(detections, frame, self.stream_url)
+        self.last_process_time = frame_time
+        if self.on_frame is not None:
+            self.on_frame(frame_time)
+        logger.debug(f"Processed frame for {self.stream_url} at time {frame_time}")
+
+class AudioConsumer:
+    """Decode audio packets from the ingest and feed them to a VAD-gated streaming transcriber"""
+
+    def __init__(self, stream_url, transcriber):
+        self.stream_url = stream_url
+        self.transcriber = transcriber
+        self.decode_errors = 0
+        self._resampler = None
+        self._resampler_stream = None
+
+    def _resample(self, frame, stream):
+        """Convert a decoded frame to 16 kHz mono float32 samples in FFmpeg's resampler"""
+        if self._resampler is None or self._resampler_stream is not stream:
+            # Rebuilt per input stream so a mid-session format change never reuses stale state
+            self._resampler = av.AudioResampler(format='flt', layout='mono', rate=TARGET_SAMPLE_RATE)
+            self._resampler_stream = stream
+        resampled = self._resampler.resample(frame)
+        if not isinstance(resampled, list):
+            resampled = [resampled] if resampled is not None else []
+        for out in resampled:
+            yield out.to_ndarray()[0]
+
+    def handle_packet(self, packet):
+        try:
+            for frame in packet.decode():
+                for samples in self._resample(frame, packet.stream):
+                    for detections, transcript in self.transcriber.feed(samples):
+                        if transcript:
+                            self.report_segment(detections, transcript)
+        except Exception as e:
+            self.decode_errors += 1
+            logger.error(f"Error processing audio frame for {self.stream_url}: {e}")
+
+    def report_segment(self, detections, transcript):
+        stream_url = self.stream_url
+        logger.info(f"Transcription for {stream_url} at {datetime.now().isoformat()}:\n{transcript}")
+        detected_keywords = []
+        if transcript:
+            # The cached set tracks keyword edits made while the session is running
+            detected_keywords = get_keyword_matcher(refresh_flagged_keywords()).findall(transcript)
+            if detected_keywords:
+                logger.info(f"Keywords detected in transcription: {detected_keywords}")
+        save_transcription_to_json(stream_url, transcript, detected_keywords)
+        for detection in detections:
+            log_audio_detection(detection, stream_url)
+            platform, streamer = get_stream_info(stream_url)
+            notification_data = {
+                "event_type": "audio_keyword_alert",
+                "timestamp": detection["timestamp"],
+                "details": {
+                    "keyword": detection["keyword"],
+                    "transcript": detection["transcript"],
+                    "streamer_name": streamer,
+                    "platform": platform,
+                    "stream_url": stream_url
+                },
+                "read": False,
+                "room_url": stream_url,
+                "streamer": streamer,
+                "platform": platform,
+                "assigned_agent": "Unassigned"
+            }
+            emit_notification(notification_data)
+        if detected_keywords:
+            platform, streamer = get_stream_info(stream_url)
+            notification_data = {
+                "event_type": "audio_keyword_alert",
+                "timestamp": datetime.now().isoformat(),
+                "details": {
+                    "keyword": detected_keywords,
+                    "transcript": transcript,
+                    "streamer_name": streamer or "unknown",
+                    "platform": platform or "unknown",
+                    "stream_url": stream_url
+                },
+                "read": False,
+                "room_url": stream_url,
+                "streamer": streamer or "unknown",
+                "platform": platform or "unknown",
+                "assigned_agent": "Unassigned"
+            }
+            emit_notification(notification_data)
+
+def mark_stream_offline(app, stream_id):
+    """Persist an offline status for a stream and stop its monitor"""
+    with app.app_context():
+        stream = Stream.query.get(stream_id)
+        if stream:
+            stream.status = 'offline'
+            db.session.commit()
+            stop_monitoring(stream)
 
-def process_combined_detection(app, stream_url, cancel_event):
-    """Main monitoring loop processing audio, video, and chat from M3U8 stream with separate AV containers"""
+def process_combined_detection(app, stream_url, cancel_event, video_sampling=None, session=None):
+    """Main monitoring loop processing audio, video, and chat from M3U8 stream through a single demuxed ingest.
+
+    When run under the monitor scheduler, session receives the time spent
+    processing media so admission control can use the stream's measured cost.
+    """
     with app.app_context():
         logger.info(f"Starting monitoring for {stream_url}")
         # Query stream info to get the stream ID
@@ -294,10 +449,37 @@ def process_combined_detection(app, stream_url, cancel_event):
             return
 
         last_chat_process_time = None
-        keywords = refresh_flagged_keywords()
         max_retries = 3
         retry_delay = 10  # Seconds between retries
-        frame_process_times = {}  # Dictionary to store last process time per stream
+        # Consumers outlive container reopens so sampling and audio buffers carry over
+        video_sampling = video_sampling or {
+            'policy': app.config['VIDEO_SAMPLING_POLICY'],
+            'interval': app.config['VIDEO_SAMPLE_INTERVAL']
+        }
+        video_consumer = VideoConsumer(
+            stream_url,
+            video_sampling['interval'],
+            video_sampling['policy'],
+            input_size=app.config['DETECTOR_INPUT_SIZE'],
+            on_frame=session.record_frame if session else None
+        ) if enable_video_monitoring else None
+        audio_consumer = AudioConsumer(
+            stream_url,
+            StreamingTranscriber(
+                stream_url,
+                window=app.config['AUDIO_SAMPLE_DURATION'],
+                overlap=app.config['AUDIO_WINDOW_OVERLAP'],
+                vad_enabled=app.config['AUDIO_VAD_ENABLED'],
+                vad_energy_ratio=app.config['AUDIO_VAD_ENERGY_RATIO'],
+                min_speech=app.config['AUDIO_VAD_MIN_SPEECH']
+            )
+        ) if enable_audio_monitoring else None
+        # Lets the status checker skip probing this stream while packets flow; expires if this worker dies
+        heartbeat = IngestHeartbeat(
+            stream_id,
+            interval=app.config['INGEST_HEARTBEAT_INTERVAL'],
+            ttl=app.config['INGEST_HEARTBEAT_TTL']
+        )
 
         while not cancel_event.is_set():
             with app.app_context():
@@ -316,160 +498,70 @@ def process_combined_detection(app, stream_url, cancel_event):
                     logger.error(f"Error refreshing stream {stream_id}: {e}")
                     break
 
-            if enable_video_monitoring:
+            if enable_video_monitoring or enable_audio_monitoring:
                 retry_count = 0
                 stream_available = False
                 while retry_count < max_retries and not cancel_event.is_set():
-                    if check_stream_availability(stream_url):
+                    liveness = check_stream_availability(stream_url)
+                    if liveness == LIVE:
                         stream_available = True
                         break
+                    if liveness == ENDED:
+                        # The broadcast is over; retrying would only spin on a dead playlist
+                        break
                     logger.warning(f"Stream {stream_url} unavailable, retrying ({retry_count + 1}/{max_retries})")
+                    if session:
+                        session.record_error(f"Stream is {liveness}")
                     retry_count += 1
                     gevent.sleep(retry_delay)
 
                 if not stream_available:
                     logger.error(f"Stream {stream_url} is offline or inaccessible after {max_retries} retries")
-                    with app.app_context():
-                        stream = Stream.query.get(stream_id)
-                        if stream:
-                            stream.status = 'offline'
-                            db.session.commit()
-                            stop_monitoring(stream)
+                    mark_stream_offline(app, stream_id)
                     break
 
+                ingest = StreamIngest(
+                    stream_url,
+                    cancel_event,
+                    app=app,
+                    open_timeout=60,
+                    queue_size=app.config['INGEST_PACKET_QUEUE_SIZE'],
+                    on_busy=session.record_busy if session else None,
+                    heartbeat=heartbeat
+                )
+                if video_consumer:
+                    ingest.add_consumer('video', video_consumer)
+                if audio_consumer:
+                    ingest.add_consumer('audio', audio_consumer)
                 try:
-                    video_container = av.open(stream_url, timeout=60)
-                    logger.info(f"Video stream opened successfully: {stream_url}")
-                    video_stream = next((s for s in video_container.streams if s.type == 'video'), None)
-                    if video_stream:
-                        for packet in video_container.demux(video_stream):
-                            if cancel_event.is_set():
-                                break
-                            try:
-                                for frame in packet.decode():
-                                    frame_time = frame.pts * float(video_stream.time_base)
-                                    last_process_time = frame_process_times.get(stream_url)
-                                    if last_process_time is None or frame_time - last_process_time >= 5:
-                                        img = frame.to_ndarray(format='bgr24')
-                                        detections = process_video_frame(img, stream_url)
-                                        if detections:
-                                            log_video_detection(detections, img, stream_url)
-                                        frame_process_times[stream_url] = frame_time
-                                        logger.debug(f"Processed frame for {stream_url} at time {frame_time}")
-                            except av.error.InvalidDataError as e:
-                                logger.warning(f"Invalid data error while decoding video packet for {stream_url}: {e}")
-                                continue
-                            except Exception as e:
-                                logger.error(f"Unexpected error decoding video packet for {stream_url}: {e}")
-                                continue
-                    video_container.close()
+                    ingest.run()
                 except av.error.EOFError as e:
-                    logger.error(f"EOF error opening video stream {stream_url}: {e}")
-                    with app.app_context():
-                        stream = Stream.query.get(stream_id)
-                        if stream:
-                            stream.status = 'offline'
-                            db.session.commit()
-                            stop_monitoring(stream)
+                    logger.error(f"EOF error opening stream {stream_url}: {e}")
+                    if session:
+                        session.record_error(f"EOF error: {e}")
+                    mark_stream_offline(app, stream_id)
                     break
                 except av.error.OSError as e:
-                    logger.error(f"OS error opening video stream {stream_url}: {e}")
+                    logger.error(f"OS error opening stream {stream_url}: {e}")
+                    if session:
+                        session.record_error(f"OS error: {e}")
                     gevent.sleep(retry_delay)
                     continue
                 except av.error.ValueError as e:
-                    logger.error(f"Value error opening video stream {stream_url}: {e}")
+                    logger.error(f"Value error opening stream {stream_url}: {e}")
+                    if session:
+                        session.record_error(f"Value error: {e}")
                     gevent.sleep(retry_delay)
                     continue
                 except Exception as e:
-                    logger.error(f"Unexpected error opening video stream {stream_url}: {e}")
+                    logger.error(f"Unexpected error opening stream {stream_url}: {e}", exc_info=True)
+                    if session:
+                        session.record_error(str(e))
                     gevent.sleep(retry_delay)
                     continue
 
-            if enable_audio_monitoring:
-                try:
-                    audio_container = av.open(stream_url, timeout=60)
-                    logger.info(f"Audio stream opened successfully: {stream_url}")
-                    audio_stream = next((s for s in audio_container.streams if s.type == 'audio'), None)
-                    if audio_stream:
-                        audio_buffer = []
-                        total_audio_duration = 0
-                        sample_rate = audio_stream.rate if audio_stream else 16000
-                        for packet in audio_container.demux(audio_stream):
-                            if cancel_event.is_set():
-                                break
-                            try:
-                                for frame in packet.decode():
-                                    audio_data = frame.to_ndarray().flatten().astype(np.float32) / 32768.0
-                                    frame_duration = frame.samples / sample_rate
-                                    audio_buffer.append(audio_data)
-                                    total_audio_duration += frame_duration
-                                    if total_audio_duration >= current_app.config['AUDIO_SAMPLE_DURATION']:
-                                        combined_audio = np.concatenate(audio_buffer)
-                                        detections, transcript = process_audio_segment(combined_audio, sample_rate, stream_url)
-                                        logger.info(f"Transcription for {stream_url} at {datetime.now().isoformat()}:\n{transcript}")
-                                        detected_keywords = []
-                                        if keywords and transcript:
-                                            detected_keywords = [kw for kw in keywords if kw in transcript.lower()]
-                                            if detected_keywords:
-                                                logger.info(f"Keywords detected in transcription: {detected_keywords}")
-                                        save_transcription_to_json(stream_url, transcript, detected_keywords)
-                                        for detection in detections:
-                                            log_audio_detection(detection, stream_url)
-                                            platform, streamer = get_stream_info(stream_url)
-                                            notification_data = {
-                                                "event_type": "audio_keyword_alert",
-                                                "timestamp": detection["timestamp"],
-                                                "details": {
-                                                    "keyword": detection["keyword"],
-                                                    "transcript": detection["transcript"],
-                                                    "streamer_name": streamer,
-                                                    "platform": platform,
-                                                    "stream_url": stream_url
-                                                },
-                                                "read": False,
-                                                "room_url": stream_url,
-                                                "streamer": streamer,
-                                                "platform": platform,
-                                                "assigned_agent": "Unassigned"
-                                            }
-                                            emit_notification(notification_data)
-                                        if detected_keywords:
-                                            platform, streamer = get_stream_info(stream_url)
-                                            notification_data = {
-                                                "event_type": "audio_keyword_alert",
-                                                "timestamp": datetime.now().isoformat(),
-                                                "details": {
-                                                    "keyword": detected_keywords,
-                                                    "transcript": transcript,
-                                                    "streamer_name": streamer or "unknown",
-                                                    "platform": platform or "unknown",
-                                                    "stream_url": stream_url
-                                                },
-                                                "read": False,
-                                                "room_url": stream_url,
-                                                "streamer": streamer or "unknown",
-                                                "platform": platform or "unknown",
-                                                "assigned_agent": "Unassigned"
-                                            }
-                                            emit_notification(notification_data)
-                                        audio_buffer = []
-                                        total_audio_duration = 0
-                            except Exception as e:
-                                logger.error(f"Error processing audio frame for {stream_url}: {e}")
-                                continue
-                    audio_container.close()
-                except av.error.OSError as e:
-                    logger.error(f"OS error opening audio stream {stream_url}: {e}", exc_info=True)
-                    gevent.sleep(10)
-                except av.error.ValueError as e:
-                    logger.error(f"Value error opening audio stream {stream_url}: {e}", exc_info=True)
-                    gevent.sleep(10)
-                except Exception as e:
-                    logger.error(f"Unexpected error opening audio stream {stream_url}: {e}", exc_info=True)
-                    gevent.sleep(10)
-
             if enable_chat_monitoring:
-                current_time = time.time()
+                current_time = time()
                 if last_chat_process_time is None or current_time - last_chat_process_time >= 30:
                     messages = fetch_chat_messages(stream.room_url)
                     chat_detections = process_chat_messages(messages, stream.room_url)
@@ -479,10 +571,19 @@ def process_combined_detection(app, stream_url, cancel_event):
             if not (enable_video_monitoring or enable_audio_monitoring):
                 gevent.sleep(10)
 
+        heartbeat.close()
+        forget_playlist(stream_url)
         logger.info(f"Stopped monitoring {stream_url}")
 
-def start_monitoring(stream):
-    """Start monitoring a stream for detections, fetching and saving broadcaster_uid for Chaturbate streams if needed"""
+def start_monitoring(stream, video_sampling=None):
+    """Start monitoring a stream for detections, fetching and saving broadcaster_uid for Chaturbate streams if needed.
+
+    video_sampling optionally overrides the configured video sampling policy and
+    interval for this stream, e.g. {'policy': 'deadline', 'interval': 2}. The
+    override is stored in Redis so later starts without one (refreshes, the
+    startup monitor, a restarted monitor) reuse it; without Redis it applies to
+    this session only.
+    """
     start_time = time()
     current_app.logger.info(f"Starting monitoring for stream {stream.id}")
     if not stream:
@@ -495,9 +596,15 @@ def start_monitoring(stream):
     if stream.status == 'offline':
         logger.info(f"Cannot start monitoring for offline stream: {stream.id}")
         return False
+    if video_sampling is None:
+        video_sampling = read_video_sampling(stream.id)
+        resolved_sampling = resolve_video_sampling(video_sampling)
+    else:
+        resolved_sampling = resolve_video_sampling(video_sampling)
+        save_video_sampling(stream.id, video_sampling)
 
     with current_app.app_context():
-        if stream.is_monitored:
+        if monitor_scheduler.is_active(stream.id):
             logger.info(f"Stream already monitored: {stream.room_url}")
             return True
         
@@ -519,30 +626,37 @@ def start_monitoring(stream):
         
         stream.is_monitored = True
         db.session.commit()
+        refresh_dashboard([stream.id])
+        # Resolved once here; detections read it from memory until a stream or assignment change
+        stream_contexts.register(stream)
     
     stream_url = get_m3u8_url(stream)
     if not stream_url:
         logger.error(f"No valid m3u8 URL for stream: {stream.id}")
         return False
     
-    # Check if stream is already being monitored
-    if stream_url in stream_processors:
-        logger.info(f"Stream {stream_url} is already being monitored by another worker")
-        return True
-    
     logger.info(f"Starting monitoring for {stream_url}")
-    cancel_event = gevent.event.Event()
-    task = gevent_pool.spawn(
-        process_combined_detection,
-        current_app._get_current_object(),
+    app = current_app._get_current_object()
+    monitor_scheduler.configure(app.config)
+    state = monitor_scheduler.submit(
+        stream.id,
         stream_url,
-        cancel_event
+        lambda session: process_combined_detection(app, stream_url, session.cancel_event, resolved_sampling, session)
     )
-    stream_processors[stream_url] = (cancel_event, task)
+    if state == 'duplicate':
+        logger.info(f"Stream {stream_url} is already being monitored")
+        return True
+    if state == 'rejected':
+        logger.warning(f"Monitor capacity exhausted; not monitoring stream {stream.id}")
+        with current_app.app_context():
+            stream.is_monitored = False
+            db.session.commit()
+            refresh_dashboard([stream.id])
+        return False
     emit_stream_update({
         'id': stream.id,
         'url': stream_url,
-        'status': 'monitoring',
+        'status': 'monitoring' if state == 'running' else 'queued',
         'type': stream.type,
         'isDetecting': True
     })
@@ -564,14 +678,10 @@ def stop_monitoring(stream):
     with current_app.app_context():
         stream.is_monitored = False
         db.session.commit()
+        refresh_dashboard([stream.id])
     
-    if stream_url in stream_processors:
-        cancel_event, task = stream_processors.get(stream_url, (None, None))
-        if cancel_event:
-            cancel_event.set()
-            if task:
-                task.join(timeout=2.0)
-        del stream_processors[stream_url]
+    monitor_scheduler.cancel(stream.id, timeout=2.0)
+    stream_contexts.invalidate(stream.id)
     
     logger.info(f"Stopped monitoring {stream_url}")
     emit_stream_update({
@@ -609,12 +719,11 @@ def refresh_and_monitor_streams(stream_ids):
                     logger.warning(f"Unsupported platform {stream.type} for stream {stream.id}")
                     continue
                 logger.info(f"Refreshing stream {stream.id} ({stream.type})")
-                task = gevent_pool.spawn(
-                    lambda: requests.post(
-                        f"{current_app.config['BASE_URL']}{endpoint}",
-                        json=payload,
-                        timeout=10
-                    )
+                task = gevent.spawn(
+                    requests.post,
+                    f"{current_app.config['BASE_URL']}{endpoint}",
+                    json=payload,
+                    timeout=10
                 )
                 tasks.append((stream, task))
             except Exception as e:
@@ -0,0 +1,87 @@
+"""
+notification_bulk.py - Set-based read and delete operations on notifications
+
+"Mark all read" and "delete all" used to load every DetectionLog into
+Python objects, flip flags or collect ids row by row, and emit one socket
+event per notification. Each operation here is now a single UPDATE or DELETE
+over DetectionLog, plus the matching agent_inbox update, and returns the
+number of rows it affected. Callers can narrow an operation to a stream,
+one or more event types, or a time range.
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import select
+from models import AgentInbox, DetectionLog, Stream
+from stream_context import StreamContext
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+FILTER_KEYS = ('stream_id', 'event_type', 'since', 'until')
+
+def parse_filters(*sources):
+    """Bulk filters from request args and/or a JSON body; later sources win"""
+    filters = {}
+    for source in sources:
+        for key in FILTER_KEYS:
+            value = (source or {}).get(key)
+            if value not in (None, ''):
+                filters[key] = value
+    return filters
+
+def _parse_time(value, name):
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}")
+
+def filter_conditions(filters):
+    """DetectionLog conditions for parse_filters() output; raises ValueError on bad input"""
+    conditions = []
+    if 'stream_id' in filters:
+        try:
+            stream = Stream.query.get(int(filters['stream_id']))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid stream_id: {filters['stream_id']}")
+        if stream is None:
+            raise ValueError(f"Stream {filters['stream_id']} not found")
+        # Detections are logged under the room URL or the stream's playlist URL
+        conditions.append(DetectionLog.room_url.in_(StreamContext.from_stream(stream).urls()))
+    if 'event_type' in filters:
+        event_types = filters['event_type']
+        if isinstance(event_types, str):
+            event_types = [t.strip() for t in event_types.split(',') if t.strip()]
+        conditions.append(DetectionLog.event_type.in_(event_types))
+    if 'since' in filters:
+        conditions.append(DetectionLog.timestamp >= _parse_time(filters['since'], 'since'))
+    if 'until' in filters:
+        conditions.append(DetectionLog.timestamp < _parse_time(filters['until'], 'until'))
+    return conditions
+
+def mark_read(conditions, agent_id=None):
+    """Mark matching notifications read, for everyone or within one agent's inbox; returns the count"""
+    matching = select(DetectionLog.id).where(*conditions)
+    if agent_id is None:
+        count = DetectionLog.query.filter(*conditions).filter(
+            DetectionLog.read.isnot(True)
+        ).update({"read": True}, synchronize_session=False)
+        inbox = AgentInbox.query.filter(AgentInbox.read == False)
+    else:
+        inbox_ids = select(AgentInbox.detection_id).where(AgentInbox.agent_id == agent_id)
+        count = DetectionLog.query.filter(*conditions).filter(
+            DetectionLog.id.in_(inbox_ids), DetectionLog.read.isnot(True)
+        ).update({"read": True}, synchronize_session=False)
+        inbox = AgentInbox.query.filter(AgentInbox.agent_id == agent_id, AgentInbox.read == False)
+    if conditions:
+        inbox = inbox.filter(AgentInbox.detection_id.in_(matching))
+    inbox.update({"read": True}, synchronize_session=False)
+    return count
+
+def delete(conditions):
+    """Delete matching notifications; inbox rows go with them through the foreign key. Returns the count"""
+    return DetectionLog.query.filter(*conditions).delete(synchronize_session=False)
@@ -0,0 +1,220 @@
+"""
+notification_feed.py - Compact notification projections for inbox lists
+
+Notification lists used to serialise every DetectionLog row in full, including
+the details JSON. That meant a base64 frame or evidence URLs for video alerts,
+whole transcripts for audio and message bodies for chat. List endpoints now
+select only the scalar columns plus a few short fields extracted from details
+inside the database. They return id, type, time, streamer, platform, read
+flag and a one-line summary. The full details stay behind
+GET /api/notifications/<id>, fetched when a user opens an alert.
+
+Lists page with a keyset cursor on (timestamp, id), backed by
+idx_detection_logs_timestamp_id, so a deep page costs the same as the
+first. Rows without a timestamp sort first and page by id alone. Cached
+pages are keyed by a list version held in Redis. Every write that adds,
+removes or changes a notification calls bump_notifications_version(), so
+the next request misses the cache and new alerts appear at once.
+"""
+import base64
+import logging
+from datetime import datetime
+from sqlalchemy import and_, func, or_, tuple_
+from extensions import db, redis_service
+from models import DetectionLog
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# Longest excerpt of a transcript or chat message carried into a summary
+SUMMARY_LENGTH = 120
+
+VERSION_KEY = "notifications:version"
+
+# Column label -> JSON path inside details; only these values leave the database
+_DETAIL_PATHS = {
+    'streamer_name': ('streamer_name',),
+    'platform': ('platform',),
+    'assigned_agent': ('assigned_agent',),
+    'priority': ('priority',),
+    'status': ('status',),
+    'message': ('message',),
+    'keyword': ('keyword',),
+    'transcript': ('transcript',),
+    'detection_keyword': ('detection', 'keyword'),
+    'detection_message': ('detection', 'message'),
+    'detection_sentiment': ('detection', 'sentiment_score'),
+    'object_class': ('detections', 0, 'class'),
+    'object_confidence': ('detections', 0, 'confidence'),
+    'chat_message': ('detections', 0, 'message')
+}
+
+_TRIMMED = {'message', 'transcript', 'detection_message', 'chat_message'}
+
+def _summary_columns(read_column=None, keyset=None):
+    timestamp_column, id_column = keyset or (DetectionLog.timestamp, DetectionLog.id)
+    columns = [
+        DetectionLog.id,
+        DetectionLog.event_type,
+        DetectionLog.timestamp,
+        (read_column if read_column is not None else DetectionLog.read).label('read'),
+        DetectionLog.room_url,
+        # The columns being paged on, so cursors point into the index actually scanned
+        timestamp_column.label('cursor_timestamp'),
+        id_column.label('cursor_id')
+    ]
+    for label, path in _DETAIL_PATHS.items():
+        value = DetectionLog.details[path].as_string()
+        if label in _TRIMMED:
+            # One character over the limit tells summarize() the text was cut
+            value = func.substr(value, 1, SUMMARY_LENGTH + 1)
+        columns.append(value.label(label))
+    return columns
+
+def summary_query(read_column=None, keyset=None):
+    """DetectionLog query selecting only the compact projection; keyset is the (timestamp, id) pair paged on"""
+    return db.session.query(*_summary_columns(read_column, keyset))
+
+def _excerpt(text):
+    if not text:
+        return None
+    text = ' '.join(str(text).split())
+    return text if len(text) <= SUMMARY_LENGTH else text[:SUMMARY_LENGTH - 3].rstrip() + '...'
+
+def _confidence(value):
+    try:
+        return f" {float(value) * 100:.1f}%"
+    except (TypeError, ValueError):
+        return ""
+
+def build_summary(event_type, fields):
+    """One-line description of an alert from the fields named in _DETAIL_PATHS"""
+    get = fields.get
+    if event_type == 'object_detection' and get('object_class'):
+        return f"Detected {get('object_class')}{_confidence(get('object_confidence'))}"
+    if event_type == 'audio_detection':
+        excerpt = _excerpt(get('transcript'))
+        if get('keyword'):
+            return f"Said '{get('keyword')}'" + (f": {excerpt}" if excerpt else "")
+        return excerpt or 'Audio detected'
+    if event_type == 'chat_sentiment_detection':
+        score = get('detection_sentiment')
+        label = f"Negative chat ({float(score):.2f})" if score not in (None, '') else "Negative chat"
+        excerpt = _excerpt(get('detection_message'))
+        return f"{label}: {excerpt}" if excerpt else label
+    if event_type == 'chat_detection':
+        excerpt = _excerpt(get('detection_message') or get('chat_message'))
+        keyword = get('detection_keyword') or get('keyword')
+        if keyword:
+            return f"Chat keyword '{keyword}'" + (f": {excerpt}" if excerpt else "")
+        return excerpt or 'Chat message detected'
+    if event_type in ('stream_status_update', 'stream_status_updated') and get('status'):
+        return _excerpt(get('message')) or f"Stream is {get('status')}"
+    return _excerpt(get('message')) or event_type.replace('_', ' ').capitalize()
+
+def _flatten_details(details):
+    """Pick the _DETAIL_PATHS values out of a full details dict"""
+    fields = {}
+    for label, path in _DETAIL_PATHS.items():
+        value = details
+        for step in path:
+            if isinstance(value, dict):
+                value = value.get(step)
+            elif isinstance(value, list) and isinstance(step, int) and len(value) > step:
+                value = value[step]
+            else:
+                value = None
+                break
+        fields[label] = value
+    return fields
+
+def _compact(id, event_type, timestamp, read, room_url, fields):
+    return {
+        "id": id,
+        "event_type": event_type,
+        "timestamp": timestamp.isoformat() if timestamp else None,
+        "read": bool(read),
+        "room_url": room_url,
+        "streamer": fields.get('streamer_name') or 'Unknown',
+        "platform": fields.get('platform') or 'Unknown',
+        # The SQL projection yields text while live entries hold an agent id; send text from both
+        "assigned_agent": str(fields.get('assigned_agent') or 'Unassigned'),
+        "priority": fields.get('priority') or 'normal',
+        "summary": build_summary(event_type, fields)
+    }
+
+def summarize(row):
+    """Compact dict for a row returned by summary_query()"""
+    fields = row._asdict()
+    return _compact(row.id, row.event_type, row.timestamp, row.read, row.room_url, fields)
+
+def summarize_entry(entry):
+    """Compact dict for a loaded DetectionLog, e.g. one that was just written"""
+    fields = _flatten_details(entry.details or {})
+    return _compact(entry.id, entry.event_type, entry.timestamp, entry.read, entry.room_url, fields)
+
+def newest_first(query, timestamp_column=DetectionLog.timestamp, id_column=DetectionLog.id):
+    """Order a summary query for keyset paging; pass the columns of the index being scanned"""
+    # NULLS FIRST matches a backward scan of the ascending (timestamp, id) index
+    return query.order_by(timestamp_column.desc().nullsfirst(), id_column.desc())
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past row in newest-first order, from its keyset columns"""
+    timestamp = row.cursor_timestamp
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row.cursor_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(timestamp or None, id) from encode_cursor(); raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(timestamp) if timestamp else None), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def after_cursor(query, cursor, timestamp_column=DetectionLog.timestamp, id_column=DetectionLog.id):
+    """Restrict a newest-first query to rows older than the cursor"""
+    if not cursor:
+        return query
+    timestamp, row_id = decode_cursor(cursor)
+    if timestamp is None:
+        # Still among the NULL timestamps, which sort before every dated row
+        return query.filter(or_(
+            and_(timestamp_column.is_(None), id_column < row_id),
+            timestamp_column.isnot(None)
+        ))
+    # A row-value comparison lets the (timestamp, id) index seek straight to the page
+    return query.filter(tuple_(timestamp_column, id_column) < (timestamp, row_id))
+
+def _redis_client():
+    if redis_service is None or not redis_service.is_available():
+        return None
+    return redis_service.redis_client
+
+def notifications_version():
+    """Current list version for cache keys, or None when Redis is unavailable"""
+    client = _redis_client()
+    if client is None:
+        return None
+    try:
+        return int(client.get(VERSION_KEY) or 0)
+    except Exception as e:
+        logger.error(f"Error reading notifications version: {e}")
+        return None
+
+def bump_notifications_version():
+    """Expire every cached notification list; call after committing a notification change"""
+    client = _redis_client()
+    if client is None:
+        return None
+    try:
+        return client.incr(VERSION_KEY)
+    except Exception as e:
+        logger.error(f"Error bumping notifications version: {e}")
+        return None
@@ -5,6 +5,7 @@ from flask import current_app
 from models import Log, User, Stream, Assignment, DetectionLog
 from extensions import db
 from services.notification_service import NotificationService
+from evidence_store import load_evidence_image
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -82,11 +83,12 @@ def send_notifications(log_entry, detections=None, platform_name=None, streamer_
                     f"🔍 Confidence: {conf_str}\n"
                     f"👤 Assigned Agent: {assigned_agent_username}"
                 )
+                image_data = load_evidence_image(log_entry)
                 for recipient in recipients:
-                    if log_entry.detection_image:
+                    if image_data:
                         NotificationService.send_telegram_notification(
                             recipient, log_entry.event_type, {**details, 'message': message}, 
-                            log_entry.room_url, platform, streamer, is_image=True, image_data=log_entry.detection_image
+                            log_entry.room_url, platform, streamer, is_image=True, image_data=image_data
                         )
                     else:
                         NotificationService.send_telegram_notification(
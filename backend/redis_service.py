@@ -4,6 +4,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 import os
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -133,6 +134,41 @@ class RedisService:
             logger.error(f"Subscribe error: {e}")
             return None
     
+    def listen(self, channels: List[str], handler, on_subscribe=None, retry_interval: int = 5):
+        """Deliver decoded messages on channels to handler(channel, data) forever.
+
+        Resubscribes after connection errors. on_subscribe is called after every
+        (re)subscribe, since anything published while disconnected was missed.
+        Run it in its own greenlet or thread.
+        """
+        while True:
+            pubsub = self.subscribe_to_notifications(channels)
+            if pubsub is None:
+                time.sleep(retry_interval)
+                continue
+            try:
+                if on_subscribe:
+                    on_subscribe()
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    try:
+                        data = orjson.loads(message['data'])
+                    except Exception:
+                        data = None
+                    try:
+                        handler(message['channel'], data)
+                    except Exception as e:
+                        logger.error(f"Subscriber handler error on {message['channel']}: {e}")
+            except Exception as e:
+                logger.error(f"Subscriber error on {channels}: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(retry_interval)
+
     def check_rate_limit(self, key: str, limit: int, window: int) -> bool:
         if not self.is_available():
             return True
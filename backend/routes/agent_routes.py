@@ -3,6 +3,14 @@ from flask import Blueprint, request, jsonify, session
 from extensions import db
 from models import User, Assignment, PasswordReset, PasswordResetToken, DetectionLog, MessageAttachment, ChatMessage
 from utils import login_required
+from models import AgentInbox
+from notification_feed import summarize, bump_notifications_version
+from agent_inbox import inbox_summary_query, in_inbox, mark_inbox_read
+from utils.notifications import emit_notifications_bulk_update
+import notification_bulk
+from unread_counters import alerts_bulk_read, alerts_read
+from dashboard_snapshot import refresh_dashboard
+from stream_context import publish_stream_context_change
 
 agent_bp = Blueprint('agent', __name__)
 
@@ -62,6 +70,8 @@ def update_agent(agent_id):
         agent.receive_updates = bool(data["receive_updates"])
     
     db.session.commit()
+    if "username" in data or "online" in data:
+        refresh_dashboard(agent_id=agent.id)
     return jsonify({"message": "Agent updated", "agent": agent.serialize()})
 
 @agent_bp.route("/api/agents/<int:agent_id>", methods=["DELETE"])
@@ -72,6 +82,8 @@ def delete_agent(agent_id):
         return jsonify({"message": "Agent not found"}), 404
     
     try:
+        stream_ids = [assignment.stream_id for assignment in agent.assignments]
+        
         # Unassign detection logs (set assigned_agent to null)
         DetectionLog.query.filter_by(assigned_agent=agent_id).update({"assigned_agent": None})
         
@@ -90,6 +102,11 @@ def delete_agent(agent_id):
         # Delete the agent (assignments are cascaded automatically due to cascade="all, delete")
         db.session.delete(agent)
         db.session.commit()
+        bump_notifications_version()
+        # Monitors must drop the deleted assignments before their next detection
+        for stream_id in stream_ids:
+            publish_stream_context_change(stream_id)
+        refresh_dashboard(stream_ids)
         
         return jsonify({"message": "Agent deleted successfully"}), 200
     except Exception as e:
@@ -119,28 +136,12 @@ def get_agent_notifications():
         return jsonify({"error": "Agent not found"}), 404
     
     try:
-        # Get all notifications from the detection log
-        notifications = DetectionLog.query.order_by(DetectionLog.timestamp.desc()).all()
-        
-        # Filter for ones assigned to this agent
-        agent_notifications = []
-        for notification in notifications:
-            details = notification.details or {}
-            assigned_agent = details.get('assigned_agent')
-            
-            # Check if this notification is assigned to the current agent
-            if assigned_agent and assigned_agent.lower() == agent.username.lower():
-                agent_notifications.append({
-                    "id": notification.id,
-                    "event_type": notification.event_type,
-                    "timestamp": notification.timestamp.isoformat(),
-                    "details": notification.details,
-                    "read": notification.read,
-                    "room_url": notification.room_url,
-                    "assigned_agent": assigned_agent
-                })
+        # Compact summaries from the agent's inbox, an index range scan on (agent_id, timestamp)
+        notifications = inbox_summary_query(agent.id).order_by(
+            AgentInbox.timestamp.desc(), AgentInbox.detection_id.desc()
+        ).all()
         
-        return jsonify(agent_notifications), 200
+        return jsonify([summarize(n) for n in notifications]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -160,15 +161,16 @@ def mark_agent_notification_read(notification_id):
         if not notification:
             return jsonify({"message": "Notification not found"}), 404
         
-        # Verify this notification is assigned to this agent
-        details = notification.details or {}
-        assigned_agent = details.get('assigned_agent')
-        
-        if not assigned_agent or assigned_agent.lower() != agent.username.lower():
+        # Verify this notification is in this agent's inbox
+        if not in_inbox(agent.id, notification_id):
             return jsonify({"error": "Notification not assigned to this agent"}), 403
         
+        was_unread = not notification.read
         notification.read = True
+        changed = mark_inbox_read([notification_id], agent_id=agent.id)
         db.session.commit()
+        bump_notifications_version()
+        alerts_read(changed, admin=was_unread)
         return jsonify({"message": "Notification marked as read"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -185,19 +187,16 @@ def mark_all_agent_notifications_read():
         return jsonify({"error": "Agent not found"}), 404
     
     try:
-        # Get all notifications assigned to this agent
-        notifications = DetectionLog.query.all()
-        
-        count = 0
-        for notification in notifications:
-            details = notification.details or {}
-            assigned_agent = details.get('assigned_agent')
-            
-            if assigned_agent and assigned_agent.lower() == agent.username.lower() and not notification.read:
-                notification.read = True
-                count += 1
+        filters = notification_bulk.parse_filters(request.args, request.get_json(silent=True))
+        count = notification_bulk.mark_read(notification_bulk.filter_conditions(filters), agent_id=agent.id)
         
         db.session.commit()
-        return jsonify({"message": f"Marked {count} notifications as read"}), 200
+        bump_notifications_version()
+        alerts_bulk_read(count, agent.id)
+        emit_notifications_bulk_update('read', count, filters, agent.id)
+        return jsonify({"message": f"Marked {count} notifications as read", "count": count}), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -6,6 +6,9 @@ from utils import login_required
 from sqlalchemy.orm import joinedload
 from utils.notifications import emit_assignment_update
 from services.assignment_service import AssignmentService  # Import AssignmentService
+from stream_context import publish_stream_context_change
+from dashboard_snapshot import refresh_dashboard
+from agent_inbox import sync_stream_inbox
 
 assignment_bp = Blueprint('assignment', __name__)
 
@@ -145,6 +148,9 @@ def manage_stream_assignments(stream_id):
                 })
         
         db.session.commit()
+        publish_stream_context_change(stream_id)
+        refresh_dashboard([stream_id])
+        sync_stream_inbox(stream_id)
         
         # Get the newly created assignments
         new_assignments = Assignment.query.filter_by(stream_id=stream_id).all()
@@ -166,8 +172,12 @@ def delete_assignment(assignment_id):
     if not assignment:
         return jsonify({"message": "Assignment not found"}), 404
     
+    stream_id = assignment.stream_id
     db.session.delete(assignment)
     db.session.commit()
+    publish_stream_context_change(stream_id)
+    refresh_dashboard([stream_id])
+    sync_stream_inbox(stream_id)
     return jsonify({"message": "Assignment deleted successfully"}), 200
 
 # Add to assignment_routes.py
@@ -1,12 +1,18 @@
 # routes/detection_routes.py
-from flask import Blueprint, request, jsonify, send_from_directory, session, current_app
-from models import Stream
+from flask import Blueprint, request, jsonify, send_from_directory, send_file, session, current_app, Response
+from models import Assignment, ChaturbateStream, Stream, StripchatStream
 from utils import login_required
 from extensions import db
 import requests
 import m3u8
 import numpy as np
 import os
+import io
+from evidence_store import get_evidence_store, BLOB_KEY_PATTERN, CONTENT_TYPES
+from dashboard_snapshot import refresh_dashboard
+from monitor_state import read_states
+from datetime import datetime, timezone
+from sqlalchemy.orm import selectin_polymorphic
 
 detection_bp = Blueprint('detection', __name__)
 
@@ -27,6 +33,29 @@ MONITOR_API_URL = os.getenv('MONITOR_API_URL', 'https://monitor-backend.jetcamst
 def serve_detection_image(filename):
     return send_from_directory("detections", filename)
 
+@detection_bp.route("/evidence/<key>")
+def serve_evidence(key):
+    """Serve a content-addressed evidence blob; the key never changes meaning, so it caches forever"""
+    if not BLOB_KEY_PATTERN.match(key):
+        return jsonify({"message": "Invalid evidence key"}), 404
+    etag = key.split('.')[0]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        store = get_evidence_store()
+        content_type = CONTENT_TYPES[key.rsplit('.', 1)[1]]
+        path = store.local_path(key)
+        if path is not None:
+            response = send_file(path, mimetype=content_type, conditional=False)
+        else:
+            data = store.get(key)
+            if data is None:
+                return jsonify({"message": "Evidence not found"}), 404
+            response = send_file(io.BytesIO(data), mimetype=content_type, conditional=False)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @detection_bp.route("/api/detect", methods=["POST"])
 def unified_detect():
     data = request.get_json()
@@ -81,9 +110,12 @@ def trigger_detection():
 
     try:
         # Forward the request to the monitoring app
+        payload = {"stream_id": stream_id, "stop": stop}
+        if data.get("video_sampling") is not None:
+            payload["video_sampling"] = data["video_sampling"]
         response = requests.post(
             f"{MONITOR_API_URL}/api/monitor/trigger-detection",
-            json={"stream_id": stream_id, "stop": stop},
+            json=payload,
             timeout=60
         )
         return jsonify(response.json()), response.status_code
@@ -99,31 +131,84 @@ def trigger_detection():
             "detectionError": str(e)
         }), 500
 
+def _timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc).isoformat() if value else None
+
+def detection_status_entry(stream, state, states_available=True):
+    """Detection status of a stream from its monitor session state; without Redis, from the stream row"""
+    if states_available:
+        is_active = state is not None and stream.status != 'offline'
+    else:
+        is_active = bool(stream.is_monitored) and stream.status != 'offline'
+    state = state or {}
+    return {
+        "stream_id": stream.id,
+        "stream_url": get_stream_url(stream),
+        "active": is_active,
+        "status": getattr(stream, 'status', 'unknown'),
+        "isDetecting": is_active,
+        "isDetectionLoading": state.get("state") == "queued",
+        "detectionError": "Stream is offline" if stream.status == 'offline' else state.get("last_error"),
+        "monitorState": state.get("state"),
+        "startedAt": state.get("started_at"),
+        "lastFrameAt": _timestamp(state.get("last_frame_at")),
+        "lastErrorAt": _timestamp(state.get("last_error_at")),
+        "lag": state.get("lag")
+    }
+
 @detection_bp.route("/api/detection-status/<int:stream_id>", methods=["GET"])
 def detection_status(stream_id):
-    try:
-        # Query the monitoring app for real-time status
-        response = requests.get(
-            f"{MONITOR_API_URL}/api/monitor/detection-status/{stream_id}",
-            timeout=60
-        )
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        current_app.logger.error(f"Error communicating with monitoring app: {str(e)}")
-        # Fallback to database query
-        stream = Stream.query.get_or_404(stream_id)
-        stream_url = get_stream_url(stream)
-        is_active = stream.is_monitored and stream.status != 'offline'
-        stream_status = getattr(stream, 'status', 'unknown')
-        return jsonify({
-            "stream_id": stream_id,
-            "stream_url": stream_url,
-            "active": is_active,
-            "status": stream_status,
-            "isDetecting": is_active,
-            "isDetectionLoading": False,
-            "detectionError": "Stream is offline" if stream.status == 'offline' else None
-        }), 200
+    """Served from the state monitor sessions publish to Redis; the monitor app is never called"""
+    stream = Stream.query.get_or_404(stream_id)
+    states = read_states([stream_id])
+    entry = detection_status_entry(stream, (states or {}).get(stream_id), states is not None)
+    return jsonify(entry), 200
+
+# Upper bound on the streams one bulk status request may ask for
+MAX_BULK_STATUS_STREAMS = 500
+
+@detection_bp.route("/api/detection-status", methods=["GET", "POST"])
+@login_required()
+def bulk_detection_status():
+    """Detection status of many streams in one response.
+
+    Streams are given as stream_ids (comma-separated in the query string, or a
+    list in a JSON body), or as assigned=me for the caller's assigned streams.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    assigned = data.get("assigned") or request.args.get("assigned")
+    if assigned == "me":
+        stream_ids = [stream_id for (stream_id,) in Assignment.query.with_entities(
+            Assignment.stream_id).filter_by(agent_id=session["user_id"])]
+    else:
+        stream_ids = data.get("stream_ids") or request.args.get("stream_ids", "")
+        if isinstance(stream_ids, str):
+            stream_ids = [value for value in stream_ids.split(",") if value.strip()]
+        try:
+            stream_ids = [int(value) for value in stream_ids]
+        except (TypeError, ValueError):
+            return jsonify({"error": "stream_ids must be integers"}), 400
+        if not stream_ids:
+            return jsonify({"error": "Provide stream_ids or assigned=me"}), 400
+    stream_ids = list(dict.fromkeys(stream_ids))
+    if len(stream_ids) > MAX_BULK_STATUS_STREAMS:
+        return jsonify({"error": f"At most {MAX_BULK_STATUS_STREAMS} streams per request"}), 400
+
+    streams = Stream.query.options(selectin_polymorphic(Stream, [ChaturbateStream, StripchatStream])).filter(
+        Stream.id.in_(stream_ids)
+    ).all() if stream_ids else []
+    states = read_states([stream.id for stream in streams])
+    found = {stream.id for stream in streams}
+    order = {stream_id: index for index, stream_id in enumerate(stream_ids)}
+    return jsonify({
+        "streams": [
+            detection_status_entry(stream, (states or {}).get(stream.id), states is not None)
+            for stream in sorted(streams, key=lambda stream: order[stream.id])
+        ],
+        "missing": [stream_id for stream_id in stream_ids if stream_id not in found]
+    }), 200
 
 @detection_bp.route("/api/streams/<int:stream_id>/status", methods=["POST"])
 def update_stream_status(stream_id):
@@ -150,6 +235,7 @@ def update_stream_status(stream_id):
                 timeout=60
             )
         db.session.commit()
+        refresh_dashboard([stream.id])
         current_app.logger.info(f"Stream {stream_id} status updated to {status}")
         return jsonify({
             "message": "Stream status updated successfully",
@@ -3,6 +3,7 @@ from extensions import db
 from models import ChatKeyword, FlaggedObject, User
 from utils import login_required
 from flask_jwt_extended import get_jwt_identity
+from flagged_terms import bump_flagged_terms_version
 
 keyword_bp = Blueprint('keyword', __name__)
 
@@ -24,10 +25,8 @@ def create_keyword():
     kw = ChatKeyword(keyword=keyword)
     db.session.add(kw)
     db.session.commit()
-    
-    from monitoring import refresh_flagged_keywords
-    refresh_flagged_keywords()
-    
+    bump_flagged_terms_version('keywords')
+
     return jsonify({"message": "Keyword added", "keyword": kw.serialize()}), 201
 
 @keyword_bp.route("/api/keywords/<int:keyword_id>", methods=["PUT"])
@@ -42,10 +41,8 @@ def update_keyword(keyword_id):
         return jsonify({"message": "New keyword required"}), 400
     kw.keyword = new_kw
     db.session.commit()
-    
-    from monitoring import refresh_flagged_keywords
-    refresh_flagged_keywords()
-    
+    bump_flagged_terms_version('keywords')
+
     return jsonify({"message": "Keyword updated", "keyword": kw.serialize()})
 
 @keyword_bp.route("/api/keywords/<int:keyword_id>", methods=["DELETE"])
@@ -56,10 +53,8 @@ def delete_keyword(keyword_id):
         return jsonify({"message": "Keyword not found"}), 404
     db.session.delete(kw)
     db.session.commit()
-    
-    from monitoring import refresh_flagged_keywords
-    refresh_flagged_keywords()
-    
+    bump_flagged_terms_version('keywords')
+
     return jsonify({"message": "Keyword deleted"})
 
 @keyword_bp.route("/api/objects", methods=["GET"])
@@ -80,6 +75,7 @@ def create_object():
     obj = FlaggedObject(object_name=obj_name)
     db.session.add(obj)
     db.session.commit()
+    bump_flagged_terms_version('objects')
     return jsonify({"message": "Object added", "object": obj.serialize()}), 201
 
 @keyword_bp.route("/api/objects/<int:object_id>", methods=["PUT"])
@@ -94,6 +90,7 @@ def update_object(object_id):
         return jsonify({"message": "New name required"}), 400
     obj.object_name = new_name
     db.session.commit()
+    bump_flagged_terms_version('objects')
     return jsonify({"message": "Object updated", "object": obj.serialize()})
 
 @keyword_bp.route("/api/objects/<int:object_id>", methods=["DELETE"])
@@ -104,4 +101,5 @@ def delete_object(object_id):
         return jsonify({"message": "Object not found"}), 404
     db.session.delete(obj)
     db.session.commit()
+    bump_flagged_terms_version('objects')
     return jsonify({"message": "Object deleted"})
\ No newline at end of file
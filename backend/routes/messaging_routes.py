@@ -6,6 +6,8 @@ from models import ChatMessage, User, MessageAttachment
 from utils import login_required
 from datetime import datetime
 from utils.notifications import emit_message_update
+from sqlalchemy import update
+from unread_counters import message_created, message_unread_counts, messages_read
 
 messaging_bp = Blueprint('messaging', __name__)
 
@@ -50,6 +52,7 @@ def send_message():
             
         db.session.add(new_message)
         db.session.commit()
+        message_created(new_message)
         
         # Serialize after commit to ensure ID exists
         message_data = {
@@ -105,8 +108,13 @@ def mark_messages_read():
     data = request.get_json()
     message_ids = data.get("messageIds", [])
     
-    ChatMessage.query.filter(ChatMessage.id.in_(message_ids)).update({"read": True})
+    # Only rows that were unread come back, so the badges move by exactly what changed
+    changed = db.session.execute(
+        update(ChatMessage.__table__).where(ChatMessage.id.in_(message_ids), ChatMessage.read == False)
+        .values(read=True).returning(ChatMessage.receiver_id, ChatMessage.sender_id)
+    ).all()
     db.session.commit()
+    messages_read(changed)
     return jsonify({"message": f"Marked {len(message_ids)} messages as read"})
 
 @messaging_bp.route("/api/messages/<int:agent_id>", methods=["GET"])
@@ -189,16 +197,22 @@ def get_unread_count(user_id):
     current_user_id = session["user_id"]
     
     try:
-        count = ChatMessage.query.filter_by(
-            sender_id=user_id, 
-            receiver_id=current_user_id,
-            read=False
-        ).count()
+        count = message_unread_counts(current_user_id).get(user_id, 0)
         
         return jsonify({"count": count})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@messaging_bp.route("/api/messages/unread-counts", methods=["GET"])
+@login_required()
+def get_unread_counts():
+    """Get unread message counts from every sender, keyed by sender id"""
+    try:
+        counts = message_unread_counts(session["user_id"])
+        return jsonify({str(sender_id): count for sender_id, count in counts.items()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @messaging_bp.route("/api/messages/<int:message_id>/mark-read", methods=["PUT"])
 @login_required()
 def mark_message_read(message_id):
@@ -212,8 +226,11 @@ def mark_message_read(message_id):
         if message.receiver_id != session["user_id"]:
             return jsonify({"error": "Unauthorized"}), 403
             
+        was_unread = not message.read
         message.read = True
         db.session.commit()
+        if was_unread:
+            messages_read([(message.receiver_id, message.sender_id)])
         
         return jsonify({"success": True})
     except Exception as e:
@@ -2,9 +2,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from models import Stream
 from extensions import db
-from monitoring import start_monitoring, stop_monitoring, stream_processors
+from monitoring import start_monitoring, stop_monitoring, resolve_video_sampling
+from monitor_scheduler import monitor_scheduler
+from monitor_state import clear_video_sampling
 from utils.notifications import emit_stream_update
-from time import time
 
 monitor_bp = Blueprint('monitor', __name__)
 
@@ -25,11 +26,19 @@ def trigger_detection():
     current_app.logger.info(f"Request data: {data}")
     stream_id = data.get("stream_id")
     stop = data.get("stop", False)
+    video_sampling = data.get("video_sampling")
     current_app.logger.info(f"Stream ID: {stream_id}, Stop: {stop}")
 
     if not stream_id:
         return jsonify({"error": "Missing stream_id"}), 400
 
+    if video_sampling is not None:
+        # Validated here, but passed on as given so the fields left out keep following the config
+        try:
+            resolve_video_sampling(video_sampling)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     stream = Stream.query.get(stream_id)
     if not stream:
         return jsonify({"error": "Stream not found"}), 404
@@ -37,9 +46,11 @@ def trigger_detection():
     stream_url = get_stream_url(stream)
 
     if stop:
-        if stream.is_monitored or stream_url in stream_processors:
+        if stream.is_monitored or monitor_scheduler.is_active(stream.id):
             try:
                 stop_monitoring(stream)
+                # An explicit stop forgets the override; refreshes go through stop_monitoring and keep it
+                clear_video_sampling(stream.id)
                 stream.is_monitored = False
                 db.session.commit()
                 current_app.logger.info(f"Detection stopped for stream: {stream.id}")
@@ -93,7 +104,7 @@ def trigger_detection():
             "detectionError": "Stream is offline"
         }), 400
 
-    if stream.is_monitored or stream_url in stream_processors:
+    if stream.is_monitored or monitor_scheduler.is_active(stream.id):
         current_app.logger.info(f"Detection already running for stream: {stream.id}")
         return jsonify({
             "message": "Detection already running for this stream",
@@ -107,7 +118,7 @@ def trigger_detection():
 
     try:
         current_app.logger.info(f"Starting detection for stream: {stream.id}")
-        if start_monitoring(stream):
+        if start_monitoring(stream, video_sampling=video_sampling):
             stream.is_monitored = True
             db.session.commit()
             emit_stream_update({
@@ -150,27 +161,24 @@ def trigger_detection():
 
 @monitor_bp.route("/api/monitor/detection-status/<int:stream_id>", methods=["GET"])
 def detection_status(stream_id):
-    start_time = time()
-    current_app.logger.info(f"Starting detection_status for stream_id={stream_id}")
-    
+    """In-process view of a session; the main app reads the same state from Redis instead"""
     stream = Stream.query.get_or_404(stream_id)
-    current_app.logger.info(f"Database query took {time() - start_time:.2f} seconds")
-    
-    stream_url = get_stream_url(stream)
-    current_app.logger.info(f"get_stream_url took {time() - start_time:.2f} seconds")
-    
-    is_active = (stream_url in stream_processors or stream.is_monitored) and stream.status != 'offline'
-    stream_status = getattr(stream, 'status', 'unknown')
-    current_app.logger.info(f"Status checks took {time() - start_time:.2f} seconds")
-    
-    response = {
+    session = monitor_scheduler.get(stream.id)
+    is_active = (session is not None or stream.is_monitored) and stream.status != 'offline'
+    state = session.state() if session else {}
+    return jsonify({
         "stream_id": stream_id,
-        "stream_url": stream_url,
+        "stream_url": get_stream_url(stream),
         "active": is_active,
-        "status": stream_status,
+        "status": getattr(stream, 'status', 'unknown'),
         "isDetecting": is_active,
         "isDetectionLoading": False,
-        "detectionError": "Stream is offline" if stream.status == 'offline' else None
-    }
-    current_app.logger.info(f"Total time for detection_status: {time() - start_time:.2f} seconds")
-    return jsonify(response)
\ No newline at end of file
+        "detectionError": "Stream is offline" if stream.status == 'offline' else state.get("last_error"),
+        "monitorState": state.get("state"),
+        "lag": state.get("lag")
+    })
+
+@monitor_bp.route("/api/monitor/scheduler", methods=["GET"])
+def scheduler_status():
+    """Introspect monitor sessions: running, waiting for capacity, and recently rejected."""
+    return jsonify(monitor_scheduler.snapshot())
@@ -1,13 +1,18 @@
 # routes/notification_routes.py
 from flask import Blueprint, request, jsonify, session, current_app
 from extensions import db, redis_service
-from models import DetectionLog, User, Stream, Assignment
+from models import DetectionLog, User, Stream, Assignment, AgentInbox
 from utils import login_required
-from utils.notifications import emit_notification, emit_notification_update
-from sqlalchemy import or_
+from utils.notifications import emit_notification, emit_notification_update, emit_notifications_bulk_update
 from datetime import datetime, timedelta
-from sqlalchemy.orm import joinedload
 from services.notification_service import NotificationService
+from evidence_store import load_evidence_image
+from notification_feed import (summary_query, summarize, newest_first, after_cursor, encode_cursor,
+                               notifications_version, bump_notifications_version)
+from agent_inbox import inbox_summary_query, add_to_inbox, mark_inbox_read, in_inbox
+import notification_bulk
+from dashboard_snapshot import refresh_dashboard
+from unread_counters import alerts_bulk_read, alerts_created, alerts_read, invalidate_alert_counts, message_created
 import logging
 
 notification_bp = Blueprint('notification', __name__)
@@ -65,6 +70,7 @@ def update_stream_status(stream_id):
         stream.status = new_status
         stream.is_monitored = new_status == 'monitoring'
         db.session.commit()
+        refresh_dashboard([stream.id])
 
         # Update cache
         status_update_cache[cache_key] = {
@@ -114,71 +120,72 @@ def update_stream_status(stream_id):
 
 @notification_bp.route("/api/notifications", methods=["GET"])
 def get_all_notifications():
-    """Fetch notifications with pagination and optimized agent filtering"""
+    """Fetch compact notification summaries, newest first, one keyset page at a time
+
+    Pass the X-Next-Cursor header of a response as ?cursor= to get the next page.
+    Full details come from /api/notifications/<id>.
+    """
     try:
         user_id = session.get("user_id")
         user_role = session.get("user_role")
         
-        # Pagination parameters
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 50))
+        # Pagination parameters; page is only honoured for callers that have not moved to cursors
+        cursor = request.args.get('cursor')
+        limit = min(int(request.args.get('limit', request.args.get('per_page', 50))), 500)
+        page = int(request.args.get('page', 1)) if not cursor else 1
         
-        # Check Redis cache first
-        cache_key = f"notifications:user:{user_id}:role:{user_role}:page:{page}:per_page:{per_page}"
-        if current_app.config.get('REDIS_ENABLED') and redis_service.is_available():
+        # Check Redis cache first; the version moves whenever a notification is written or read
+        version = notifications_version()
+        cache_key = None
+        if version is not None:
+            cache_key = f"notifications:summary:v{version}:user:{user_id}:role:{user_role}:cursor:{cursor or ''}:page:{page}:limit:{limit}"
             cached_data = redis_service.cache_get(cache_key)
             if cached_data:
-                return jsonify(cached_data), 200
+                return notification_page_response(cached_data["items"], cached_data["next_cursor"])
 
-        # Original database query logic
-        query = DetectionLog.query.options(joinedload(DetectionLog.assigned_user))
-        
+        # Only the list columns and a few short detail fields are read from the database
         if user_role == "agent":
             agent = User.query.get(user_id)
             if not agent:
                 return jsonify({"error": "Agent not found"}), 404
                 
-            # Get assigned stream IDs
-            assigned_stream_ids = [assignment.stream_id for assignment in agent.assignments]
-            
-            # Optimized query: filter by assigned_agent or assigned streams
-            query = query.join(Assignment, DetectionLog.assignment_id == Assignment.id, isouter=True).filter(
-                or_(
-                    DetectionLog.assigned_agent == user_id,
-                    Assignment.stream_id.in_(assigned_stream_ids)
-                )
-            )
+            # Agents page through their inbox on (agent_id, timestamp, detection_id)
+            keyset = (AgentInbox.timestamp, AgentInbox.detection_id)
+            query = inbox_summary_query(user_id)
+        else:
+            keyset = (DetectionLog.timestamp, DetectionLog.id)
+            query = summary_query()
         
-        # Apply pagination and ordering
-        notifications = query.order_by(DetectionLog.timestamp.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        ).items
+        # Seek past the cursor on (timestamp, id) rather than counting off an offset
+        query = newest_first(after_cursor(query, cursor, *keyset), *keyset)
+        if page > 1:
+            query = query.offset((page - 1) * limit)
+        notifications = query.limit(limit + 1).all()
         
-        response_data = [{
-            "id": n.id,
-            "event_type": n.event_type,
-            "timestamp": n.timestamp.isoformat(),
-            "details": n.details,
-            "read": n.read,
-            "room_url": n.room_url,
-            "streamer": n.details.get('streamer_name', 'Unknown'),
-            "platform": n.details.get('platform', 'Unknown'),
-            
-        } for n in notifications]
+        next_cursor = encode_cursor(notifications[limit - 1]) if len(notifications) > limit else None
+        response_data = [summarize(n) for n in notifications[:limit]]
 
-        # Cache the response
-        if current_app.config.get('REDIS_ENABLED') and redis_service.is_available():
+        if cache_key:
             redis_service.cache_set(
                 cache_key,
-                response_data,
-                expire=current_app.config.get('DASHBOARD_STATS_CACHE_TIMEOUT', 1800)
+                {"items": response_data, "next_cursor": next_cursor},
+                expire=current_app.config.get('NOTIFICATION_LIST_CACHE_TIMEOUT', 1800)
             )
 
-        return jsonify(response_data), 200
+        return notification_page_response(response_data, next_cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching notifications: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def notification_page_response(items, next_cursor):
+    """List body stays a bare array; the cursor for the next page travels in a header"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
+
 @notification_bp.route("/api/notifications", methods=["POST"])
 def create_notification():
     """Create a new notification, avoiding duplicates based on event_type, room_url, and details"""
@@ -221,6 +228,9 @@ def create_notification():
         
         db.session.add(notification)
         db.session.commit()
+        add_to_inbox([notification])
+        alerts_created([notification])
+        bump_notifications_version()
         
         notification_data = {
             "id": notification.id,
@@ -238,12 +248,13 @@ def create_notification():
         if agent_id:
             agent = User.query.get(agent_id)
             if agent and agent.receive_updates:
+                image_data = load_evidence_image(notification)
                 NotificationService.send_user_notification(
                     agent, notification.event_type, notification.details, 
                     notification.room_url, notification.details.get('platform'), 
                     notification.details.get('streamer_name'),
-                    is_image=bool(notification.detection_image), 
-                    image_data=notification.detection_image
+                    is_image=image_data is not None, 
+                    image_data=image_data
                 )
         NotificationService.notify_admins(
             notification.event_type, notification.details, 
@@ -276,7 +287,7 @@ def get_notification(notification_id):
             if not agent:
                 return jsonify({"error": "Agent not found"}), 404
                 
-            if notification.assigned_agent and int(notification.assigned_agent) != user_id:
+            if not in_inbox(user_id, notification.id) and notification.assigned_agent and int(notification.assigned_agent) != user_id:
                 stream = Stream.query.filter_by(room_url=notification.room_url).first()
                 assigned_streams = [assignment.stream_id for assignment in agent.assignments]
                 
@@ -321,22 +332,31 @@ def update_notification(notification_id):
             notification.assignment_id = assignment_id
             notification.details['assigned_agent'] = fetch_agent_username(agent_id) if agent_id else 'Unassigned'
             
+        read_changed = []
         if 'read' in data:
+            was_read = bool(notification.read)
             notification.read = data['read']
+            read_changed = mark_inbox_read([notification.id], read=bool(data['read']))
             
         db.session.commit()
+        if 'room_url' in data:
+            add_to_inbox([notification])
+        bump_notifications_version()
+        if 'read' in data:
+            alerts_read(read_changed, admin=was_read != bool(data['read']), read=bool(data['read']))
         
         emit_notification_update(notification.id, 'updated')
         
         if notification.assigned_agent:
             agent = User.query.get(notification.assigned_agent)
             if agent and agent.receive_updates:
+                image_data = load_evidence_image(notification)
                 NotificationService.send_user_notification(
                     agent, notification.event_type, notification.details, 
                     notification.room_url, notification.details.get('platform'), 
                     notification.details.get('streamer_name'),
-                    is_image=bool(notification.detection_image), 
-                    image_data=notification.detection_image
+                    is_image=image_data is not None, 
+                    image_data=image_data
                 )
         NotificationService.notify_admins(
             notification.event_type, notification.details, 
@@ -377,7 +397,7 @@ def mark_notification_read(notification_id):
             if not agent:
                 return jsonify({"error": "Agent not found"}), 404
                 
-            if notification.assigned_agent and int(notification.assigned_agent) != user_id:
+            if not in_inbox(user_id, notification.id) and notification.assigned_agent and int(notification.assigned_agent) != user_id:
                 stream = Stream.query.filter_by(room_url=notification.room_url).first()
                 if not stream:
                     return jsonify({"error": "Notification not accessible"}), 403
@@ -386,8 +406,12 @@ def mark_notification_read(notification_id):
                 if not assignment:
                     return jsonify({"error": "Notification not accessible"}), 403
         
+        was_unread = not notification.read
         notification.read = True
+        changed = mark_inbox_read([notification_id])
         db.session.commit()
+        bump_notifications_version()
+        alerts_read(changed, admin=was_unread)
         
         emit_notification_update(notification_id, 'read')
         
@@ -398,35 +422,31 @@ def mark_notification_read(notification_id):
 
 @notification_bp.route("/api/notifications/read-all", methods=["PUT"])
 def mark_all_notifications_read():
-    """Mark all relevant notifications as read"""
+    """Mark all relevant notifications as read, optionally filtered by stream, event type or time range"""
     try:
         user_id = session.get("user_id")
         user_role = session.get("user_role")
+        filters = notification_bulk.parse_filters(request.args, request.get_json(silent=True))
+        conditions = notification_bulk.filter_conditions(filters)
 
         if user_role == "admin":
-            notifications = DetectionLog.query.all()
-            for notification in notifications:
-                notification.read = True
-                emit_notification_update(notification.id, 'read')
+            count = notification_bulk.mark_read(conditions)
+            agent_id = None
         else:
             agent = User.query.get(user_id)
             if not agent:
                 return jsonify({"error": "Agent not found"}), 404
-
-            assigned_streams = [assignment.stream_id for assignment in agent.assignments]
-            notifications = DetectionLog.query.join(Assignment, DetectionLog.assignment_id == Assignment.id, isouter=True).filter(
-                or_(
-                    DetectionLog.assigned_agent == user_id,
-                    Assignment.stream_id.in_(assigned_streams)
-                )
-            ).all()
-
-            for notification in notifications:
-                notification.read = True
-                emit_notification_update(notification.id, 'read')
+            count = notification_bulk.mark_read(conditions, agent_id=agent.id)
+            agent_id = agent.id
 
         db.session.commit()
-        return jsonify({"message": "All notifications marked as read"}), 200
+        bump_notifications_version()
+        alerts_bulk_read(count, agent_id)
+        emit_notifications_bulk_update('read', count, filters, agent_id)
+        return jsonify({"message": f"Marked {count} notifications as read", "count": count}), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error marking all notifications as read: {str(e)}")
@@ -439,8 +459,13 @@ def delete_notification(notification_id):
         notification = DetectionLog.query.get(notification_id)
         if not notification:
             return jsonify({"message": "Notification not found"}), 404
+        was_unread = not notification.read
+        unread_agents = [agent_id for (agent_id,) in db.session.query(AgentInbox.agent_id).filter(
+            AgentInbox.detection_id == notification_id, AgentInbox.read == False)]
         db.session.delete(notification)
         db.session.commit()
+        bump_notifications_version()
+        alerts_read(unread_agents, admin=was_unread)
         
         emit_notification_update(notification_id, 'deleted')
         
@@ -452,16 +477,20 @@ def delete_notification(notification_id):
 
 @notification_bp.route("/api/notifications/delete-all", methods=["DELETE"])
 def delete_all_notifications():
-    """Delete all notifications"""
+    """Delete all notifications, optionally filtered by stream, event type or time range"""
     try:
-        notification_ids = [n.id for n in DetectionLog.query.all()]
-        DetectionLog.query.delete()
+        filters = notification_bulk.parse_filters(request.args, request.get_json(silent=True))
+        count = notification_bulk.delete(notification_bulk.filter_conditions(filters))
         db.session.commit()
+        bump_notifications_version()
+        invalidate_alert_counts(admin=True)
         
-        for notification_id in notification_ids:
-            emit_notification_update(notification_id, 'deleted')
+        emit_notifications_bulk_update('deleted', count, filters)
         
-        return jsonify({"message": "All notifications deleted"}), 200
+        return jsonify({"message": f"Deleted {count} notifications", "count": count}), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error deleting all notifications: {str(e)}")
@@ -508,6 +537,8 @@ def forward_notification(notification_id):
         notification.assignment_id = assignment_id
 
         db.session.commit()
+        add_to_inbox([notification], forwarded_to=agent.id)
+        bump_notifications_version()
 
         emit_notification_update(notification_id, 'forwarded')
 
@@ -522,7 +553,7 @@ def forward_notification(notification_id):
         if notification.event_type == 'object_detection':
             message_details.update({
                 "detections": notification.details.get('detections', []),
-                "annotated_image": bool(notification.detection_image)
+                "annotated_image": bool(notification.details.get('image_ref') or notification.detection_image)
             })
         elif notification.event_type == 'chat_detection':
             message_details.update({
@@ -546,6 +577,7 @@ def forward_notification(notification_id):
 
         db.session.add(sys_msg)
         db.session.commit()
+        message_created(sys_msg)
 
         emit_message_update({
             "id": sys_msg.id,
@@ -559,12 +591,13 @@ def forward_notification(notification_id):
         })
 
         if agent.receive_updates:
+            image_data = load_evidence_image(notification)
             NotificationService.send_user_notification(
                 agent, notification.event_type, notification.details, 
                 notification.room_url, notification.details.get('platform'), 
                 notification.details.get('streamer_name'),
-                is_image=bool(notification.detection_image), 
-                image_data=notification.detection_image
+                is_image=image_data is not None, 
+                image_data=image_data
             )
 
         return jsonify({
@@ -13,6 +13,9 @@ import logging
 from utils.notifications import emit_stream_update
 from services.assignment_service import AssignmentService
 from services.notification_service import NotificationService
+from stream_context import publish_stream_context_change
+from dashboard_snapshot import refresh_dashboard
+from agent_inbox import sync_stream_inbox
 
 stream_bp = Blueprint('stream', __name__)
 
@@ -148,6 +151,7 @@ def create_stream():
             )
 
         db.session.commit()
+        refresh_dashboard([stream.id])
 
         # Notify admins about stream creation
         NotificationService.notify_admins(
@@ -239,6 +243,10 @@ def update_stream(stream_id):
                 assignments.append(assignment)
 
         db.session.commit()
+        publish_stream_context_change(stream_id)
+        refresh_dashboard([stream_id])
+        if agent_ids:
+            sync_stream_inbox(stream_id)
 
         # Emit stream update
         stream_data = {
@@ -300,6 +308,8 @@ def delete_stream(stream_id):
 
         db.session.delete(stream)
         db.session.commit()
+        publish_stream_context_change(stream_id)
+        refresh_dashboard([stream_id])
 
         # Emit stream update
         emit_stream_update({
@@ -392,6 +402,7 @@ def update_stream_status(stream_id):
     try:
         stream.status = status
         db.session.commit()
+        refresh_dashboard([stream.id])
 
         # Notify admins and assigned agents
         NotificationService.notify_admins(
@@ -53,6 +53,8 @@ from flask import jsonify, current_app
 from datetime import datetime
 from services.assignment_service import AssignmentService
 from services.notification_service import NotificationService
+from stream_context import publish_stream_context_change
+from dashboard_snapshot import refresh_dashboard
 from models import Stream, ChaturbateStream, StripchatStream, Assignment, User
 from extensions import db
 
@@ -917,6 +919,7 @@ def run_stream_creation_job(app, job_id, room_url, platform, agent_id=None, note
                     db.session.add(stream)
                     db.session.flush()
                 db.session.refresh(stream)
+                refresh_dashboard([stream.id])
                 update_with_phase('database', 100, "Stream record materialized")
             except Exception as e:
                 update_with_phase('database', 100, f"Database error: {str(e)}")
@@ -1079,6 +1082,8 @@ def refresh_chaturbate_stream(room_slug):
             stream.chaturbate_m3u8_url = new_url
             stream.broadcaster_uid = scraped_data.get('broadcaster_uid')
             db.session.commit()
+            publish_stream_context_change(stream.id)
+            refresh_dashboard([stream.id])
             logging.info("Updated stream '%s' with new m3u8 URL: %s, broadcaster_uid: %s", room_slug, new_url, stream.broadcaster_uid)
         else:
             logging.info("No existing stream found for %s, creating new", room_slug)
@@ -1091,6 +1096,7 @@ def refresh_chaturbate_stream(room_slug):
             )
             db.session.add(stream)
             db.session.commit()
+            refresh_dashboard([stream.id])
             logging.info("Created new stream for %s with m3u8 URL: %s, broadcaster_uid: %s", room_slug, new_url, stream.broadcaster_uid)
 
         # Notify admins and assigned agents
@@ -1152,6 +1158,8 @@ def refresh_stripchat_stream(room_url):
         if stream:
             stream.stripchat_m3u8_url = new_url
             db.session.commit()
+            publish_stream_context_change(stream.id)
+            refresh_dashboard([stream.id])
             logging.info("Updated stream at %s with new m3u8 URL: %s", room_url, new_url)
         else:
             logging.info("No existing stream found for %s, creating new", room_url)
@@ -1163,6 +1171,7 @@ def refresh_stripchat_stream(room_url):
             )
             db.session.add(stream)
             db.session.commit()
+            refresh_dashboard([stream.id])
             logging.info("Created new stream for %s with m3u8 URL: %s", room_url, new_url)
 
         # Notify admins and assigned agents
@@ -2,6 +2,9 @@
 from extensions import db
 from models import Assignment, User, Stream
 from services.notification_service import NotificationService
+from stream_context import publish_stream_context_change
+from dashboard_snapshot import refresh_dashboard
+from agent_inbox import sync_stream_inbox
 import logging
 
 class AssignmentService:
@@ -40,6 +43,9 @@ class AssignmentService:
             )
             db.session.add(assignment)
             db.session.commit()
+            publish_stream_context_change(stream_id)
+            refresh_dashboard([stream_id])
+            sync_stream_inbox(stream_id)
 
             # Notify agent and admins
             NotificationService.notify_assignment(agent, stream, assigner, notes, priority)
@@ -131,6 +137,8 @@ class AssignmentService:
                 assignment.assigned_by = assigner_id
 
             db.session.commit()
+            publish_stream_context_change(assignment.stream_id)
+            refresh_dashboard([assignment.stream_id])
 
             # Notify agent and admins
             NotificationService.notify_assignment(
@@ -1,12 +1,17 @@
 # services/notification_service.py
 import asyncio
 import time
-import requests
 import threading
 from flask import current_app
 from extensions import db
 from models import User, DetectionLog, ChatMessage, Stream, Assignment
 from utils.notifications import emit_notification, emit_message_update
+from notification_feed import bump_notifications_version
+from agent_inbox import add_to_inbox
+from dashboard_snapshot import refresh_dashboard
+from stream_liveness import PassTimer, load_streams, probe_streams, probe_url, stream_probe_url, write_status_changes
+from ingest_heartbeat import heartbeat_status, read_heartbeats
+from unread_counters import alerts_created, message_created, reconcile_unread_counts
 from datetime import datetime, timedelta
 import smtplib
 from email.mime.text import MIMEText
@@ -34,6 +39,11 @@ class NotificationService:
     STREAM_STATUS_DEBOUNCE = int(os.getenv('STREAM_STATUS_DEBOUNCE', 1800))  # 2 hours
     stream_status_cache = {}
     status_aggregation_cache = {}
+    STREAM_STATUS_CHECK_INTERVAL = int(os.getenv('STREAM_STATUS_CHECK_INTERVAL', 60))
+    STREAM_STATUS_CONCURRENCY = int(os.getenv('STREAM_STATUS_CONCURRENCY', 50))
+    STREAM_STATUS_TIMEOUT = float(os.getenv('STREAM_STATUS_TIMEOUT', 5))
+    STREAM_STALL_SECONDS = int(os.getenv('STREAM_STALL_SECONDS', 30))
+    last_status_pass_seconds = None
 
     @staticmethod
     def init(app):
@@ -55,8 +65,16 @@ class NotificationService:
                 if not detection_only:
                     NotificationService.scheduler.add_job(
                         NotificationService.check_stream_statuses,
-                        trigger=IntervalTrigger(seconds=int(os.getenv('STREAM_STATUS_CHECK_INTERVAL', 60))),
+                        trigger=IntervalTrigger(seconds=NotificationService.STREAM_STATUS_CHECK_INTERVAL),
                         id='stream_status_check',
+                        replace_existing=True,
+                        max_instances=1,
+                        coalesce=True
+                    )
+                    NotificationService.scheduler.add_job(
+                        NotificationService.reconcile_unread_counts,
+                        trigger=IntervalTrigger(seconds=int(os.getenv('UNREAD_RECONCILE_INTERVAL', 300))),
+                        id='unread_count_reconcile',
                         replace_existing=True
                     )
                 NotificationService.scheduler.start()
@@ -70,44 +88,81 @@ class NotificationService:
     @staticmethod
     def check_stream_statuses():
         """Periodically check the status of all streams and aggregate notifications."""
-        start_time = time.time()
+        timer = PassTimer(NotificationService.STREAM_STATUS_CHECK_INTERVAL)
+        streams = []
+        targets = []
+        changes = {}
         try:
             with NotificationService.app.app_context():
-                streams = Stream.query.all()
-                logger.debug(f"Checking {len(streams)} streams")
+                streams = load_streams()
+                # Streams being ingested report their own liveness; only the rest are probed
+                heartbeats = read_heartbeats([stream.id for stream in streams])
+                targets = [(stream.id, stream_probe_url(stream)) for stream in streams
+                           if stream.id not in heartbeats]
+                timer.mark('load')
+                # Release the connection while waiting on the network; the loaded streams stay readable
+                db.session.close()
+                statuses = {
+                    stream_id: heartbeat_status(heartbeat, NotificationService.STREAM_STALL_SECONDS)
+                    for stream_id, heartbeat in heartbeats.items()
+                }
+                statuses.update(probe_streams(
+                    targets,
+                    concurrency=NotificationService.STREAM_STATUS_CONCURRENCY,
+                    timeout=NotificationService.STREAM_STATUS_TIMEOUT,
+                    stall_after=NotificationService.STREAM_STALL_SECONDS
+                ))
+                timer.mark('probe')
+
+                transitions = {}
                 for stream in streams:
-                    new_status = NotificationService.get_stream_status(stream)
+                    new_status = statuses.get(stream.id)
                     old_status = NotificationService.stream_status_cache.get(stream.id, stream.status)
-                    
-                    if new_status != old_status:
+                    # Rows written before heartbeats and probes shared a vocabulary may still say 'monitoring'
+                    if old_status == 'monitoring':
+                        old_status = 'online'
+                    if new_status and new_status != old_status:
                         logger.info(f"Stream {stream.streamer_username} status changed from {old_status} to {new_status}")
-                        stream.status = new_status
-                        stream.is_monitored = new_status == 'monitoring'
-                        db.session.commit()
-                        
-                        NotificationService.stream_status_cache[stream.id] = new_status
-                        cache_key = f"stream_{stream.id}_status"
-                        if cache_key not in NotificationService.status_aggregation_cache:
-                            NotificationService.status_aggregation_cache[cache_key] = {
-                                'stream': stream,
-                                'old_status': old_status,
-                                'new_status': new_status,
-                                'count': 1,
-                                'last_updated': datetime.utcnow()
-                            }
-                        else:
-                            NotificationService.status_aggregation_cache[cache_key]['count'] += 1
-                            NotificationService.status_aggregation_cache[cache_key]['new_status'] = new_status
-                            NotificationService.status_aggregation_cache[cache_key]['last_updated'] = datetime.utcnow()
+                        changes[stream.id] = new_status
+                        transitions[stream.id] = (stream, old_status, new_status)
+
+                write_status_changes(changes)
+                db.session.commit()
+                timer.mark('write')
+                if changes:
+                    refresh_dashboard(list(changes))
+
+                for stream_id, (stream, old_status, new_status) in transitions.items():
+                    NotificationService.stream_status_cache[stream_id] = new_status
+                    cache_key = f"stream_{stream_id}_status"
+                    if cache_key not in NotificationService.status_aggregation_cache:
+                        NotificationService.status_aggregation_cache[cache_key] = {
+                            'stream': stream,
+                            'old_status': old_status,
+                            'new_status': new_status,
+                            'count': 1,
+                            'last_updated': datetime.utcnow()
+                        }
+                    else:
+                        NotificationService.status_aggregation_cache[cache_key]['count'] += 1
+                        NotificationService.status_aggregation_cache[cache_key]['new_status'] = new_status
+                        NotificationService.status_aggregation_cache[cache_key]['last_updated'] = datetime.utcnow()
                 NotificationService.process_aggregated_notifications()
-                logger.debug(f"Stream status check completed in {time.time() - start_time:.2f} seconds")
         except Exception as e:
             logger.error(f"Error checking stream statuses: {str(e)}")
             db.session.rollback()
         finally:
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 60:
-                logger.warning(f"Stream status check took {elapsed_time:.2f} seconds, exceeding interval")
+            NotificationService.last_status_pass_seconds = timer.report(len(streams), len(changes), probed=len(targets))
+
+    @staticmethod
+    def reconcile_unread_counts():
+        """Correct drift in the Redis unread counters from the database."""
+        try:
+            with NotificationService.app.app_context():
+                reconcile_unread_counts()
+        except Exception as e:
+            logger.error(f"Error reconciling unread counts: {str(e)}")
+            db.session.rollback()
 
     @staticmethod
     def process_aggregated_notifications():
@@ -135,19 +190,11 @@ class NotificationService:
     @staticmethod
     def get_stream_status(stream):
         """Check the live status of a stream by querying its m3u8 URL."""
-        try:
-            if stream.type.lower() == 'chaturbate' and stream.chaturbate_m3u8_url:
-                url = stream.chaturbate_m3u8_url
-            elif stream.type.lower() == 'stripchat' and stream.stripchat_m3u8_url:
-                url = stream.stripchat_m3u8_url
-            else:
-                url = stream.room_url
-
-            response = requests.head(url, timeout=5)
-            return 'online' if response.status_code == 200 else 'offline'
-        except requests.RequestException as e:
-            logger.warning(f"Failed to check status for stream {stream.streamer_username}: {str(e)}")
-            return 'offline'
+        return probe_url(
+            stream_probe_url(stream),
+            timeout=NotificationService.STREAM_STATUS_TIMEOUT,
+            stall_after=NotificationService.STREAM_STALL_SECONDS
+        )
 
     @staticmethod
     def get_stream_assignment(room_url):
@@ -318,6 +365,9 @@ class NotificationService:
             )
             db.session.add(notification)
             db.session.commit()
+            add_to_inbox([notification])
+            alerts_created([notification])
+            bump_notifications_version()
 
             notification_data = {
                 "id": notification.id,
@@ -426,6 +476,7 @@ class NotificationService:
             )
             db.session.add(sys_msg)
             db.session.commit()
+            message_created(sys_msg)
 
             emit_message_update({
                 "id": sys_msg.id,
@@ -468,6 +519,7 @@ class NotificationService:
             )
             db.session.add(sys_msg)
             db.session.commit()
+            message_created(sys_msg)
 
             emit_message_update({
                 "id": sys_msg.id,
@@ -530,6 +582,9 @@ class NotificationService:
             )
             db.session.add(notification)
             db.session.commit()
+            add_to_inbox([notification])
+            alerts_created([notification])
+            bump_notifications_version()
 
             notification_data = {
                 "id": notification.id,
@@ -1,10 +1,13 @@
 # socket_events.py
 from flask_socketio import emit, join_room, leave_room
 from flask import session, current_app, request
-from models import db, User, Assignment, DetectionLog, Stream, ChatMessage, MessageAttachment
+from models import db, User, Assignment, DetectionLog, AgentInbox, ChatMessage, MessageAttachment
 import datetime
 import logging
-from sqlalchemy import or_
+from notification_feed import summary_query, summarize
+from agent_inbox import inbox_summary_query
+from dashboard_snapshot import refresh_dashboard
+from unread_counters import alert_unread_count, message_created, message_unread_counts, messages_read
 
 # Track online users
 online_users = {}  # {user_id: sid}
@@ -21,9 +24,12 @@ def register_socket_events(socketio):
         if user_id:
             user = User.query.get(user_id)
             if user:
+                was_online = user.online
                 user.online = True
                 user.last_active = datetime.datetime.now()
                 db.session.commit()
+                if not was_online:
+                    refresh_dashboard(agent_id=user_id)
                 online_users[user_id] = request.sid
                 connected_sids[request.sid] = user_id
                 
@@ -62,6 +68,7 @@ def register_socket_events(socketio):
                 user.online = False
                 user.last_active = datetime.datetime.now()
                 db.session.commit()
+                refresh_dashboard(agent_id=user_id)
                 del online_users[user_id]
                 
                 # Broadcast offline status
@@ -187,6 +194,7 @@ def register_socket_events(socketio):
                     
             db.session.add(new_message)
             db.session.commit()
+            message_created(new_message)
 
             # Get the serialized message with attachment
             message_data = {
@@ -259,8 +267,11 @@ def register_socket_events(socketio):
                 return
                 
             if status == 'read':
+                was_unread = not message.read
                 message.read = True
                 db.session.commit()
+                if was_unread:
+                    messages_read([(message.receiver_id, message.sender_id)])
                 
                 # Notify the sender if they're online
                 if message.sender_id in online_users:
@@ -363,49 +374,46 @@ def register_socket_events(socketio):
             return
             
         try:
-            # Query for unread notifications relevant to this user
+            # Query compact summaries of the unread notifications relevant to this user
             if user.role == 'admin':
                 # Admins see all unread notifications
-                unread_notifications = DetectionLog.query.filter_by(read=False).order_by(DetectionLog.timestamp.desc()).all()
+                query = summary_query().filter(DetectionLog.read == False).order_by(DetectionLog.timestamp.desc())
             else:
-                # Agents only see notifications for their assigned streams
-                assigned_streams = [assignment.stream_id for assignment in user.assignments]
-                
-                # Get stream URLs for these stream IDs
-                stream_urls = [stream.room_url for stream in Stream.query.filter(Stream.id.in_(assigned_streams)).all()]
-                
-                # Query for notifications with these stream URLs or assigned directly to this agent
-                unread_notifications = DetectionLog.query.filter(
-                    DetectionLog.read == False,
-                    or_(
-                        DetectionLog.room_url.in_(stream_urls),
-                        # Check if assigned_agent matches in details JSON
-                        DetectionLog.details.contains({"assigned_agent": user.username})
-                    )
-                ).order_by(DetectionLog.timestamp.desc()).all()
-            
-            # Format notifications for sending
-            formatted_notifications = []
-            for n in unread_notifications:
-                formatted_notifications.append({
-                    "id": n.id,
-                    "event_type": n.event_type,
-                    "timestamp": n.timestamp.isoformat(),
-                    "details": n.details,
-                    "read": n.read,
-                    "room_url": n.room_url,
-                    "streamer": n.details.get('streamer_name', 'Unknown'),
-                    "platform": n.details.get('platform', 'Unknown'),
-                    "assigned_agent": n.details.get('assigned_agent', 'Unassigned')
-                })
+                # Agents see the unread entries of their own inbox
+                query = inbox_summary_query(user.id).filter(AgentInbox.read == False).order_by(AgentInbox.timestamp.desc())
+            formatted_notifications = [summarize(n) for n in query]
             
             # Send the unread notifications to the client
-            emit('unread_notifications', {'notifications': formatted_notifications}, namespace='/notifications')
+            emit('unread_notifications', {
+                'notifications': formatted_notifications,
+                'count': alert_unread_count(user)
+            }, namespace='/notifications')
             
         except Exception as e:
             current_app.logger.error(f"Error getting unread notifications: {str(e)}")
             emit('error', {'message': 'Error retrieving unread notifications'}, namespace='/notifications')
 
+    @socketio.on('get_unread_counts', namespace='/notifications')
+    def handle_unread_counts_request():
+        """Send the user's badge counts; later changes arrive as unread_counts pushes"""
+        user_id = session.get('user_id')
+        if not user_id:
+            return
+            
+        user = User.query.get(user_id)
+        if not user:
+            return
+            
+        try:
+            messages = message_unread_counts(user.id)
+            emit('unread_counts', {
+                'alerts': alert_unread_count(user),
+                'messages': {str(sender_id): count for sender_id, count in messages.items()}
+            }, namespace='/notifications')
+        except Exception as e:
+            current_app.logger.error(f"Error getting unread counts: {str(e)}")
+            emit('error', {'message': 'Error retrieving unread counts'}, namespace='/notifications')
+
     # Function that can be used from other parts of the application
     def emit_notification(data):
         """Emit a notification to connected clients from outside a Socket.IO context"""
@@ -0,0 +1,164 @@
+"""
+stream_context.py - Per-stream metadata resolved once per monitor session
+
+Every detection needs the platform, streamer, broadcaster UID and current
+assignment of the stream it came from. Looking these up by URL took up to
+three table lookups plus an Assignment query on every alert. A StreamContext
+holds them for one stream. It is built when monitoring starts, then served
+from memory by stream id or by any of the stream's URLs. Routes that change a
+stream or its assignments call publish_stream_context_change(). Every process
+then drops its copy, and the next lookup rebuilds it once.
+"""
+import logging
+import gevent
+from flask import current_app
+from gevent.lock import Semaphore
+from extensions import redis_service
+from models import Stream, ChaturbateStream, StripchatStream
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+CHANNEL = "stream_context"
+
+class StreamContext:
+    """Platform, streamer and assignment details for one stream"""
+
+    __slots__ = ('stream_id', 'room_url', 'platform', 'streamer', 'broadcaster_uid',
+                 'm3u8_url', 'assignment_id', 'agent_id')
+
+    def __init__(self, stream_id, room_url, platform, streamer, broadcaster_uid=None,
+                 m3u8_url=None, assignment_id=None, agent_id=None):
+        self.stream_id = stream_id
+        self.room_url = room_url
+        self.platform = platform
+        self.streamer = streamer
+        self.broadcaster_uid = broadcaster_uid
+        self.m3u8_url = m3u8_url
+        self.assignment_id = assignment_id
+        self.agent_id = agent_id
+
+    @classmethod
+    def from_stream(cls, stream):
+        """Build from a Stream row; the polymorphic subclass supplies the m3u8 URL and UID"""
+        platform = (stream.type or 'unknown').lower()
+        # Assignments are loaded with the stream (selectin), so this adds no query
+        assignment = stream.assignments[0] if stream.assignments else None
+        return cls(
+            stream_id=stream.id,
+            room_url=stream.room_url,
+            platform=platform,
+            streamer=stream.streamer_username,
+            broadcaster_uid=getattr(stream, 'broadcaster_uid', None),
+            m3u8_url=getattr(stream, 'chaturbate_m3u8_url', None) or getattr(stream, 'stripchat_m3u8_url', None),
+            assignment_id=assignment.id if assignment else None,
+            agent_id=assignment.agent_id if assignment else None
+        )
+
+    def urls(self):
+        return [url for url in (self.room_url, self.m3u8_url) if url]
+
+class StreamContextRegistry:
+    """Process-local StreamContexts keyed by stream id and by URL"""
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_url = {}
+        self._lock = Semaphore()
+        self._listener = None
+        self._subscriptions = 0
+
+    def register(self, stream):
+        """Build and cache the context for a stream that is about to be monitored"""
+        context = StreamContext.from_stream(stream)
+        self._store(context)
+        self._ensure_listener()
+        return context
+
+    def get(self, stream_id):
+        return self._by_id.get(stream_id)
+
+    def lookup(self, url):
+        """Context for a room or m3u8 URL, resolving it from the database at most once"""
+        context = self._by_url.get(url)
+        if context is not None:
+            return context
+        self._ensure_listener()
+        stream = self._resolve(url)
+        if stream is None:
+            return None
+        context = StreamContext.from_stream(stream)
+        self._store(context)
+        return context
+
+    def invalidate(self, stream_id=None):
+        """Forget one stream's context, or all of them when stream_id is None"""
+        with self._lock:
+            if stream_id is None:
+                self._by_id.clear()
+                self._by_url.clear()
+                return
+            self._by_id.pop(stream_id, None)
+            for url in [url for url, context in self._by_url.items() if context.stream_id == stream_id]:
+                del self._by_url[url]
+
+    def _store(self, context):
+        with self._lock:
+            previous = self._by_id.get(context.stream_id)
+            if previous is not None:
+                for url in [url for url, ctx in self._by_url.items() if ctx is previous]:
+                    del self._by_url[url]
+            self._by_id[context.stream_id] = context
+            for url in context.urls():
+                self._by_url[url] = context
+
+    @staticmethod
+    def _resolve(url):
+        with current_app.app_context():
+            stream = Stream.query.filter_by(room_url=url).first()
+            if stream:
+                return stream
+            cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=url).first()
+            if cb_stream:
+                return cb_stream
+            sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=url).first()
+            if sc_stream:
+                return sc_stream
+        logger.warning(f"No stream found for URL: {url}")
+        return None
+
+    def _ensure_listener(self):
+        if self._listener is None and redis_service is not None and redis_service.is_available():
+            self._listener = gevent.spawn(
+                redis_service.listen,
+                [CHANNEL],
+                lambda channel, data: self.invalidate((data or {}).get('stream_id')),
+                on_subscribe=self._on_subscribe
+            )
+
+    def _on_subscribe(self):
+        # Changes published while resubscribing were missed, so start from scratch
+        self._subscriptions += 1
+        if self._subscriptions > 1:
+            self.invalidate()
+
+stream_contexts = StreamContextRegistry()
+
+def get_stream_context(url):
+    """Shortcut for stream_contexts.lookup(url)"""
+    try:
+        return stream_contexts.lookup(url)
+    except Exception as e:
+        logger.error(f"Error resolving stream context for {url}: {e}")
+        return None
+
+def publish_stream_context_change(stream_id):
+    """Tell every process a stream or its assignments changed; call after commit"""
+    stream_contexts.invalidate(stream_id)
+    if redis_service is None or redis_service.publish_notification(CHANNEL, {"stream_id": stream_id}) is False:
+        logger.warning(f"Could not publish context change for stream {stream_id}; monitors keep their cached copy")
@@ -0,0 +1,196 @@
+import logging
+from time import monotonic
+import av
+import gevent
+from gevent.queue import Empty, Full, Queue
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# Marker pushed onto a consumer queue once the container is exhausted
+_END_OF_STREAM = object()
+
+class StreamIngest:
+    """
+    Demux an HLS stream from a single container and fan its packets out to
+    per-modality consumers. Each consumer runs in its own greenlet behind a
+    bounded queue, so video and audio are analysed concurrently from one
+    upstream connection. The demuxer never waits on a full queue: audio drops
+    its oldest packets, and video sheds whole GOPs, either skipping to the
+    next keyframe or flushing its backlog when a keyframe arrives, so a
+    lagging consumer sheds its own load without stalling the other modality
+    and the decoder always resumes at a keyframe. Drops are counted per
+    modality in ``dropped``.
+
+    A consumer is any object exposing ``handle_packet(packet)``; an optional
+    ``close()`` is called once the container has been fully drained. If
+    ``on_busy`` is given it receives the seconds spent in each packet handler,
+    which the scheduler uses as the stream's processing cost. If
+    ``heartbeat`` is given every demuxed packet is recorded on it, together
+    with the decode errors counted so far (a consumer's ``decode_errors``
+    attribute plus errors raised out of its handler).
+    """
+
+    def __init__(self, stream_url, cancel_event, app=None, open_timeout=60, queue_size=256, on_busy=None,
+                 heartbeat=None):
+        self.stream_url = stream_url
+        self.cancel_event = cancel_event
+        self.app = app
+        self.open_timeout = open_timeout
+        self.queue_size = queue_size
+        self.on_busy = on_busy
+        self.heartbeat = heartbeat
+        self._consumers = {}
+        self._handler_errors = 0
+        self.dropped = {}
+        self._awaiting_keyframe = False
+
+    def add_consumer(self, media_type, consumer):
+        """Register the consumer for 'video' or 'audio' packets"""
+        self._consumers[media_type] = consumer
+
+    def decode_errors(self):
+        """Decode errors across every consumer so far"""
+        return self._handler_errors + sum(
+            getattr(consumer, 'decode_errors', 0) for consumer in self._consumers.values()
+        )
+
+    def run(self):
+        """Open the stream and route packets until it ends or is cancelled.
+
+        Errors raised by ``av.open`` propagate to the caller so it can decide
+        whether to retry or mark the stream offline.
+        """
+        container = av.open(self.stream_url, timeout=self.open_timeout)
+        logger.info(f"Ingest opened {self.stream_url}")
+        try:
+            streams = {}
+            for media_type in self._consumers:
+                stream = next((s for s in container.streams if s.type == media_type), None)
+                if stream is None:
+                    logger.warning(f"No {media_type} stream found in {self.stream_url}")
+                    continue
+                streams[media_type] = stream
+            if not streams:
+                return
+
+            queues = {media_type: Queue(maxsize=self.queue_size) for media_type in streams}
+            workers = [
+                gevent.spawn(self._consume, media_type, queues[media_type])
+                for media_type in streams
+            ]
+            routes = {stream.index: media_type for media_type, stream in streams.items()}
+            try:
+                for packet in container.demux(*streams.values()):
+                    if self.cancel_event.is_set():
+                        break
+                    if self.heartbeat is not None:
+                        self.heartbeat.packet(packet.size, self.decode_errors())
+                    media_type = routes.get(packet.stream.index)
+                    if media_type is not None:
+                        self._enqueue(media_type, queues[media_type], packet)
+            finally:
+                for queue in queues.values():
+                    self._put_dropping_oldest(queue, _END_OF_STREAM)
+                gevent.joinall(workers)
+        finally:
+            container.close()
+            dropped = ", ".join(f"{media_type} {count}" for media_type, count in self.dropped.items())
+            logger.info(f"Ingest closed {self.stream_url}" + (f" (dropped {dropped} packets)" if dropped else ""))
+
+    def _enqueue(self, media_type, queue, packet):
+        """Queue a packet without blocking the demuxer, shedding load if the consumer is behind"""
+        if media_type == 'video':
+            self._enqueue_video(queue, packet)
+            return
+        try:
+            queue.put_nowait(packet)
+            return
+        except Full:
+            pass
+        self._count_dropped(media_type, 1)
+        self._put_dropping_oldest(queue, packet)
+
+    def _enqueue_video(self, queue, packet):
+        """Shed video a GOP at a time so the decoder never sees a packet whose references are gone"""
+        if self._awaiting_keyframe:
+            if not packet.is_keyframe:
+                self._count_dropped('video', 1)
+                return
+            self._awaiting_keyframe = False
+        try:
+            queue.put_nowait(packet)
+            return
+        except Full:
+            pass
+        if not packet.is_keyframe:
+            # The rest of this GOP depends on the packet being dropped; skip to the next keyframe
+            self._count_dropped('video', 1)
+            self._awaiting_keyframe = True
+            return
+        # A fresh GOP is arriving: flush the backlog and restart the consumer at this keyframe
+        flushed = 0
+        while True:
+            try:
+                queue.get_nowait()
+                flushed += 1
+            except Empty:
+                break
+        self._count_dropped('video', flushed)
+        queue.put_nowait(packet)
+
+    def _count_dropped(self, media_type, count):
+        if self.dropped.get(media_type, 0) == 0:
+            logger.warning(f"{media_type} consumer for {self.stream_url} is falling behind; shedding packets")
+        self.dropped[media_type] = self.dropped.get(media_type, 0) + count
+
+    @staticmethod
+    def _put_dropping_oldest(queue, item):
+        while True:
+            try:
+                queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    pass
+
+    def _consume(self, media_type, queue):
+        """Drain one modality's queue into its consumer"""
+        if self.app is not None:
+            with self.app.app_context():
+                self._drain(media_type, queue)
+        else:
+            self._drain(media_type, queue)
+
+    def _drain(self, media_type, queue):
+        consumer = self._consumers[media_type]
+        while True:
+            packet = queue.get()
+            if packet is _END_OF_STREAM:
+                break
+            # Keep draining after cancellation so the demuxer never blocks on a full queue
+            if self.cancel_event.is_set():
+                continue
+            started = monotonic()
+            try:
+                consumer.handle_packet(packet)
+            except Exception as e:
+                self._handler_errors += 1
+                logger.error(f"Unhandled {media_type} consumer error for {self.stream_url}: {e}")
+            if self.on_busy is not None:
+                self.on_busy(monotonic() - started)
+            # Decoding is CPU-bound; yield so the demuxer and sibling consumer keep moving
+            gevent.sleep(0)
+        close = getattr(consumer, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.error(f"Error closing {media_type} consumer for {self.stream_url}: {e}")
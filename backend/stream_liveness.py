@@ -0,0 +1,221 @@
+"""
+stream_liveness.py - Concurrent liveness checks for every stream
+
+The status checker used to probe streams one at a time, each with a fresh
+connection and a 5 s timeout, then commit each status change separately. With
+a few hundred rooms a pass took longer than its own interval. Probes now run
+on a bounded gevent pool over one keep-alive HTTP session. The caller then
+writes every status transition in a single UPDATE, and each pass reports how
+long it took.
+
+A HEAD returning 200 does not prove a stream is live: a playlist that has
+stopped advancing, or that carries #EXT-X-ENDLIST, still answers 200. HLS
+URLs are instead probed with a conditional GET of the media playlist. The
+probe remembers each playlist's media sequence, and classifies the stream as
+live, stalled (no new segment for STREAM_STALL_SECONDS, or a last segment
+that old by its program date-time), ended, or offline.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+import gevent.pool
+import m3u8
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import case
+from sqlalchemy.orm import selectin_polymorphic
+from models import ChaturbateStream, Stream, StripchatStream
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+_session = None
+
+def get_probe_session(pool_size=50):
+    """Process-wide keep-alive session shared by every probe"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+LIVE, STALLED, ENDED, OFFLINE = 'live', 'stalled', 'ended', 'offline'
+
+# Seconds without a new segment before a playlist counts as stalled
+STALL_SECONDS = 30
+
+class PlaylistState:
+    """What the last probe of one playlist saw"""
+
+    __slots__ = ('media_url', 'etag', 'last_modified', 'sequence', 'advanced_at')
+
+    def __init__(self):
+        self.media_url = None
+        self.etag = None
+        self.last_modified = None
+        self.sequence = None
+        self.advanced_at = None
+
+# Playlist URL -> PlaylistState, per process. Signed URLs rotate their tokens, so
+# entries are pruned to the URLs still being probed rather than kept forever.
+_playlist_states = {}
+
+def prune_playlist_states(urls):
+    """Forget every playlist not in urls"""
+    keep = set(urls)
+    for url in [url for url in _playlist_states if url not in keep]:
+        del _playlist_states[url]
+
+def forget_playlist(url):
+    _playlist_states.pop(url, None)
+
+def _conditional_headers(state):
+    headers = {}
+    if state.etag:
+        headers['If-None-Match'] = state.etag
+    if state.last_modified:
+        headers['If-Modified-Since'] = state.last_modified
+    return headers
+
+def _stalled(state, now, stall_after):
+    return state.advanced_at is not None and now - state.advanced_at > stall_after
+
+def probe_playlist(url, timeout=5, session=None, stall_after=STALL_SECONDS):
+    """Classify an HLS stream as LIVE, STALLED, ENDED or OFFLINE from its media playlist"""
+    session = session or get_probe_session()
+    state = _playlist_states.setdefault(url, PlaylistState())
+    now = time.monotonic()
+    try:
+        fetch_url = state.media_url or url
+        response = session.get(fetch_url, headers=_conditional_headers(state), timeout=timeout)
+        if response.status_code == 304:
+            # Nothing new since the last probe
+            return STALLED if _stalled(state, now, stall_after) else LIVE
+        if response.status_code != 200 and state.media_url:
+            # Variant URLs rotate; start again from the master playlist
+            state.media_url = state.etag = state.last_modified = None
+            response = session.get(url, timeout=timeout)
+            fetch_url = url
+        if response.status_code != 200:
+            return OFFLINE
+
+        playlist = m3u8.loads(response.text, uri=fetch_url)
+        if playlist.is_variant:
+            if not playlist.playlists:
+                return OFFLINE
+            state.media_url = playlist.playlists[0].absolute_uri
+            response = session.get(state.media_url, timeout=timeout)
+            if response.status_code != 200:
+                return OFFLINE
+            playlist = m3u8.loads(response.text, uri=state.media_url)
+        state.etag = response.headers.get('ETag')
+        state.last_modified = response.headers.get('Last-Modified')
+    except requests.RequestException as e:
+        logger.warning(f"Failed to check status for {url}: {e}")
+        return OFFLINE
+    except Exception as e:
+        logger.warning(f"Unreadable playlist at {url}: {e}")
+        return OFFLINE
+
+    if playlist.is_endlist:
+        return ENDED
+    sequence = (playlist.media_sequence or 0) + len(playlist.segments)
+    if state.sequence is None or sequence > state.sequence:
+        state.sequence = sequence
+        state.advanced_at = now
+    if playlist.segments and playlist.segments[-1].current_program_date_time:
+        last = playlist.segments[-1]
+        age = (datetime.now(timezone.utc) - last.current_program_date_time).total_seconds() - (last.duration or 0)
+        if age > stall_after:
+            return STALLED
+    return STALLED if _stalled(state, now, stall_after) else LIVE
+
+def probe_liveness(url, timeout=5, session=None, stall_after=STALL_SECONDS):
+    """LIVE, STALLED, ENDED or OFFLINE; URLs that are not HLS playlists only get a HEAD"""
+    if '.m3u8' in url:
+        return probe_playlist(url, timeout, session, stall_after)
+    try:
+        response = (session or get_probe_session()).head(url, timeout=timeout)
+        return LIVE if response.status_code == 200 else OFFLINE
+    except requests.RequestException as e:
+        logger.warning(f"Failed to check status for {url}: {e}")
+        return OFFLINE
+
+def probe_url(url, timeout=5, session=None, stall_after=STALL_SECONDS):
+    """'online' if the stream is live, otherwise 'offline'"""
+    liveness = probe_liveness(url, timeout, session, stall_after)
+    if liveness in (STALLED, ENDED):
+        logger.info(f"Playlist {url} is {liveness}")
+    return 'online' if liveness == LIVE else 'offline'
+
+def stream_probe_url(stream):
+    """The m3u8 URL of a stream if it has one, else its room URL"""
+    platform = (stream.type or '').lower()
+    if platform == 'chaturbate' and getattr(stream, 'chaturbate_m3u8_url', None):
+        return stream.chaturbate_m3u8_url
+    if platform == 'stripchat' and getattr(stream, 'stripchat_m3u8_url', None):
+        return stream.stripchat_m3u8_url
+    return stream.room_url
+
+def load_streams():
+    """Every stream with its subclass columns, in a fixed number of queries"""
+    return Stream.query.options(selectin_polymorphic(Stream, [ChaturbateStream, StripchatStream])).all()
+
+def probe_streams(targets, concurrency=50, timeout=5, stall_after=STALL_SECONDS):
+    """{stream_id: status} for (stream_id, url) pairs, at most `concurrency` probes in flight"""
+    session = get_probe_session(concurrency)
+    pool = gevent.pool.Pool(max(1, concurrency))
+    results = {}
+
+    def probe(target):
+        stream_id, url = target
+        results[stream_id] = probe_url(url, timeout, session, stall_after)
+
+    for target in targets:
+        pool.spawn(probe, target)
+    pool.join()
+    # Streams that stopped being probed, or whose URL rotated, leave nothing behind
+    prune_playlist_states(url for _, url in targets)
+    return results
+
+def write_status_changes(changes):
+    """Apply {stream_id: new_status} in one UPDATE; the caller commits
+
+    Only the liveness status is written. is_monitored belongs to start_monitoring
+    and stop_monitoring and is left alone.
+    """
+    if not changes:
+        return 0
+    return Stream.query.filter(Stream.id.in_(list(changes))).update({
+        Stream.status: case(changes, value=Stream.id)
+    }, synchronize_session=False)
+
+class PassTimer:
+    """Timings of one status pass, logged when it finishes"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.marks = {}
+
+    def mark(self, phase):
+        self.marks[phase] = time.monotonic() - self.started
+
+    def report(self, streams, changed, probed=None):
+        elapsed = time.monotonic() - self.started
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.marks.items())
+        probed = "" if probed is None else f" ({probed} probed)"
+        message = f"Stream status pass: {streams} streams{probed}, {changed} changed in {elapsed:.2f}s ({phases})"
+        if elapsed > self.interval:
+            logger.warning(f"{message}; exceeds the {self.interval}s interval")
+        else:
+            logger.info(message)
+        return elapsed
@@ -924,13 +924,15 @@ async def show_detection_status(update: Update, chat_id: int, token: str) -> Non
         return
     
     status_text = "*Detection Status*\n\n"
-    for stream in streams:
-        stream_id = stream.get('id')
-        status_response = await api_request('get', f'api/detection-status/{stream_id}', token=token)
-        if 'error' in status_response:
-            status_text += f"Stream #{stream_id}: Error - {status_response['error']}\n"
-        else:
-            status = "🟢 Active" if status_response.get('active', False) else "⚫ Inactive"
+    stream_ids = [stream.get('id') for stream in streams]
+    status_response = await api_request('post', 'api/detection-status', {'stream_ids': stream_ids}, token=token)
+    if 'error' in status_response:
+        status_text += f"Error - {status_response['error']}\n"
+    else:
+        statuses = {entry.get('stream_id'): entry for entry in status_response.get('streams', [])}
+        for stream in streams:
+            stream_id = stream.get('id')
+            status = "🟢 Active" if statuses.get(stream_id, {}).get('active', False) else "⚫ Inactive"
             status_text += f"Stream #{stream_id}: {status} ({stream.get('streamer_username', 'Unnamed')})\n"
     
     await update.message.reply_text(
@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extensions import db  # noqa: E402
+import models  # noqa: E402,F401
+
+@pytest.fixture
+def app():
+    """Flask app on an in-memory SQLite database with foreign keys enforced; Redis is left unconfigured"""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'check_same_thread': False}}
+    )
+    db.init_app(app)
+    with app.app_context():
+        event.listen(db.engine, 'connect', lambda conn, _: conn.execute('PRAGMA foreign_keys=ON'))
+        db.engine.dispose()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
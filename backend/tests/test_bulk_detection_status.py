@@ -0,0 +1,62 @@
+import pytest
+from extensions import db
+from models import Assignment, Stream, User
+from routes.detection_routes import MAX_BULK_STATUS_STREAMS, detection_bp
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(detection_bp)
+    agent = User(username='agent', password='x', email='agent@example.com', role='agent')
+    streams = [Stream(room_url=f'https://example.com/{i}', streamer_username=f's{i}', type='stream',
+                      status='online', is_monitored=i == 1) for i in range(3)]
+    db.session.add_all([agent, *streams])
+    db.session.commit()
+    db.session.add(Assignment(agent_id=agent.id, stream_id=streams[1].id))
+    db.session.commit()
+    client = app.test_client()
+    client.agent_id = agent.id
+    client.stream_ids = [stream.id for stream in streams]
+    return client
+
+def login(client):
+    with client.session_transaction() as session:
+        session['user_id'] = client.agent_id
+        session['user_role'] = 'agent'
+
+def test_requires_login(client):
+    assert client.get('/api/detection-status?stream_ids=1').status_code == 401
+
+@pytest.mark.parametrize('body', [[1, 2], 'ids', 5])
+def test_rejects_non_object_body(client, body):
+    login(client)
+    assert client.post('/api/detection-status', json=body).status_code == 400
+
+@pytest.mark.parametrize('query', ['stream_ids=1,x', 'stream_ids=', ''])
+def test_rejects_bad_or_missing_ids(client, query):
+    login(client)
+    assert client.get(f'/api/detection-status?{query}').status_code == 400
+
+def test_rejects_non_list_ids_in_body(client):
+    login(client)
+    assert client.post('/api/detection-status', json={'stream_ids': 3}).status_code == 400
+
+def test_rejects_too_many_streams(client):
+    login(client)
+    ids = list(range(1, MAX_BULK_STATUS_STREAMS + 2))
+    assert client.post('/api/detection-status', json={'stream_ids': ids}).status_code == 400
+
+def test_returns_streams_in_request_order_and_lists_missing(client):
+    login(client)
+    first, second, third = client.stream_ids
+    response = client.post('/api/detection-status', json={'stream_ids': [third, 9999, first, third]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [entry['stream_id'] for entry in data['streams']] == [third, first]
+    assert data['missing'] == [9999]
+
+def test_assigned_to_me(client):
+    login(client)
+    data = client.get('/api/detection-status?assigned=me').get_json()
+    assert [entry['stream_id'] for entry in data['streams']] == [client.stream_ids[1]]
+    # Without Redis the stream row decides whether detection is active
+    assert data['streams'][0]['active'] is True
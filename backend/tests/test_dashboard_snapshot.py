@@ -0,0 +1,31 @@
+import orjson
+import dashboard_snapshot
+from extensions import db
+from models import Stream
+from routes.dashboard_routes import dashboard_bp
+
+class EmptySnapshotRedis:
+    """A Redis holding no snapshot, where rebuilding never manages to publish one"""
+
+    def hmget(self, key, *fields):
+        return [None] * len(fields)
+
+    def hget(self, key, field):
+        return None
+
+def test_failed_rebuild_serves_fresh_body_without_etag(app, monkeypatch):
+    monkeypatch.setattr(dashboard_snapshot, '_redis_client', lambda: EmptySnapshotRedis())
+    monkeypatch.setattr(dashboard_snapshot, 'rebuild_dashboard', lambda: None)
+    monkeypatch.setattr(dashboard_snapshot, '_local', (None, None))
+    app.register_blueprint(dashboard_bp)
+    db.session.add(Stream(room_url='https://example.com/a', streamer_username='a', type='stream', status='online'))
+    db.session.commit()
+
+    etag, body = dashboard_snapshot.dashboard_snapshot()
+    assert etag is None
+    assert body is not None
+
+    response = app.test_client().get('/api/dashboard')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert orjson.loads(response.data)
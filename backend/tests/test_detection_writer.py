@@ -0,0 +1,58 @@
+import pytest
+import detection_writer
+from detection_writer import DetectionLogWriter
+from extensions import db
+from models import Assignment, DetectionLog, Stream, User
+from stream_context import stream_contexts
+
+@pytest.fixture
+def writer(app, monkeypatch):
+    # Inbox filing, counters and socket pushes are not under test here
+    monkeypatch.setattr(detection_writer, 'add_to_inbox', lambda entries: None)
+    monkeypatch.setattr(detection_writer, 'alerts_created', lambda entries: None)
+    monkeypatch.setattr(detection_writer, 'bump_notifications_version', lambda: None)
+    emitted = []
+    monkeypatch.setattr(detection_writer, 'emit_notification', emitted.append)
+    writer = DetectionLogWriter(app)
+    writer.emitted = emitted
+    stream_contexts.invalidate()
+    yield writer
+    writer.close(timeout=1)
+    stream_contexts.invalidate()
+
+def row(room_url='https://example.com/room', **values):
+    return {'room_url': room_url, 'event_type': 'chat_detection', 'details': {}, **values}
+
+def test_batch_is_written_in_one_insert(writer, monkeypatch):
+    monkeypatch.setattr(DetectionLogWriter, '_insert_individually',
+                        lambda self, batch: pytest.fail('fell back to row-by-row'))
+    writer._flush([(row(), None) for _ in range(5)])
+    assert DetectionLog.query.count() == 5
+    assert len(writer.emitted) == 5
+
+def test_bad_row_falls_back_to_row_by_row(writer):
+    batch = [(row(), None), (row(event_type=None), None), (row(), {'extra': 1})]
+    writer._flush(batch)
+    assert DetectionLog.query.count() == 2
+    # Notifications line up with their rows; the dropped one is skipped
+    assert len(writer.emitted) == 2
+    assert writer.emitted[1]['extra'] == 1
+
+def test_dropped_rows_are_logged_critical(writer, caplog):
+    entries = writer._insert_individually([(row(event_type=None), None)])
+    assert entries == [None]
+    assert any(record.levelname == 'CRITICAL' and 'DROPPED' in record.message for record in caplog.records)
+
+def test_stale_assignment_is_replaced_with_the_current_one(writer):
+    agent = User(username='agent', password='x', email='agent@example.com', role='agent')
+    stream = Stream(room_url='https://example.com/room', streamer_username='room', type='stream')
+    db.session.add_all([agent, stream])
+    db.session.commit()
+    assignment = Assignment(agent_id=agent.id, stream_id=stream.id)
+    db.session.add(assignment)
+    db.session.commit()
+
+    # The monitor still holds an assignment and agent that were deleted
+    entries = writer._insert_individually([(row(assignment_id=assignment.id + 100, assigned_agent=agent.id + 100), None)])
+    assert entries[0] is not None
+    assert (entries[0].assignment_id, entries[0].assigned_agent) == (assignment.id, agent.id)
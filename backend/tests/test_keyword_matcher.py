@@ -0,0 +1,47 @@
+import random
+import re
+import pytest
+from keyword_matcher import KeywordMatcher, get_keyword_matcher
+
+# Only characters whose word/non-word class agrees between str.isalnum() and \w
+ALPHABET = "ab_1 -.'"
+
+def regex_matches(keywords, text):
+    """Every whole-word (keyword, start, end) hit, found with one overlapping regex per keyword"""
+    found = set()
+    text = text.lower()
+    for keyword in {kw.strip().lower() for kw in keywords if kw and kw.strip()}:
+        pattern = re.compile(r'(?=(?<!\w)(' + re.escape(keyword) + r')(?!\w))')
+        for match in pattern.finditer(text):
+            found.add((keyword, match.start(1), match.end(1)))
+    return found
+
+def random_text(rng, length):
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+@pytest.mark.parametrize('seed', range(300))
+def test_matches_regex_oracle(seed):
+    rng = random.Random(seed)
+    keywords = [random_text(rng, rng.randint(1, 4)) for _ in range(rng.randint(1, 8))]
+    text = random_text(rng, rng.randint(0, 60))
+    if rng.random() < 0.5:
+        text = text.upper()
+    matcher = KeywordMatcher(keywords)
+    assert set(matcher.iter_matches(text)) == regex_matches(keywords, text)
+
+def test_findall_distinct_in_order_of_first_occurrence():
+    matcher = KeywordMatcher(['scam', 'pay', 'PayPal'])
+    assert matcher.findall('Pay me on paypal, it is not a scam. pay now') == ['pay', 'paypal', 'scam']
+
+def test_word_boundaries():
+    matcher = KeywordMatcher(['ass'])
+    assert matcher.findall('first class passage') == []
+    assert matcher.findall('you ass!') == ['ass']
+
+def test_empty_keywords_and_text():
+    assert not KeywordMatcher(['', '  '])
+    assert KeywordMatcher(['', '  ']).findall('anything') == []
+    assert KeywordMatcher(['x']).findall('') == []
+
+def test_shared_matcher_is_reused_for_the_same_set():
+    assert get_keyword_matcher(['b', 'A']) is get_keyword_matcher([' a', 'B'])
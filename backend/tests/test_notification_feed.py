@@ -0,0 +1,52 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import pytest
+from models import DetectionLog
+from notification_feed import decode_cursor, encode_cursor, summarize, summary_query
+
+Row = namedtuple('Row', 'cursor_timestamp cursor_id')
+
+@pytest.mark.parametrize('timestamp', [
+    datetime(2024, 5, 1, 12, 30, 15, 123456),
+    datetime(2024, 5, 1, 12, 30, 15, tzinfo=timezone.utc),
+    datetime(2024, 5, 1, 12, 30, 15, tzinfo=timezone(timedelta(hours=-5))),
+    None
+])
+@pytest.mark.parametrize('row_id', [1, 987654321])
+def test_cursor_round_trip(timestamp, row_id):
+    cursor = encode_cursor(Row(timestamp, row_id))
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (timestamp, row_id)
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor', 'bm90aGluZw', 'MjAyNC0wNS0wMXxhYmM'])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_summary_rows_encode_and_page(app):
+    from extensions import db
+    from notification_feed import after_cursor, newest_first
+    base = datetime(2024, 1, 1)
+    db.session.add_all([DetectionLog(room_url='r', event_type='chat_detection', timestamp=base + timedelta(minutes=i))
+                        for i in range(5)])
+    db.session.add(DetectionLog(room_url='r', event_type='chat_detection', timestamp=None))
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        rows = newest_first(after_cursor(summary_query(), cursor)).limit(3).all()
+        if not rows:
+            break
+        seen.extend(row.id for row in rows)
+        cursor = encode_cursor(rows[-1])
+    assert sorted(seen) == sorted(entry.id for entry in DetectionLog.query)
+    assert len(seen) == len(set(seen))
+
+def test_assigned_agent_has_the_same_type_in_both_paths(app):
+    from extensions import db
+    from notification_feed import summarize_entry
+    entry = DetectionLog(room_url='r', event_type='object_detection', details={'assigned_agent': 7})
+    db.session.add(entry)
+    db.session.commit()
+    assert summarize_entry(entry)['assigned_agent'] == '7'
+    assert summarize(summary_query().one())['assigned_agent'] == '7'
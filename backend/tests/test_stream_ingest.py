@@ -0,0 +1,56 @@
+import random
+from types import SimpleNamespace
+import pytest
+from gevent.event import Event
+from gevent.queue import Queue
+from stream_ingest import StreamIngest
+
+def packets(count, gop, seed):
+    """Sequence-numbered video packets with a keyframe every gop packets, offset at random"""
+    offset = random.Random(seed).randrange(gop)
+    return [SimpleNamespace(seq=i, is_keyframe=(i + offset) % gop == 0) for i in range(count)]
+
+def drain(queue):
+    drained = []
+    while not queue.empty():
+        drained.append(queue.get_nowait())
+    return drained
+
+@pytest.mark.parametrize('seed', range(20))
+def test_video_resumes_at_keyframe_after_drop(seed):
+    rng = random.Random(seed)
+    ingest = StreamIngest('test://stream', Event(), queue_size=8)
+    queue = Queue(maxsize=8)
+    delivered = []
+    for packet in packets(400, rng.randint(3, 12), seed):
+        ingest._enqueue('video', queue, packet)
+        # A consumer that is usually too slow to keep up
+        if rng.random() < 0.3 and not queue.empty():
+            delivered.append(queue.get_nowait())
+    delivered.extend(drain(queue))
+
+    assert ingest.dropped.get('video')
+    assert len(delivered) + ingest.dropped['video'] == 400
+    for previous, packet in zip(delivered, delivered[1:]):
+        assert packet.seq > previous.seq
+        if packet.seq != previous.seq + 1:
+            assert packet.is_keyframe, f"packet {packet.seq} follows a drop but is not a keyframe"
+
+def test_full_queue_flushes_backlog_for_new_keyframe():
+    ingest = StreamIngest('test://stream', Event(), queue_size=4)
+    queue = Queue(maxsize=4)
+    for seq in range(9):
+        ingest._enqueue('video', queue, SimpleNamespace(seq=seq, is_keyframe=seq % 6 == 0))
+
+    # 4 and 5 are skipped as the tail of a dropped GOP, then 0-3 are flushed for keyframe 6
+    assert [packet.seq for packet in drain(queue)] == [6, 7, 8]
+    assert ingest.dropped == {'video': 6}
+
+def test_audio_drops_oldest():
+    ingest = StreamIngest('test://stream', Event(), queue_size=3)
+    queue = Queue(maxsize=3)
+    for seq in range(5):
+        ingest._enqueue('audio', queue, SimpleNamespace(seq=seq))
+
+    assert [packet.seq for packet in drain(queue)] == [2, 3, 4]
+    assert ingest.dropped == {'audio': 2}
@@ -0,0 +1,34 @@
+import time
+import stream_liveness
+from extensions import db
+from ingest_heartbeat import heartbeat_status
+from models import Stream
+from stream_liveness import PlaylistState, probe_streams, write_status_changes
+
+def test_heartbeat_uses_probe_vocabulary():
+    assert heartbeat_status({'last_packet': time.time()}, stall_after=30) == 'online'
+    assert heartbeat_status({'last_packet': time.time() - 60}, stall_after=30) == 'offline'
+
+def test_status_write_leaves_monitored_flag_alone(app):
+    monitored = Stream(room_url='https://example.com/a', streamer_username='a', type='stream',
+                       status='online', is_monitored=True)
+    idle = Stream(room_url='https://example.com/b', streamer_username='b', type='stream',
+                  status='offline', is_monitored=False)
+    db.session.add_all([monitored, idle])
+    db.session.commit()
+
+    assert write_status_changes({monitored.id: 'offline', idle.id: 'online'}) == 2
+    db.session.commit()
+    db.session.expire_all()
+
+    assert (monitored.status, monitored.is_monitored) == ('offline', True)
+    assert (idle.status, idle.is_monitored) == ('online', False)
+
+def test_probe_pass_forgets_playlists_no_longer_probed(monkeypatch):
+    monkeypatch.setattr(stream_liveness, '_playlist_states', {
+        url: PlaylistState() for url in ('https://cdn/a.m3u8?token=1', 'https://cdn/a.m3u8?token=2', 'https://cdn/b.m3u8')
+    })
+    monkeypatch.setattr(stream_liveness, 'probe_url', lambda url, *args: 'online')
+
+    assert probe_streams([(1, 'https://cdn/a.m3u8?token=2')]) == {1: 'online'}
+    assert list(stream_liveness._playlist_states) == ['https://cdn/a.m3u8?token=2']
@@ -0,0 +1,39 @@
+import pytest
+from extensions import db
+from models import AgentInbox, Assignment, DetectionLog, Stream, User
+import routes.stream_routes as stream_routes
+
+@pytest.fixture
+def client(app, monkeypatch):
+    # Admin/agent notifications and socket pushes are not under test here
+    monkeypatch.setattr(stream_routes.NotificationService, 'send_user_notification', staticmethod(lambda *a, **k: None))
+    monkeypatch.setattr(stream_routes.NotificationService, 'notify_admins', staticmethod(lambda *a, **k: None))
+    updates = []
+    monkeypatch.setattr(stream_routes, 'emit_stream_update', updates.append)
+    app.register_blueprint(stream_routes.stream_bp)
+    client = app.test_client()
+    client.updates = updates
+    return client
+
+def test_delete_stream(client):
+    agent = User(username='agent', password='x', email='agent@example.com', role='agent')
+    stream = Stream(room_url='https://example.com/room', streamer_username='room', type='stream')
+    db.session.add_all([agent, stream])
+    db.session.commit()
+    detection = DetectionLog(room_url=stream.room_url, event_type='chat_detection')
+    db.session.add_all([Assignment(agent_id=agent.id, stream_id=stream.id), detection])
+    db.session.commit()
+    db.session.add(AgentInbox(agent_id=agent.id, detection_id=detection.id, stream_id=stream.id,
+                              timestamp=detection.timestamp))
+    db.session.commit()
+    stream_id = stream.id
+
+    response = client.delete(f'/api/streams/{stream_id}')
+
+    assert response.status_code == 200
+    assert Stream.query.get(stream_id) is None
+    assert AgentInbox.query.filter_by(stream_id=stream_id).count() == 0
+    assert client.updates[-1]['action'] == 'deleted'
+
+def test_delete_missing_stream(client):
+    assert client.delete('/api/streams/999').status_code == 404
@@ -0,0 +1,62 @@
+import pytest
+import monitor_state
+from monitoring import resolve_video_sampling
+
+class HashRedis:
+    """Just enough of a decoded Redis client for the sampling hashes"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        return []
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({field: str(value) for field, value in mapping.items()})
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+@pytest.fixture
+def config(app):
+    app.config.update(VIDEO_SAMPLING_POLICY='keyframe', VIDEO_SAMPLE_INTERVAL=5.0)
+    return app.config
+
+def test_missing_fields_follow_config(config):
+    assert resolve_video_sampling() == {'policy': 'keyframe', 'interval': 5.0}
+    assert resolve_video_sampling({'interval': None}) == {'policy': 'keyframe', 'interval': 5.0}
+    assert resolve_video_sampling({'policy': 'DEADLINE', 'interval': '2'}) == {'policy': 'deadline', 'interval': 2.0}
+
+@pytest.mark.parametrize('overrides', [
+    {'interval': 0},
+    {'interval': -1},
+    {'interval': '0'},
+    {'interval': ''},
+    {'interval': True},
+    {'interval': 'nan'},
+    {'policy': ''},
+    {'policy': 'sometimes'},
+    [1, 2],
+    'keyframe',
+])
+def test_rejects_invalid_overrides(config, overrides):
+    with pytest.raises(ValueError):
+        resolve_video_sampling(overrides)
+
+def test_override_round_trips_through_redis(config, monkeypatch):
+    client = HashRedis()
+    monkeypatch.setattr(monitor_state, '_redis_client', lambda: client)
+
+    assert monitor_state.read_video_sampling(7) is None
+    monitor_state.save_video_sampling(7, {'interval': 2, 'policy': None})
+    stored = monitor_state.read_video_sampling(7)
+    assert resolve_video_sampling(stored) == {'policy': 'keyframe', 'interval': 2.0}
+
+    monitor_state.clear_video_sampling(7)
+    assert monitor_state.read_video_sampling(7) is None
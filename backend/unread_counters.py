@@ -0,0 +1,268 @@
+"""
+unread_counters.py - Unread badge counts kept in Redis
+
+Unread counts used to be recomputed with a COUNT query on every request. They
+are now counters in Redis:
+
+- unread:alerts is a hash with one field per agent (unread rows in that
+  agent's inbox) and the field 'all' (every unread DetectionLog, the admin
+  view).
+- unread:messages:<receiver_id> is a hash with one field per sender, counting
+  unread direct messages.
+
+Writes adjust the counters after they commit and push the new value to the
+affected users as an unread_counts Socket.IO event. Operations that change
+many rows at once drop the affected fields instead. A missing field is
+recounted from the database on the next read, and is never incremented, so
+every counter starts from a database total. reconcile_unread_counts() runs
+on the scheduler and rewrites everything from the database to correct drift.
+Without Redis every read falls back to the database.
+"""
+import logging
+from sqlalchemy import func
+from extensions import db, redis_service
+from models import AgentInbox, ChatMessage, DetectionLog, User
+from utils.notifications import emit_unread_counts
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+ALERTS_KEY = "unread:alerts"
+ADMIN_FIELD = "all"
+MESSAGES_KEY = "unread:messages:{}"
+# Marks a message hash as loaded even when the receiver has nothing unread
+LOADED_FIELD = "_loaded"
+
+# Only adjust counters that were loaded from the database; never go below zero
+_ADJUST_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    return false
+end
+local value = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+if value < 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], 0)
+    value = 0
+end
+return value
+"""
+
+_adjust_script = None
+
+def _redis_client():
+    if redis_service is None or not redis_service.is_available():
+        return None
+    return redis_service.redis_client
+
+def _adjust(client, key, field, delta):
+    """New value of the counter, or None if it is not loaded"""
+    global _adjust_script
+    if _adjust_script is None:
+        _adjust_script = client.register_script(_ADJUST_SCRIPT)
+    value = _adjust_script(keys=[key], args=[field, delta])
+    return None if value is None else int(value)
+
+def _alert_room(field):
+    return "role_admin" if field == ADMIN_FIELD else f"user_{field}"
+
+# --------------------------------------------------------------------
+# Alerts
+# --------------------------------------------------------------------
+def _count_alerts(field):
+    if field == ADMIN_FIELD:
+        return DetectionLog.query.filter(DetectionLog.read == False).count()
+    return AgentInbox.query.filter(AgentInbox.agent_id == int(field), AgentInbox.read == False).count()
+
+def alert_unread_count(user):
+    """Unread alerts for a user: the whole log for admins, their inbox for agents"""
+    field = ADMIN_FIELD if user.role == 'admin' else str(user.id)
+    client = _redis_client()
+    if client is not None:
+        try:
+            value = client.hget(ALERTS_KEY, field)
+            if value is not None:
+                return int(value)
+        except Exception as e:
+            logger.error(f"Error reading unread alert count for {field}: {e}")
+    count = _count_alerts(field)
+    if client is not None:
+        try:
+            client.hsetnx(ALERTS_KEY, field, count)
+        except Exception as e:
+            logger.error(f"Error storing unread alert count for {field}: {e}")
+    return count
+
+def adjust_alert_counts(deltas):
+    """Apply {agent_id or ADMIN_FIELD: delta} after a commit and push the new badges"""
+    client = _redis_client()
+    if client is None:
+        return
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            value = _adjust(client, ALERTS_KEY, str(field), delta)
+        except Exception as e:
+            logger.error(f"Error adjusting unread alert count for {field}: {e}")
+            continue
+        if value is not None:
+            emit_unread_counts({'alerts': value}, _alert_room(str(field)))
+
+def alerts_created(entries):
+    """Count newly committed DetectionLogs in the admin badge; inbox rows count themselves"""
+    unread = sum(1 for entry in entries if entry is not None and not entry.read)
+    adjust_alert_counts({ADMIN_FIELD: unread})
+
+def alerts_read(agent_ids, admin=False, read=True):
+    """Adjust badges after one alert's read flag changed for these agents and, if admin, globally"""
+    delta = -1 if read else 1
+    deltas = {agent_id: delta for agent_id in agent_ids}
+    if admin:
+        deltas[ADMIN_FIELD] = delta
+    adjust_alert_counts(deltas)
+
+def alerts_bulk_read(count, agent_id=None):
+    """Adjust badges after a bulk mark-read: count alerts went read globally, inbox rows changed wholesale"""
+    adjust_alert_counts({ADMIN_FIELD: -count})
+    invalidate_alert_counts(None if agent_id is None else [agent_id])
+
+def invalidate_alert_counts(agent_ids=None, admin=False):
+    """Drop counters a bulk change made stale; agent_ids=None drops every agent's"""
+    client = _redis_client()
+    if client is None:
+        return
+    try:
+        if agent_ids is None:
+            fields = [field for field in client.hkeys(ALERTS_KEY) if field != ADMIN_FIELD]
+        else:
+            fields = [str(agent_id) for agent_id in agent_ids]
+        if admin:
+            fields.append(ADMIN_FIELD)
+        if fields:
+            client.hdel(ALERTS_KEY, *fields)
+    except Exception as e:
+        logger.error(f"Error invalidating unread alert counts: {e}")
+
+# --------------------------------------------------------------------
+# Direct messages
+# --------------------------------------------------------------------
+def _count_messages(receiver_id=None):
+    query = db.session.query(ChatMessage.receiver_id, ChatMessage.sender_id, func.count(ChatMessage.id)).filter(
+        ChatMessage.read == False
+    )
+    if receiver_id is not None:
+        query = query.filter(ChatMessage.receiver_id == receiver_id)
+    counts = {}
+    for receiver, sender, count in query.group_by(ChatMessage.receiver_id, ChatMessage.sender_id):
+        counts.setdefault(receiver, {})[sender] = count
+    return counts
+
+def _store_messages(pipe, receiver_id, counts):
+    key = MESSAGES_KEY.format(receiver_id)
+    pipe.delete(key)
+    pipe.hset(key, mapping={LOADED_FIELD: 1, **{str(sender): count for sender, count in counts.items()}})
+
+def message_unread_counts(receiver_id):
+    """{sender_id: unread count} of direct messages sent to receiver_id"""
+    client = _redis_client()
+    if client is not None:
+        try:
+            stored = client.hgetall(MESSAGES_KEY.format(receiver_id))
+            if LOADED_FIELD in stored:
+                return {int(sender): int(count) for sender, count in stored.items()
+                        if sender != LOADED_FIELD and int(count) > 0}
+        except Exception as e:
+            logger.error(f"Error reading unread message counts for {receiver_id}: {e}")
+    counts = _count_messages(receiver_id).get(receiver_id, {})
+    if client is not None:
+        try:
+            pipe = client.pipeline()
+            _store_messages(pipe, receiver_id, counts)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error storing unread message counts for {receiver_id}: {e}")
+    return counts
+
+def adjust_message_counts(deltas):
+    """Apply {(receiver_id, sender_id): delta} after a commit and push the new badges"""
+    client = _redis_client()
+    if client is None:
+        return
+    for (receiver_id, sender_id), delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            value = _adjust(client, MESSAGES_KEY.format(receiver_id), str(sender_id), delta)
+            if value is None and client.hexists(MESSAGES_KEY.format(receiver_id), LOADED_FIELD):
+                # First unread message from this sender to a receiver whose counts are loaded
+                value = max(delta, 0)
+                client.hsetnx(MESSAGES_KEY.format(receiver_id), str(sender_id), value)
+        except Exception as e:
+            logger.error(f"Error adjusting unread message count for {receiver_id}: {e}")
+            continue
+        if value is not None:
+            emit_unread_counts({'messages': {str(sender_id): value}}, f"user_{receiver_id}")
+
+def message_created(message):
+    if not message.read:
+        adjust_message_counts({(message.receiver_id, message.sender_id): 1})
+
+def messages_read(pairs):
+    """Adjust badges after messages were marked read; pairs holds one (receiver_id, sender_id) per message"""
+    deltas = {}
+    for pair in pairs:
+        deltas[tuple(pair)] = deltas.get(tuple(pair), 0) - 1
+    adjust_message_counts(deltas)
+
+# --------------------------------------------------------------------
+# Reconciliation
+# --------------------------------------------------------------------
+def reconcile_unread_counts():
+    """Rewrite every counter from the database and push the badges that were off"""
+    client = _redis_client()
+    if client is None:
+        return
+    alerts = {str(agent_id): 0 for (agent_id,) in db.session.query(User.id).filter(User.role == 'agent')}
+    alerts.update({str(agent_id): count for agent_id, count in db.session.query(
+        AgentInbox.agent_id, func.count(AgentInbox.id)
+    ).filter(AgentInbox.read == False).group_by(AgentInbox.agent_id)})
+    alerts[ADMIN_FIELD] = _count_alerts(ADMIN_FIELD)
+    messages = _count_messages()
+    receivers = [user_id for (user_id,) in db.session.query(User.id)]
+
+    try:
+        previous_alerts = client.hgetall(ALERTS_KEY)
+        pipe = client.pipeline()
+        pipe.delete(ALERTS_KEY)
+        pipe.hset(ALERTS_KEY, mapping=alerts)
+        for receiver_id in receivers:
+            pipe.hgetall(MESSAGES_KEY.format(receiver_id))
+            _store_messages(pipe, receiver_id, messages.get(receiver_id, {}))
+        results = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reconciling unread counts: {e}")
+        return
+
+    drifted = 0
+    for field, count in alerts.items():
+        if field in previous_alerts and int(previous_alerts[field]) != count:
+            drifted += 1
+            emit_unread_counts({'alerts': count}, _alert_room(field))
+    # Each receiver queued hgetall, delete and hset, after the two alert commands
+    for index, receiver_id in enumerate(receivers):
+        previous = results[2 + index * 3]
+        if LOADED_FIELD not in previous:
+            continue
+        current = messages.get(receiver_id, {})
+        changed = {str(sender): current.get(sender, 0) for sender in
+                   {int(s) for s in previous if s != LOADED_FIELD} | set(current)
+                   if int(previous.get(str(sender), 0)) != current.get(sender, 0)}
+        if changed:
+            drifted += 1
+            emit_unread_counts({'messages': changed}, f"user_{receiver_id}")
+    if drifted:
+        logger.info(f"Reconciled unread counts; {drifted} were off")
@@ -126,6 +126,48 @@ def emit_notification_update(notification_id, update_type='read', forward_to_mai
         logger.error(f"Error emitting notification update: {str(e)}")
         return False
 
+def emit_notifications_bulk_update(update_type, count, filters=None, agent_id=None, forward_to_main=False):
+    """Emit one summarized update for a bulk read/delete instead of one event per notification"""
+    socketio = get_socketio()
+    namespace = '/notifications'
+    data = {'type': update_type, 'count': count, 'filters': filters or {}, 'agent_id': agent_id}
+
+    try:
+        if socketio:
+            socketio.emit('notifications_bulk_update', data, namespace=namespace)
+            logger.info(f"Emitted bulk notification update: {update_type} x{count}")
+        else:
+            logger.warning("Socket.IO not initialized; attempting to forward to main app")
+            forward_to_main = True
+
+        if forward_to_main:
+            forward_to_main_app('notifications_bulk_update', data, namespace)
+
+        return True
+    except Exception as e:
+        logger.error(f"Error emitting bulk notification update: {str(e)}")
+        return False
+
+def emit_unread_counts(counts, room, forward_to_main=False):
+    """Push updated unread badge counts to a user or role room"""
+    socketio = get_socketio()
+    namespace = '/notifications'
+
+    try:
+        if socketio:
+            socketio.emit('unread_counts', counts, room=room, namespace=namespace)
+            logger.debug(f"Emitted unread counts to {room}")
+        else:
+            forward_to_main = True
+
+        if forward_to_main:
+            forward_to_main_app('unread_counts', {'data': counts, 'room': room}, namespace)
+
+        return True
+    except Exception as e:
+        logger.error(f"Error emitting unread counts: {str(e)}")
+        return False
+
 def emit_stream_update(stream_data, forward_to_main=False):
     """Emit a stream update to all connected clients"""
     socketio = get_socketio()
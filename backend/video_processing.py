@@ -1,15 +1,20 @@
 import logging
-import cv2
 import numpy as np
 from datetime import datetime, timedelta
 from flask import current_app
-from models import DetectionLog, Stream, ChaturbateStream, StripchatStream
-from extensions import db
-from utils.notifications import emit_notification
+from inference_workers import get_inference_pool, yolo_predict
+from flagged_terms import get_flagged_objects
+from stream_context import get_stream_context
+from evidence_pipeline import submit_video_evidence
 from dotenv import load_dotenv
-import base64
 import os
 import threading
+import gevent
+from gevent.event import AsyncResult
+from gevent.pool import Pool
+from gevent.queue import Queue, Empty
+from collections import namedtuple
+from time import monotonic
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +30,7 @@ logger = logging.getLogger(__name__)
 # External dependencies - initialize with default values
 _yolo_model = None
 _yolo_lock = threading.Lock()  # Initialize with threading.Lock
+_yolo_batcher = None
 last_visual_alerts = {}
 
 def initialize_video_globals(yolo_model=None, yolo_lock=None):
@@ -67,84 +73,186 @@ def load_yolo_model():
                 _yolo_model = None
     return _yolo_model
 
+class YoloBatcher:
+    """
+    Collect frames submitted by every monitored stream and run them through
+    YOLO in batches. A batch is dispatched once it reaches max_batch_size or
+    once its oldest frame has waited max_wait seconds; each caller gets back
+    the detections for its own frame. Up to `concurrency` batches run at once,
+    one per inference worker process.
+    """
+
+    def __init__(self, runner, max_batch_size=8, max_wait=0.05, concurrency=1):
+        self.runner = runner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._queue = Queue()
+        self._dispatchers = Pool(max(1, concurrency))
+        self._worker = gevent.spawn(self._run)
+
+    def infer(self, frame, timeout=60):
+        """Queue a frame for the next batch and wait for its (class_name, confidence, xyxy) detections"""
+        result = AsyncResult()
+        self._queue.put((frame, result))
+        return result.get(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Keep collecting while every runner is busy so batches grow under load
+            self._dispatchers.wait_available()
+            self._dispatchers.spawn(self._dispatch, self._collect())
+
+    def _dispatch(self, batch):
+        # Frames from /api/detect may differ in size; letterboxed monitor frames never do
+        groups = {}
+        for frame, result in batch:
+            groups.setdefault(frame.shape, []).append((frame, result))
+        for group in groups.values():
+            try:
+                outputs = self.runner([frame for frame, _ in group])
+                for (_, result), output in zip(group, outputs):
+                    result.set(output)
+                logger.debug(f"YOLO batch of {len(group)} frames processed")
+            except Exception as e:
+                logger.error(f"YOLO batch inference error: {e}")
+                for _, result in group:
+                    result.set_exception(e)
+
+def get_yolo_batcher():
+    """Return the process-wide YOLO batcher, creating it on first use.
+
+    Batches go to the YOLO worker processes when YOLO_WORKERS > 0, otherwise
+    to a model loaded in this process. Returns None if no model is available.
+    """
+    global _yolo_batcher
+    if _yolo_batcher is not None:
+        return _yolo_batcher
+    config = current_app.config
+    imgsz = config.get('DETECTOR_INPUT_SIZE', 640)
+    pool = get_inference_pool('yolo', config)
+    if pool is not None:
+        runner = lambda frames: pool.detect(frames, imgsz)
+        concurrency = pool.size
+    else:
+        model = load_yolo_model()
+        if not model:
+            return None
+
+        def runner(frames):
+            with _yolo_lock:
+                return yolo_predict(model, frames, imgsz)
+        concurrency = 1
+    _yolo_batcher = YoloBatcher(
+        runner,
+        max_batch_size=config.get('YOLO_BATCH_SIZE', 8),
+        max_wait=config.get('YOLO_BATCH_MAX_WAIT', 0.05),
+        concurrency=concurrency
+    )
+    logger.info(f"YOLO batcher started (max batch {_yolo_batcher.max_batch_size}, max wait {_yolo_batcher.max_wait}s, "
+                f"{'worker processes' if pool is not None else 'in-process model'})")
+    return _yolo_batcher
+
+# Placement of a source frame inside the detector's square input
+LetterboxGeometry = namedtuple('LetterboxGeometry', ['scale', 'pad_x', 'pad_y', 'width', 'height'])
+
+def letterbox_geometry(src_width, src_height, size):
+    """Compute the scaled size and padding that fit a frame into a size x size square"""
+    scale = min(size / src_width, size / src_height)
+    new_width = max(1, int(round(src_width * scale)))
+    new_height = max(1, int(round(src_height * scale)))
+    return LetterboxGeometry(
+        scale=scale,
+        pad_x=(size - new_width) // 2,
+        pad_y=(size - new_height) // 2,
+        width=new_width,
+        height=new_height
+    )
+
+def unletterbox_bbox(bbox, geometry, src_width, src_height):
+    """Map an xyxy box from letterboxed detector coordinates back to the source frame"""
+    x1, y1, x2, y2 = bbox
+    x1 = min(max((x1 - geometry.pad_x) / geometry.scale, 0), src_width)
+    x2 = min(max((x2 - geometry.pad_x) / geometry.scale, 0), src_width)
+    y1 = min(max((y1 - geometry.pad_y) / geometry.scale, 0), src_height)
+    y2 = min(max((y2 - geometry.pad_y) / geometry.scale, 0), src_height)
+    return [x1, y1, x2, y2]
+
+class FrameLetterboxer:
+    """
+    Convert decoded PyAV frames straight to the detector's input geometry.
+    The decoder's scaler does the downscale and BGR conversion in one pass and
+    the result is written into a reused, padded square buffer, so no
+    full-resolution array is allocated per sampled frame.
+    """
+
+    def __init__(self, size=640, pad_value=114):
+        self.size = size
+        self.pad_value = pad_value
+        self._canvas = np.full((size, size, 3), pad_value, dtype=np.uint8)
+        self._source_size = None
+        self._geometry = None
+
+    def convert(self, frame):
+        """Return (canvas, geometry, source_size); the canvas is overwritten on the next call"""
+        source_size = (frame.width, frame.height)
+        if source_size != self._source_size:
+            self._geometry = letterbox_geometry(frame.width, frame.height, self.size)
+            self._source_size = source_size
+            self._canvas.fill(self.pad_value)
+        geometry = self._geometry
+        scaled = frame.reformat(width=geometry.width, height=geometry.height, format='bgr24').to_ndarray()
+        self._canvas[geometry.pad_y:geometry.pad_y + geometry.height,
+                     geometry.pad_x:geometry.pad_x + geometry.width] = scaled
+        return self._canvas, geometry, source_size
+
 def refresh_flagged_objects():
-    """Retrieve flagged objects and confidence thresholds"""
+    """Retrieve flagged objects and confidence thresholds from the versioned cache"""
     try:
-        with current_app.app_context():
-            from models import FlaggedObject
-            objects = FlaggedObject.query.all()
-            flagged = {obj.object_name.lower(): float(obj.confidence_threshold) for obj in objects}
-        logger.debug(f"Retrieved {len(flagged)} flagged objects")
-        return flagged
+        return get_flagged_objects()
     except Exception as e:
         logger.error(f"Error retrieving flagged objects: {e}")
         return {}
 
 def get_stream_info(stream_url):
     """Identify platform and streamer from URL"""
-    try:
-        with current_app.app_context():
-            cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=stream_url).first()
-            if cb_stream:
-                return 'chaturbate', cb_stream.streamer_username
-            sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=stream_url).first()
-            if sc_stream:
-                return 'stripchat', sc_stream.streamer_username
-            stream = Stream.query.filter_by(room_url=stream_url).first()
-            if stream:
-                return stream.type.lower(), stream.streamer_username
-        return 'unknown', 'unknown'
-    except Exception as e:
-        logger.error(f"Error getting stream info: {e}")
+    context = get_stream_context(stream_url)
+    if context is None:
         return 'unknown', 'unknown'
+    return context.platform, context.streamer
 
 def get_stream_assignment(stream_url):
     """Get assignment info for a stream"""
-    try:
-        from sqlalchemy.orm import joinedload
-        with current_app.app_context():
-            stream = Stream.query.filter_by(room_url=stream_url).first()
-            if not stream:
-                cb_stream = ChaturbateStream.query.filter_by(chaturbate_m3u8_url=stream_url).first()
-                if cb_stream:
-                    stream = Stream.query.get(cb_stream.id)
-                else:
-                    sc_stream = StripchatStream.query.filter_by(stripchat_m3u8_url=stream_url).first()
-                    if sc_stream:
-                        stream = Stream.query.get(sc_stream.id)
-            
-            if not stream:
-                logger.warning(f"No stream found for URL: {stream_url}")
-                return None, None
-            
-            from models import Assignment
-            query = Assignment.query.options(
-                joinedload(Assignment.agent),
-                joinedload(Assignment.stream)
-            ).filter_by(stream_id=stream.id)
-            
-            assignments = query.all()
-            
-            if not assignments:
-                logger.info(f"No assignments found for stream: {stream_url}")
-                return None, None
-            
-            assignment = assignments[0]
-            agent_id = assignment.agent_id
-            return assignment.id, agent_id
-    except Exception as e:
-        logger.error(f"Error getting stream assignment: {e}")
+    context = get_stream_context(stream_url)
+    if context is None or context.assignment_id is None:
         return None, None
+    return context.assignment_id, context.agent_id
+
+def process_video_frame(frame, stream_url, geometry=None, source_size=None):
+    """Detect objects in video frame.
 
-def process_video_frame(frame, stream_url):
-    """Detect objects in video frame"""
+    When the frame was produced by FrameLetterboxer, pass its geometry and
+    source size so bounding boxes are reported in source-frame coordinates.
+    """
     if not current_app.config.get('ENABLE_VIDEO_MONITORING', False):
         logger.info(f"Video monitoring disabled for {stream_url}")
         return []
     
     try:
-        model = load_yolo_model()
-        if not model:
+        batcher = get_yolo_batcher()
+        if batcher is None:
             logger.warning("No YOLO model available for processing")
             return []
             
@@ -153,106 +261,70 @@ def process_video_frame(frame, stream_url):
             logger.debug("No flagged objects found")
             return []
             
-        results = model(frame)
         detections = []
         now = datetime.now()
         
-        for result in results:
-            for box in result.boxes:
-                bbox = box.xyxy[0].cpu().numpy()
-                conf = float(box.conf[0].cpu().numpy())
-                cls_id = int(box.cls[0].cpu().numpy())
-                cls_name = model.names.get(cls_id, str(cls_id)).lower()
+        for cls_name, conf, bbox in batcher.infer(frame):
+            if geometry is not None:
+                bbox = unletterbox_bbox(bbox, geometry, *source_size)
+
+            if cls_name not in flagged or conf < flagged[cls_name]:
+                continue
                 
-                if cls_name not in flagged or conf < flagged[cls_name]:
+            if cls_name in last_visual_alerts.get(stream_url, {}):
+                last_alert = last_visual_alerts[stream_url][cls_name]
+                cooldown = current_app.config.get('VISUAL_ALERT_COOLDOWN', 60)  # Default 60 sec
+                if (now - last_alert).total_seconds() < cooldown:
                     continue
                     
-                if cls_name in last_visual_alerts.get(stream_url, {}):
-                    last_alert = last_visual_alerts[stream_url][cls_name]
-                    cooldown = current_app.config.get('VISUAL_ALERT_COOLDOWN', 60)  # Default 60 sec
-                    if (now - last_alert).total_seconds() < cooldown:
-                        continue
-                        
-                last_visual_alerts.setdefault(stream_url, {})[cls_name] = now
-                detections.append({
-                    "class": cls_name,
-                    "confidence": conf,
-                    "bbox": bbox.tolist(),
-                    "timestamp": now.isoformat()
-                })
-                
+            last_visual_alerts.setdefault(stream_url, {})[cls_name] = now
+            detections.append({
+                "class": cls_name,
+                "confidence": conf,
+                "bbox": bbox,
+                "timestamp": now.isoformat()
+            })
+            
         return detections
         
     except Exception as e:
         logger.error(f"Video processing error: {e}")
         return []
 
-def annotate_frame(frame, detections):
-    """Draw detection boxes on frame"""
-    try:
-        annotated = frame.copy()
-        for det in detections:
-            x1, y1, x2, y2 = map(int, det["bbox"])
-            label = f'{det["class"]} {det["confidence"]*100:.1f}%'
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(annotated, label, (x1, y1-10),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-        return annotated
-    except Exception as e:
-        logger.error(f"Error annotating frame: {e}")
-        return frame  # Return original frame if annotation fails
-
 def log_video_detection(detections, frame, stream_url):
-    """Log video detections with annotated frame"""
+    """Log video detections; the annotated evidence image is rendered asynchronously.
+
+    frame may be a BGR ndarray or a decoded PyAV frame, which is converted off the hub.
+    """
     if not current_app.config.get('ENABLE_VIDEO_MONITORING', False) or not detections:
         return
         
     try:
         platform, streamer = get_stream_info(stream_url)
         assignment_id, agent_id = get_stream_assignment(stream_url)
-        annotated = annotate_frame(frame, detections)
-        
-        success, buffer = cv2.imencode('.jpg', annotated)
-        if not success:
-            logger.error("Frame encoding failed")
-            return
-            
-        image_b64 = base64.b64encode(buffer).decode('utf-8')
         details = {
             "detections": detections,
             "timestamp": datetime.now().isoformat(),
             "streamer_name": streamer,
             "platform": platform,
-            "annotated_image": image_b64,
             "assigned_agent": agent_id
         }
-        
-        with current_app.app_context():
-            log_entry = DetectionLog(
-                room_url=stream_url,
-                event_type="object_detection",
-                details=details,
-                detection_image=buffer.tobytes(),
-                timestamp=datetime.now(),
-                assigned_agent=agent_id,
-                assignment_id=assignment_id,
-                read=False
-            )
-            db.session.add(log_entry)
-            db.session.commit()
-            
-            notification_data = {
-                "id": log_entry.id,
-                "event_type": log_entry.event_type,
-                "timestamp": log_entry.timestamp.isoformat(),
-                "details": log_entry.details,
-                "read": log_entry.read,
-                "room_url": log_entry.room_url,
+        submit_video_evidence(
+            frame,
+            detections,
+            {
+                "room_url": stream_url,
+                "event_type": "object_detection",
+                "details": details,
+                "timestamp": datetime.now(),
+                "assigned_agent": agent_id,
+                "assignment_id": assignment_id
+            },
+            {
                 "streamer": streamer,
                 "platform": platform,
                 "assigned_agent": "Unassigned" if not agent_id else "Agent"
             }
-            emit_notification(notification_data)
-            
+        )
     except Exception as e:
-        logger.error(f"Error logging video detection: {e}")
\ No newline at end of file
+        logger.error(f"Error logging video detection: {e}")
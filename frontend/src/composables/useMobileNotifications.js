@@ -1,5 +1,6 @@
 import { ref, computed, onMounted, onUnmounted } from "vue";
 import axios from "axios";
+import { withSummaryDetails } from "./useNotificationDetails";
 import { useToast } from "vue-toastification";
 import io from "socket.io-client";
 
@@ -19,7 +20,7 @@ export function useMobileNotifications() {
         headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
       });
       notifications.value = (response.data || []).map((n) => ({
-        ...n,
+        ...withSummaryDetails(n),
         read: n.read || false,
       }));
       unreadCount.value = notifications.value.filter((n) => !n.read).length;
@@ -120,7 +121,7 @@ export function useMobileNotifications() {
 
     socket.value.on("unread_notifications", ({ notifications: unread }) => {
       notifications.value = [
-        ...unread,
+        ...unread.map(withSummaryDetails),
         ...notifications.value.filter((n) => n.read),
       ];
       unreadCount.value = unread.length;
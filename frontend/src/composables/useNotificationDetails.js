@@ -0,0 +1,42 @@
+/**
+ * Notification list helpers
+ *
+ * Notification lists (/api/notifications, /api/agent/notifications and the
+ * unread_notifications socket event) return compact summaries without the
+ * details JSON. withSummaryDetails() gives each summary a small details object
+ * holding the fields list views already read. loadNotificationDetails()
+ * fetches the full details once, when the user opens an alert.
+ */
+import axios from 'axios';
+
+export function withSummaryDetails(notification) {
+  if (notification.details) {
+    return { ...notification, detailsLoaded: true };
+  }
+  return {
+    ...notification,
+    details: {
+      streamer_name: notification.streamer,
+      platform: notification.platform,
+      assigned_agent: notification.assigned_agent,
+      priority: notification.priority
+    },
+    detailsLoaded: false
+  };
+}
+
+export async function loadNotificationDetails(notification) {
+  if (!notification || notification.detailsLoaded) return notification;
+  try {
+    const { data } = await axios.get(`/api/notifications/${notification.id}`);
+    notification.details = { ...notification.details, ...(data.details || {}) };
+    notification.detailsLoaded = true;
+  } catch (err) {
+    console.error('Error loading notification details:', err);
+  }
+  return notification;
+}
+
+export function useNotificationDetails() {
+  return { withSummaryDetails, loadNotificationDetails };
+}